@@ -0,0 +1,54 @@
+"""
+Compare size, save and load time of the codecs for memory files.
+
+Run with `python benchmarks/bench_codec.py [memory files...]`. Without
+arguments, all memories in the plaitime directory are used.
+"""
+
+import functools
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+from plaitime import MEMORY_DIRECTORY
+from plaitime.codec import available_codecs
+from plaitime.data_models import Memory
+from plaitime.io import load, save
+
+
+def save_again(memory: Memory, path: Path, codec: str):
+    # remove file, so that the "no change" check does not skip saving
+    path.unlink(missing_ok=True)
+    save(memory, path, codec)
+
+
+def main():
+    paths = [Path(p) for p in sys.argv[1:]] or sorted(MEMORY_DIRECTORY.glob("*.json"))
+    memories = [load(p, Memory) for p in paths]
+    if not memories:
+        print("no memory files found")
+        return
+    print(
+        f"{len(memories)} memories, {sum(len(m.messages) for m in memories)} messages"
+    )
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "memory.json"
+        for codec in available_codecs():
+            size = 0
+            t_save = 0
+            t_load = 0
+            for memory in memories:
+                t_save += timeit.timeit(
+                    functools.partial(save_again, memory, path, codec), number=3
+                )
+                size += path.stat().st_size
+                t_load += timeit.timeit(functools.partial(load, path, Memory), number=3)
+            print(
+                f"{codec:10} {size / 1e3:10.1f} kB"
+                f" save {t_save / 3 * 1e3:8.1f} ms load {t_load / 3 * 1e3:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
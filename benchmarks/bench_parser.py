@@ -0,0 +1,66 @@
+"""
+Micro-benchmarks of the emphasis parser against the previous implementation.
+
+Run with `python benchmarks/bench_parser.py`.
+"""
+
+import functools
+import timeit
+
+from plaitime.parser import Parser, parse
+
+
+def legacy_parse(text: str) -> str:
+    parts = text.split("*")
+    result = []
+    for i, part in enumerate(parts):
+        if not part:
+            continue
+        if i % 2 == 0:
+            result.append(part)
+        else:
+            result.append(f"<em>{part}</em>")
+    return "".join(result).replace("\n", "<br/>").replace(r"'", r"\'")
+
+
+PARAGRAPH = (
+    '*She leans against the counter and smiles.* "Welcome, traveler! '
+    'What brings you to _The Rusty Anchor_ on a night like this?" '
+    "**The storm** rattles the shutters.\n\n"
+)
+
+
+def stream_legacy(chunks: list[str]):
+    # the whole message was converted again after each chunk
+    content = ""
+    for chunk in chunks:
+        content += chunk
+        legacy_parse(content)
+
+
+def stream(chunks: list[str]):
+    parser = Parser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.feed("", final=True)
+
+
+def main():
+    for n in (1, 10, 100):
+        text = PARAGRAPH * n
+        # chunks of about the size of one token
+        chunks = [text[i : i + 4] for i in range(0, len(text), 4)]
+        number = max(1, 1000 // n)
+        print(f"{len(text)} characters, {len(chunks)} chunks")
+        for name, func, arg in (
+            ("legacy parse", legacy_parse, text),
+            ("parse", parse, text),
+            ("legacy stream", stream_legacy, chunks),
+            ("stream", stream, chunks),
+        ):
+            t = timeit.timeit(functools.partial(func, arg), number=number) / number
+            print(f"  {name:15} {t * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,28 @@
 from pathlib import Path
 
 BASE_DIRECTORY = Path.home() / ".plaitime"
-BASE_DIRECTORY.mkdir(exist_ok=True)
 SETTINGS_FILE_NAME = BASE_DIRECTORY / "settings.json"
 SESSION_DIRECTORY = BASE_DIRECTORY / "sessions"
-SESSION_DIRECTORY.mkdir(exist_ok=True)
 MEMORY_DIRECTORY = BASE_DIRECTORY / "memories"
-MEMORY_DIRECTORY.mkdir(exist_ok=True)
+EMBEDDING_DIRECTORY = BASE_DIRECTORY / "embeddings"
+CATALOG_FILE_NAME = BASE_DIRECTORY / "catalog.json"
+SEARCH_INDEX_FILE_NAME = BASE_DIRECTORY / "search.sqlite"
+REPLY_CACHE_FILE_NAME = BASE_DIRECTORY / "replies.sqlite"
 
 CHARACTERS_PER_TOKEN = 4  # on average
+# ollama's context size if the model does not declare one
+DEFAULT_CONTEXT_SIZE = 2048
+
+
+def make_directories():
+    for directory in (
+        BASE_DIRECTORY,
+        SESSION_DIRECTORY,
+        MEMORY_DIRECTORY,
+        EMBEDDING_DIRECTORY,
+    ):
+        directory.mkdir(exist_ok=True)
+
 
 STORY_PROMPT = """Given a summary in `<summary>` tags and a chat in `<chat>` tags, please extend the summary with new paragraphs.
 
@@ -30,6 +44,38 @@ Only return the new paragraphs that should be added to the summary and nothing e
 Do not repeat anything that is already covered by the summary and do not rephrase the summary.
 """
 
+SUMMARY_PROMPT = """Summarize the chat within `<chat>` tags.
+
+<chat>
+{dialog}
+</chat>
+
+# Task Requirements
+
+Write a short summary of the events in the chat, in past tense and in the third person.
+Keep names, places, decisions, and anything that may matter later in the story.
+
+# Response format
+
+Only return the summary as a single paragraph and nothing else, please.
+"""
+
+ROLLUP_PROMPT = """Combine the consecutive summaries within `<summaries>` tags into one summary.
+
+<summaries>
+{summaries}
+</summaries>
+
+# Task Requirements
+
+Write one summary of the events, in past tense and in the third person, which is much shorter than the summaries together.
+Keep the events which matter for the rest of the story and drop details.
+
+# Response format
+
+Only return the summary as a single paragraph and nothing else, please.
+"""
+
 CHARACTERS_PROMPT = """Analyze the chat within `<chat>` tags and extract key information about characters.
 
 <chat>
@@ -45,6 +91,7 @@ Give equal attention to the entire chat, not just the last part.
 
 2. Character descriptions to pay attention to:
     - Name of the character
+    - Other names, nicknames, or titles used for the character
 	- Physical appearance (face, body, visual details)
 	- Age of the character
 	- Clothing
@@ -61,6 +108,7 @@ Please return the extracted character information in JSON format and assign an e
     "characters": [
         {{
             "name": "name of character",
+            "aliases": "other names, nicknames, or titles of the character, comma-separated",
             "eyes": "description of eyes",
             "hair": "description of hair",
             "age": "(approximate) age of the character",
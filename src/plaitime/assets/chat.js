@@ -0,0 +1,130 @@
+// Renders the chat. The page receives data from the web_bridge object
+// through signals, see WebBridge in chat_area.py. Only messages from index
+// first on are rendered, message i is child i - first of the body. Older
+// messages are requested when the user scrolls to the top.
+
+var web_bridge;
+var first = 0;
+var loadingOlder = false;
+
+function child(index) {
+    return document.body.children[index - first];
+}
+
+// buttons to switch between alternative responses, candidate is "1/3"
+function selector(candidate) {
+    if (!candidate) return '';
+    return '<span class="candidates"><button data-step="-1">&lsaquo;</button>' +
+        candidate + '<button data-step="1">&rsaquo;</button></span>';
+}
+
+function updateMessage(p, view) {
+    p.classList.add(view.role);
+    p.classList.toggle('thinking', view.thinking);
+    p.classList.toggle('mark', view.mark);
+    p.dataset.candidate = view.candidate;
+    p.innerHTML = selector(view.candidate) + view.html;
+}
+
+function createMessages(views) {
+    const fragment = document.createDocumentFragment();
+    for (const view of views) {
+        const p = document.createElement('p');
+        updateMessage(p, view);
+        fragment.appendChild(p);
+    }
+    return fragment;
+}
+
+function scrollToBottom() {
+    window.scrollTo(0, document.body.scrollHeight);
+}
+
+function resetMessages(start, views) {
+    document.body.replaceChildren(createMessages(views));
+    first = start;
+    loadingOlder = false;
+    scrollToBottom();
+}
+
+function prependMessages(views) {
+    // keep the visible messages in place
+    const height = document.body.scrollHeight;
+    document.body.prepend(createMessages(views));
+    first -= views.length;
+    window.scrollBy(0, document.body.scrollHeight - height);
+    loadingOlder = false;
+}
+
+function replaceMessages(start, stop, views) {
+    const children = document.body.children;
+    const next = stop - first < children.length ? children[stop - first] : null;
+    for (let i = stop - 1; i >= start; i--) child(i).remove();
+    document.body.insertBefore(createMessages(views), next);
+    if (views.length > 0 && next === null) scrollToBottom();
+}
+
+function setMessage(index, view) {
+    updateMessage(child(index), view);
+    scrollToBottom();
+}
+
+function appendChunk(index, html) {
+    const p = child(index);
+    if (p.classList.contains('thinking')) {
+        p.classList.remove('thinking');
+        p.innerHTML = selector(p.dataset.candidate);
+    }
+    p.insertAdjacentHTML('beforeend', html);
+    scrollToBottom();
+}
+
+function markMessage(index) {
+    for (const p of document.querySelectorAll('.mark')) p.classList.remove('mark');
+    if (index >= first) child(index).classList.add('mark');
+}
+
+function scrollToMessage(index) {
+    const p = child(index);
+    p.scrollIntoView({block: 'center'});
+    p.classList.add('found');
+    setTimeout(() => p.classList.remove('found'), 2000);
+}
+
+function setTheme(theme) {
+    for (const [key, value] of Object.entries(theme)) {
+        document.documentElement.style.setProperty(key, value);
+    }
+}
+
+document.addEventListener('click', function(event) {
+    const button = event.target.closest('.candidates button');
+    if (button && web_bridge) {
+        web_bridge.select_candidate(parseInt(button.dataset.step));
+        return;
+    }
+    const p = event.target.closest('body > p');
+    if (p && web_bridge) {
+        web_bridge.edit_message(first + Array.prototype.indexOf.call(document.body.children, p));
+    }
+});
+
+window.addEventListener('scroll', function() {
+    if (window.scrollY < 100 && first > 0 && !loadingOlder && web_bridge) {
+        loadingOlder = true;
+        web_bridge.load_older();
+    }
+});
+
+new QWebChannel(qt.webChannelTransport, function(channel) {
+    web_bridge = channel.objects.web_bridge;
+    web_bridge.resetMessages.connect(resetMessages);
+    web_bridge.prependMessages.connect(prependMessages);
+    web_bridge.replaceMessages.connect(replaceMessages);
+    web_bridge.setMessage.connect(setMessage);
+    web_bridge.appendChunk.connect(appendChunk);
+    web_bridge.markMessage.connect(markMessage);
+    web_bridge.scrollToMessage.connect(scrollToMessage);
+    web_bridge.setTheme.connect(setTheme);
+    web_bridge.ready();
+});
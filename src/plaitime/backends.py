@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# jobs of this kind are interactive, others should not compete with them
+CHAT = "chat"
+
+
+def parse_hosts(text: str) -> list[str]:
+    return [h.strip() for h in text.split(",") if h.strip()]
+
+
+def model_name(model: str) -> str:
+    # ollama reports models with tag
+    return model if ":" in model else f"{model}:latest"
+
+
+class BackendPool:
+    """
+    Route requests to several ollama hosts.
+
+    The hosts are checked with ps(), which also tells which models are loaded.
+    Requests go preferably to a host which has the model loaded and then to
+    the host with the fewest running jobs. Other jobs avoid the host which
+    serves the chat. Without hosts, the default host of ollama is used.
+    """
+
+    def __init__(self, hosts=(), check_interval=30.0, timeout=2.0):
+        self.hosts = list(hosts)
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # host -> (time of check, loaded models or None if unreachable)
+        self._status: dict[str, tuple[float, set[str] | None]] = {}
+        self._jobs = Counter()
+        self._chat_host = None
+
+    def configure(self, hosts: list[str]):
+        with self._lock:
+            if hosts != self.hosts:
+                self.hosts = list(hosts)
+                self._status = {}
+                self._chat_host = None
+
+    @property
+    def primary(self) -> str | None:
+        """Host for requests which are not routed, like embeddings."""
+        return self.hosts[0] if self.hosts else None
+
+    def status(self, host: str) -> set[str] | None:
+        """Return models loaded on host or None if host is unreachable."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._status.get(host)
+        if cached and now - cached[0] < self.check_interval:
+            return cached[1]
+        import httpx
+        import ollama
+        from ollama import ResponseError
+
+        try:
+            response = ollama.Client(host, timeout=self.timeout).ps()
+            models = {m.model for m in response.models}
+        except (ResponseError, ConnectionError, httpx.HTTPError) as e:
+            logger.warning(f"ollama host {host} is not available: {e}")
+            models = None
+        with self._lock:
+            self._status[host] = (now, models)
+        return models
+
+    def mark_failed(self, host: str | None):
+        if host is not None:
+            with self._lock:
+                self._status[host] = (time.monotonic(), None)
+
+    def select(self, model: str, kind: str = CHAT) -> list[str | None]:
+        """Return hosts in the order in which they should be tried."""
+        hosts = self.hosts
+        if len(hosts) < 2:
+            return hosts or [None]
+        status = {h: self.status(h) for h in hosts}
+        with self._lock:
+            jobs = dict(self._jobs)
+            chat_host = self._chat_host
+        name = model_name(model)
+
+        def rank(host):
+            return (
+                kind != CHAT and host == chat_host,
+                name not in status[host],
+                jobs.get(host, 0),
+            )
+
+        ordered = sorted((h for h in hosts if status[h] is not None), key=rank)
+        # unreachable hosts are tried last, they may be back
+        return ordered + [h for h in hosts if status[h] is None]
+
+    @contextmanager
+    def job(self, host: str | None, model: str, kind: str = CHAT):
+        with self._lock:
+            self._jobs[host] += 1
+            if kind == CHAT:
+                self._chat_host = host
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._jobs[host] -= 1
+                cached = self._status.get(host)
+                if cached and cached[1] is not None:
+                    # the host has the model loaded now
+                    cached[1].add(model_name(model))
+
+
+pool = BackendPool()
+
+
+def get_context_size(model):
+    import httpx
+    import ollama
+    from ollama import ResponseError
+
+    from . import DEFAULT_CONTEXT_SIZE
+
+    # ask the host which runs the model, the others may not have it
+    for host in pool.select(model):
+        try:
+            response = ollama.Client(host, timeout=pool.timeout).show(model)
+        except (ResponseError, ConnectionError, httpx.HTTPError) as e:
+            # model was removed or host is down
+            logger.warning(f"cannot get context size of {model} from {host}: {e}")
+            continue
+        info = response.modelinfo or {}
+        for key in info:
+            if "context_length" in key:
+                return info[key]
+        logger.warning(f"context size of {model} not found, using default")
+        return DEFAULT_CONTEXT_SIZE
+    return 0
+
+
+def list_models() -> list[str]:
+    """Return models available on any reachable host."""
+    import httpx
+    import ollama
+    from ollama import ResponseError
+
+    hosts = pool.hosts or [None]
+    models = set()
+    for host in hosts:
+        if host is not None and pool.status(host) is None:
+            continue
+        try:
+            response = ollama.Client(host, timeout=pool.timeout).list()
+        except (ResponseError, ConnectionError, httpx.HTTPError) as e:
+            logger.warning(f"cannot list models of {host}: {e}")
+            continue
+        models.update(item.model for item in response.models)
+    return sorted(models)
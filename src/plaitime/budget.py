@@ -0,0 +1,193 @@
+"""
+Split the context window between the sections of the system prompt and the chat.
+
+Each section gets a share of the context window. A section which needs less
+than its share leaves the rest to the others, a section which needs more is
+trimmed. Without Qt, so that this can be used outside of the GUI.
+"""
+
+from . import CHARACTERS_PER_TOKEN
+from .data_models import Budget, Character, Message, Summary
+from .message_store import MessageStore
+from .relevance import CharacterIndex
+from .util import format_character
+
+SECTIONS = ("prompt", "characters", "world", "story", "history", "chat")
+
+ELLIPSIS = "[...]"
+
+
+def num_tokens(text: str) -> int:
+    # rounded up, so that a text fits into its own number of tokens in clip
+    return -(-len(text) // CHARACTERS_PER_TOKEN)
+
+
+def allocate(size: int, needs: dict[str, int], shares: dict[str, int]):
+    """
+    Split size tokens between sections in proportion to their shares.
+
+    A section gets at most what it needs, what is left is split between the
+    sections which need more.
+    """
+    allocation = {k: 0 for k in needs}
+    pending = {k for k in needs if needs[k] > 0 and shares[k] > 0}
+    left = size
+    while pending and left > 0:
+        total = sum(shares[k] for k in pending)
+        spent = 0
+        done = set()
+        for k in sorted(pending):
+            n = min(left * shares[k] // total, needs[k] - allocation[k])
+            allocation[k] += n
+            spent += n
+            if allocation[k] == needs[k]:
+                done.add(k)
+        left -= spent
+        if not done:
+            # all sections got their share and need more
+            break
+        pending -= done
+    return allocation
+
+
+def clip(text: str, num_token: int, keep_end: bool = False) -> str:
+    """Trim text to num_token, at a paragraph boundary if possible."""
+    n = num_token * CHARACTERS_PER_TOKEN
+    if len(text) <= n:
+        return text
+    n -= len(ELLIPSIS) + 2
+    if n <= 0:
+        return ""
+    if keep_end:
+        start = len(text) - n
+        cut = text.find("\n\n", start)
+        if cut < 0 or cut > start + n // 2:
+            cut = start
+        return f"{ELLIPSIS}\n\n{text[cut:].lstrip()}"
+    cut = text.rfind("\n\n", 0, n)
+    if cut < n // 2:
+        cut = n
+    return f"{text[:cut].rstrip()}\n\n{ELLIPSIS}"
+
+
+def rank_characters(
+    characters: list[Character], messages: MessageStore
+) -> list[Character]:
+    """Sort characters by their last mention in the chat, most recent first."""
+    last = CharacterIndex(characters).last_mentions(messages)
+    order = sorted(range(len(characters)), key=lambda i: -last.get(i, -1))
+    return [characters[i] for i in order]
+
+
+def character_section(characters: list[Character], num_token: int) -> str:
+    """Format characters in the given order, as many as fit."""
+    parts = []
+    omitted = []
+    for c in characters:
+        text = format_character(c, format="md")
+        n = num_tokens(text) + 1
+        if n <= num_token:
+            parts.append(text)
+            num_token -= n
+        else:
+            omitted.append(c.name)
+    if omitted:
+        text = f"Other characters: {', '.join(omitted)}"
+        if num_tokens(text) <= num_token:
+            parts.append(text)
+    return "\n\n".join(parts)
+
+
+def select_summaries(summaries: list[Summary], end: int) -> list[Summary]:
+    """Return the coarsest summaries of messages before end, in order."""
+    selected = []
+    for s in sorted(summaries, key=lambda s: -s.level):
+        if s.end <= end and not any(
+            s.start < t.end and t.start < s.end for t in selected
+        ):
+            selected.append(s)
+    return sorted(selected, key=lambda s: s.start)
+
+
+def num_chat_messages(window: list[Message]) -> int:
+    """Return number of chat messages in a window from build_context."""
+    # the system message is missing if there is nothing to put into it
+    return sum(1 for m in window if m.role != "system")
+
+
+def build_context(
+    prompt: str,
+    characters: list[Character],
+    world: str,
+    story: str,
+    messages: MessageStore,
+    size: int,
+    budget: Budget,
+    summaries: list[Summary] = (),
+) -> tuple[list[Message], dict[str, tuple[int, int]]]:
+    """
+    Return messages for the model and the allocation of the context.
+
+    The first message is the system prompt with the characters, world, story,
+    and the summaries of messages before the window, followed by the most
+    recent messages which fit. The allocation maps each section to the used
+    and the needed number of tokens.
+    """
+    characters = rank_characters(characters, messages)
+    needs = {
+        "prompt": num_tokens(prompt),
+        # one more for the separator, like in character_section
+        "characters": sum(
+            num_tokens(format_character(c, format="md")) + 1 for c in characters
+        ),
+        "world": num_tokens(world),
+        "story": num_tokens(story),
+        # the window is not known yet, summaries of all messages are the most
+        # that can be needed
+        "history": num_tokens(
+            "\n\n".join(x.text for x in select_summaries(summaries, len(messages)))
+        ),
+    }
+    needs["chat"] = sum(num_tokens(c) for c in messages.contents)
+    if size > 0:
+        allocation = allocate(size, needs, budget.model_dump())
+    else:
+        # context size is unknown, send everything but only the last message
+        allocation = dict(needs)
+        allocation["chat"] = 0
+
+    window = []
+    used = 0
+    for i in reversed(range(len(messages))):
+        n = num_tokens(messages.content(i))
+        # the last message is always included
+        if window and used + n > allocation["chat"]:
+            break
+        window.append(messages[i])
+        used += n
+    history = "\n\n".join(
+        x.text for x in select_summaries(summaries, len(messages) - len(window))
+    )
+    needs["history"] = num_tokens(history)
+
+    sections = {
+        "prompt": clip(prompt, allocation["prompt"]),
+        "characters": character_section(characters, allocation["characters"]),
+        "world": clip(world, allocation["world"]),
+        # the end of the story is the most recent part
+        "story": clip(story, allocation["story"], keep_end=True),
+        "history": clip(history, allocation["history"], keep_end=True),
+    }
+    parts = [sections["prompt"]] + [
+        f"# {k.capitalize()}\n\n{sections[k]}"
+        for k in ("characters", "world", "story", "history")
+        if sections[k]
+    ]
+    system = "\n\n".join(p for p in parts if p)
+    if system:
+        window.append(Message(role="system", content=system))
+    window.reverse()
+
+    result = {k: (num_tokens(v), needs[k]) for (k, v) in sections.items()}
+    result["chat"] = (used, needs["chat"])
+    return window, result
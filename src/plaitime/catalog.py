@@ -0,0 +1,69 @@
+import logging
+import time
+from pathlib import Path
+
+from .data_models import Catalog, Session, SessionInfo
+from .io import load, save
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCatalog:
+    """
+    Registry of all sessions with some metadata.
+
+    The catalog is persisted in an index file and kept up-to-date incrementally,
+    so that the session directory only needs to be scanned once at startup.
+    """
+
+    def __init__(self, filename: Path):
+        self.filename = filename
+        self.sessions = load(filename, Catalog).sessions if filename.exists() else {}
+
+    def snapshot(self) -> Catalog:
+        """Return a copy which can be saved on another thread."""
+        return Catalog(sessions={k: v.model_copy() for k, v in self.sessions.items()})
+
+    def save(self):
+        save(self.snapshot(), self.filename)
+
+    def sync(self, session_directory: Path, memory_directory: Path):
+        """Add sessions missing in the index and remove entries of deleted ones."""
+        names = {p.stem for p in session_directory.glob("*.json")}
+        for name in set(self.sessions) - names:
+            logger.info(f"removing deleted session {name!r} from catalog")
+            del self.sessions[name]
+        for name in names - set(self.sessions):
+            logger.info(f"adding session {name!r} to catalog")
+            path = session_directory / f"{name}.json"
+            info = SessionInfo(
+                model=load(path, Session).model,
+                last_used=path.stat().st_mtime,
+                memory_size=file_size(memory_directory / f"{name}.json"),
+            )
+            self.sessions[name] = info
+
+    def names(self) -> list[str]:
+        """Return session names, most recently used first."""
+        return sorted(self.sessions, key=lambda n: -self.sessions[n].last_used)
+
+    def update(self, name: str, touch: bool = False, **fields) -> SessionInfo:
+        info = self.sessions.setdefault(name, SessionInfo())
+        for key, value in fields.items():
+            setattr(info, key, value)
+        if touch:
+            info.last_used = time.time()
+        return info
+
+    def rename(self, old_name: str, new_name: str):
+        self.sessions[new_name] = self.sessions.pop(old_name, SessionInfo())
+
+    def remove(self, name: str):
+        self.sessions.pop(name, None)
+
+
+def file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
@@ -1,6 +1,10 @@
-from PySide6 import QtWidgets, QtCore, QtGui
-from plaitime.data_models import Character
+from __future__ import annotations
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
 from plaitime.config_dialog import ConfigDialog
+from plaitime.data_models import Character
+from plaitime.util import format_character, integrate_characters
 
 
 class Model(QtCore.QAbstractListModel):
@@ -72,12 +76,18 @@ class CharacterWidget(QtWidgets.QWidget):
         )
         self.model = Model(characters, self)
         self.view.setModel(self.model)
+        # the HTML delegate is slow, lay out long lists in the background
+        self.view.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)
+        self.view.setBatchSize(10)
         self.view.setItemDelegate(HTMLDelegate())
         self.view.doubleClicked.connect(self.edit_character)
 
         generate_button = QtWidgets.QPushButton("Generate", self)
         new_button = QtWidgets.QPushButton("New character", self)
         delete_button = QtWidgets.QPushButton("Delete character(s)", self)
+        generate_button.setToolTip(
+            "Shift+click to generate anew instead of using a cached result"
+        )
         generate_button.clicked.connect(self.generateClicked)
         new_button.clicked.connect(self.new_character)
         delete_button.clicked.connect(self.delete_characters)
@@ -121,25 +131,7 @@ class CharacterWidget(QtWidgets.QWidget):
         if not characters:
             return
 
-        name_map = {c.name: i for i, c in enumerate(self.characters)}
-        for new in characters:
-            i = name_map.get(new.name)
-            if i is None:
-                self.characters.append(new)
-            else:
-                old = self.characters[i]
-                dnew = new.model_dump()
-                for key, new_val in dnew.items():
-                    if key == "name":
-                        continue
-                    old_val = getattr(old, key)
-                    if old_val and new_val and new_val != old_val:
-                        setattr(old, key, f"{old_val}; {new_val}")
-                    elif new_val:
-                        setattr(old, key, new_val)
-                    else:
-                        assert new_val == ""
-
+        integrate_characters(self.characters, characters)
         self.model.layoutChanged.emit()
 
     @property
@@ -148,7 +140,9 @@ class CharacterWidget(QtWidgets.QWidget):
 
     @characters.setter
     def characters(self, value: list[Character]):
+        self.model.beginResetModel()
         self.model.characters = value
+        self.model.endResetModel()
 
     def add_chunk(self, chunk: str):
         print(chunk, end="")
@@ -157,40 +151,6 @@ class CharacterWidget(QtWidgets.QWidget):
         return "\n\n".join(format_character(c, format="md") for c in self.characters)
 
 
-def format_character(character: Character, format="html") -> str:
-    if format == "html":
-        prefix = f"<h2>{character.name}</h2><table>"
-        suffix = "</table>"
-
-        def short(key, val):
-            return f"<tr><th>{key}</th> <td>{val}</td></tr>"
-
-        def long(key, val):
-            return short(key, val.replace("\n", "<br/>"))
-    elif format == "md":
-        prefix = f"## {character.name}\n\n"
-        suffix = ""
-
-        def short(key, val):
-            return f"- {key}: {val}\n"
-
-        def long(key, val):
-            return f"- {key}: {val.replace("\n", "\n  ")}\n"
-    else:
-        raise ValueError(f"unknown format={format}")
-    s = prefix
-    for key, info in character.model_fields.items():
-        if key == "name":
-            continue
-        value = getattr(character, key)
-        if not value:
-            continue
-        tr = long if info.metadata == ["long"] else short
-        s += tr(key, value)
-    s += suffix
-    return s.strip()
-
-
 if __name__ == "__main__":
     import sys
 
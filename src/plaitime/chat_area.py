@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import json
+import logging
+from importlib.resources import files
+
+from PySide6 import (
+    QtCore,
+    QtGui,
+    QtWebChannel,
+    QtWebEngineWidgets,
+    QtWidgets,
+)
+
+from .data_models import Colors
+from .message_store import MessageStore
+from .parser import Parser
+from .parser import parse as html
+from .text_edit import InputTextEdit
+from .util import remove_last_sentence
+
+logger = logging.getLogger(__name__)
+
+# number of messages rendered at once when a session is loaded or when
+# scrolling to the top of the page
+PAGE_SIZE = 100
+
+
+class EditDialog(QtWidgets.QDialog):
+    result: str = ""
+
+    def __init__(self, text: str, parent):
+        super().__init__(parent)
+        self.setWindowTitle("Edit message")
+
+        self.text_edit = InputTextEdit(self)
+        self.text_edit.set_text(text)
+        self.text_edit.sendMessage.connect(self.handle_message)
+
+        button_box = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok
+            | QtWidgets.QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(lambda: self.handle_message(self.text_edit.text()))
+        button_box.rejected.connect(self.reject)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.text_edit)
+        layout.addWidget(button_box)
+
+    @QtCore.Slot(str)
+    def handle_message(self, text: str):
+        self.result = text
+        self.accept()
+
+
+class WebBridge(QtCore.QObject):
+    """
+    Object shared with the chat page.
+
+    The page is updated by data sent with the signals, which are connected to
+    the renderer in assets/chat.js.
+    """
+
+    resetMessages = QtCore.Signal(int, "QVariantList")
+    prependMessages = QtCore.Signal("QVariantList")
+    replaceMessages = QtCore.Signal(int, int, "QVariantList")
+    setMessage = QtCore.Signal(int, "QVariantMap")
+    appendChunk = QtCore.Signal(int, str)
+    markMessage = QtCore.Signal(int)
+    scrollToMessage = QtCore.Signal(int)
+    setTheme = QtCore.Signal("QVariantMap")
+    pageReady = QtCore.Signal()
+
+    def __init__(self, parent):
+        super().__init__(parent)
+
+    @QtCore.Slot()
+    def ready(self):
+        self.pageReady.emit()
+
+    @QtCore.Slot()
+    def load_older(self):
+        chat_area: ChatArea = self.parent()
+        chat_area.reveal(chat_area.first - PAGE_SIZE)
+
+    @QtCore.Slot(int)
+    def edit_message(self, index: int):
+        chat_area: ChatArea = self.parent()
+        logger.info(f"Edit message {index}")
+        dialog = EditDialog(chat_area.messages.content(index), chat_area)
+        if dialog.exec() == QtWidgets.QDialog.DialogCode.Accepted:
+            chat_area.set_content(index, dialog.result)
+
+    @QtCore.Slot(int)
+    def select_candidate(self, step: int):
+        chat_area: ChatArea = self.parent()
+        chat_area.select_candidate(chat_area.selected + step)
+
+
+class ChatArea(QtWebEngineWidgets.QWebEngineView):
+    colors: Colors
+    messages: MessageStore
+    bridge: WebBridge
+    first: int
+    _ready: bool
+    _pending: list[tuple[QtCore.SignalInstance, tuple]]
+
+    def __init__(self, colors: Colors, parent=None):
+        super().__init__(parent)
+        self.setContextMenuPolicy(QtGui.Qt.ContextMenuPolicy.NoContextMenu)
+        self.colors = colors
+        self.messages = MessageStore()
+        # only messages from index first on are rendered
+        self.first = 0
+        self._mark = -1
+        # index and parser state of the message that is streamed
+        self._stream: tuple[int, Parser] | None = None
+        # alternative responses for message candidate_index, the selected
+        # one is the content of the message
+        self.candidates: list[str] = []
+        self.candidate_index = -1
+        self.selected = 0
+
+        # Web channel setup
+        self.bridge = WebBridge(self)
+        channel = QtWebChannel.QWebChannel(self)
+        channel.registerObject("web_bridge", self.bridge)
+        self.page().setWebChannel(channel)
+
+        # The page is loaded only once, updates sent before the page has
+        # connected to the bridge are queued
+        self._ready = False
+        self._pending = []
+        self.bridge.pageReady.connect(self._page_ready)
+        self.loadFinished.connect(self._load_finished)
+        page = files("plaitime").joinpath("assets").joinpath("chat.html")
+        self.setUrl(QtCore.QUrl.fromLocalFile(str(page)))
+        self.apply_theme()
+
+    def send(self, signal: QtCore.SignalInstance, *args):
+        if self._ready:
+            signal.emit(*args)
+        else:
+            self._pending.append((signal, args))
+
+    @QtCore.Slot(bool)
+    def _load_finished(self, ok: bool):
+        if not ok:
+            logger.error("loading chat page failed")
+
+    @QtCore.Slot()
+    def _page_ready(self):
+        self._ready = True
+        pending = self._pending
+        self._pending = []
+        for signal, args in pending:
+            signal.emit(*args)
+
+    def _view(self, index: int) -> dict:
+        role = self.messages.role(index)
+        content = self.messages.content(index)
+        thinking = role == "assistant" and not content
+        return {
+            "role": role,
+            "html": "Thinking..." if thinking else html(content),
+            "thinking": thinking,
+            "mark": index == self._mark,
+            "candidate": (
+                f"{self.selected + 1}/{len(self.candidates)}"
+                if index == self.candidate_index
+                else ""
+            ),
+        }
+
+    def _views(self, start: int, stop: int) -> list[dict]:
+        return [self._view(i) for i in range(start, stop)]
+
+    def _render_tail(self):
+        self._stream = None
+        self.first = max(0, len(self.messages) - PAGE_SIZE)
+        views = self._views(self.first, len(self.messages))
+        self.send(self.bridge.resetMessages, self.first, views)
+
+    def reveal(self, index: int):
+        """Render older messages, so that messages from index on are shown."""
+        index = max(index, 0)
+        if index < self.first:
+            views = self._views(index, self.first)
+            self.first = index
+            self.send(self.bridge.prependMessages, views)
+
+    def _index(self, index: int) -> int:
+        # normalizes negative indices and raises IndexError when out of range
+        return range(len(self.messages))[index]
+
+    def replace_range(self, start: int, stop: int, messages: MessageStore):
+        """Replace messages from start to stop, the page is updated at once."""
+        self.commit_candidates()
+        self._stream = None
+        if self._mark >= start:
+            self._mark = -1
+        self.messages.replace(start, stop, messages)
+        if start < self.first:
+            # range starts in the part that is not rendered
+            self._render_tail()
+            return
+        views = self._views(start, start + len(messages))
+        self.send(self.bridge.replaceMessages, start, stop, views)
+
+    def remove_range(self, start: int, stop: int):
+        self.replace_range(start, stop, MessageStore())
+
+    def truncate(self, n: int):
+        self.remove_range(n, len(self.messages))
+
+    def clear(self):
+        self.truncate(0)
+
+    def load(self, messages: MessageStore):
+        self._mark = -1
+        self.candidates = []
+        self.candidate_index = -1
+        self.messages.replace(0, len(self.messages), messages)
+        self._render_tail()
+
+    def add(self, role: str, content: str) -> int:
+        messages = MessageStore()
+        messages.append(role, content)
+        index = len(self.messages)
+        self.replace_range(index, index, messages)
+        return index
+
+    def set_content(self, index: int, content: str):
+        index = self._index(index)
+        if index == self.candidate_index:
+            # an edited candidate becomes the response
+            self.commit_candidates()
+        self._set_content(index, content)
+
+    def _set_content(self, index: int, content: str):
+        self._stream = None
+        self.messages.set_content(index, content)
+        if index >= self.first:
+            self.send(self.bridge.setMessage, index, self._view(index))
+
+    def add_chunk(self, index: int, chunk: str):
+        if index >= len(self.messages):
+            # message was removed while the response was generated
+            return
+        if self._stream is None or self._stream[0] != index:
+            parser = Parser()
+            parser.feed(self.messages.content(index))
+            self._stream = (index, parser)
+        self.messages.add_chunk(index, chunk)
+        # only the new part is converted and appended
+        code = self._stream[1].feed(chunk)
+        if code and index >= self.first:
+            self.send(self.bridge.appendChunk, index, code)
+
+    def start_candidates(self, index: int, num: int):
+        self.commit_candidates()
+        self.candidates = [""] * num
+        self.candidate_index = self._index(index)
+        self.selected = 0
+        self._set_content(self.candidate_index, "")
+
+    def add_candidate_chunk(self, candidate: int, chunk: str):
+        if not self.candidates:
+            # candidates were committed while they were generated
+            return
+        self.candidates[candidate] += chunk
+        if candidate == self.selected:
+            self.add_chunk(self.candidate_index, chunk)
+
+    def select_candidate(self, candidate: int):
+        if not self.candidates:
+            return
+        self.selected = candidate % len(self.candidates)
+        self._set_content(self.candidate_index, self.candidates[self.selected])
+
+    def commit_candidates(self):
+        """Keep the selected candidate and drop the others."""
+        if not self.candidates:
+            return
+        index = self.candidate_index
+        self.candidates = []
+        self.candidate_index = -1
+        if index >= self.first:
+            self.send(self.bridge.setMessage, index, self._view(index))
+
+    def strip(self, index: int):
+        """Remove whitespace around a message, which models tend to add."""
+        index = self._index(index)
+        if index == self.candidate_index:
+            self.candidates = [c.strip() for c in self.candidates]
+            self._set_content(index, self.candidates[self.selected])
+        else:
+            self._set_content(index, self.messages.content(index).strip())
+
+    def remove_last_sentence(self, index: int):
+        self.set_content(index, remove_last_sentence(self.messages.content(index)))
+
+    def mark(self, index: int):
+        # the marked message may not be rendered yet
+        self._mark = self._index(index)
+        self.send(self.bridge.markMessage, self._mark)
+
+    def scroll_to(self, index: int):
+        index = self._index(index)
+        self.reveal(index)
+        self.send(self.bridge.scrollToMessage, index)
+
+    def theme(self) -> dict[str, str]:
+        font = self.font()
+        return {
+            "--font-family": json.dumps(font.family()),
+            "--font-size": f"{font.pointSize()}pt",
+            "--user-color": self.colors.user,
+            "--assistant-color": self.colors.assistant,
+            "--em-color": self.colors.em,
+        }
+
+    def apply_theme(self):
+        self.send(self.bridge.setTheme, self.theme())
+
+    def changeEvent(self, event: QtCore.QEvent):
+        # the font is inherited from the parent, which is only known after
+        # the widget was inserted into the splitter
+        if event.type() == QtCore.QEvent.Type.FontChange:
+            self.apply_theme()
+        super().changeEvent(event)
+
+    def reload_style(self, colors: Colors):
+        self.colors = colors
+        self.apply_theme()
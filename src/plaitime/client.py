@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import functools
+import socket
+import threading
+
+import httpcore
+import httpx
+import ollama
+
+
+class AbortableTransport(httpx.HTTPTransport):
+    """HTTP transport which keeps the sockets, so that they can be shut down."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._streams = []
+        self.aborted = False
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # httpcore reports the connections it opens to the trace extension
+        trace = request.extensions.get("trace")
+        request.extensions = {
+            **request.extensions,
+            "trace": functools.partial(self._trace, trace),
+        }
+        return super().handle_request(request)
+
+    def _trace(self, trace, event: str, info: dict):
+        if trace is not None:
+            trace(event, info)
+        if event != "connection.connect_tcp.complete":
+            return
+        stream = info["return_value"]
+        with self._lock:
+            self._streams.append(stream)
+            aborted = self.aborted
+        if aborted:
+            _shutdown(stream)
+
+    def abort(self):
+        with self._lock:
+            self.aborted = True
+            streams = list(self._streams)
+        for stream in streams:
+            _shutdown(stream)
+
+
+def _shutdown(stream: httpcore.NetworkStream):
+    # closing a socket does not wake up a thread that waits for data,
+    # shutting it down does
+    try:
+        stream.get_extra_info("socket").shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class Client(ollama.Client):
+    """
+    ollama client whose requests can be aborted from another thread.
+
+    Aborting closes the connection, the request then fails in the thread
+    which waits for the response and ollama stops working on it.
+    """
+
+    def __init__(self, host: str | None = None, **kwargs):
+        self._transport = AbortableTransport()
+        super().__init__(host, transport=self._transport, **kwargs)
+
+    def abort(self):
+        self._transport.abort()
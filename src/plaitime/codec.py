@@ -0,0 +1,69 @@
+import gzip
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+# zstd and msgpack require optional packages
+CODECS = ("json", "compact", "gzip", "zstd", "msgpack")
+MODULES = {"zstd": "zstandard", "msgpack": "msgpack"}
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def available_codecs() -> list[str]:
+    import importlib.util
+
+    return [
+        c for c in CODECS if c not in MODULES or importlib.util.find_spec(MODULES[c])
+    ]
+
+
+def encode(obj: BaseModel, codec: str) -> bytes:
+    """Serialize model with codec, which is one of CODECS."""
+    if codec == "json":
+        return obj.model_dump_json(indent=4).encode() + b"\n"
+    if codec == "msgpack":
+        import msgpack
+
+        return msgpack.packb(obj.model_dump(mode="json"))
+    data = obj.model_dump_json().encode()
+    if codec == "compact":
+        return data
+    if codec == "gzip":
+        # no timestamp, so that equal models give equal files
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError(f"unknown codec {codec!r}")
+
+
+def detect(data: bytes) -> str:
+    """Return codec of serialized data, "json" also covers "compact"."""
+    if data.startswith(GZIP_MAGIC):
+        return "gzip"
+    if data.startswith(ZSTD_MAGIC):
+        return "zstd"
+    # models are maps, a map in msgpack starts with 0x80-0x8f, 0xde or 0xdf
+    if data and (0x80 <= data[0] <= 0x8F or data[0] in (0xDE, 0xDF)):
+        return "msgpack"
+    return "json"
+
+
+def decode(data: bytes, cls: type[T]) -> T:
+    codec = detect(data)
+    if codec == "gzip":
+        data = gzip.decompress(data)
+    elif codec == "zstd":
+        import zstandard
+
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "msgpack":
+        import msgpack
+
+        return cls.model_validate(msgpack.unpackb(data))
+    return cls.model_validate_json(data)
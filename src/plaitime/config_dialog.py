@@ -1,5 +1,9 @@
-from PySide6 import QtWidgets, QtGui
-import ollama
+from __future__ import annotations
+
+import threading
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
 from annotated_types import Interval
 from pydantic import BaseModel
 from pydantic.fields import FieldInfo
@@ -26,6 +30,45 @@ class ColorButton(QtWidgets.QPushButton):
         return self._color.name()
 
 
+class ModelLister(QtCore.QObject):
+    """Sends the models of all hosts, which are asked on a Python thread."""
+
+    modelsListed = QtCore.Signal(list)
+
+    def run(self):
+        from .backends import list_models
+
+        self.modelsListed.emit(list_models())
+
+
+class ModelComboBox(QtWidgets.QComboBox):
+    """Lists the models of all hosts, which are asked in the background."""
+
+    def __init__(self, value: str, parent=None):
+        super().__init__(parent)
+        # the current model is selectable before the hosts have answered
+        if value:
+            self.addItem(value)
+        self.setCurrentText(value)
+        # not a QThread, which must not be deleted while it is running, but
+        # the dialog may be closed before an unreachable host times out;
+        # the signal is sent by a separate object, which the thread keeps
+        # alive, and the connection is dropped when the combo box is deleted
+        lister = ModelLister()
+        lister.modelsListed.connect(self.set_models)
+        threading.Thread(target=lister.run, daemon=True).start()
+
+    @QtCore.Slot(list)
+    def set_models(self, models: list[str]):
+        value = self.currentText()
+        # the host of the current model may be down, keep it selectable
+        if value and value not in models:
+            models.insert(0, value)
+        self.clear()
+        self.addItems(models)
+        self.setCurrentText(value)
+
+
 class ConfigDialog(QtWidgets.QDialog):
     def __init__(self, model: BaseModel, parent=None):
         super().__init__(parent)
@@ -50,7 +93,7 @@ class ConfigDialog(QtWidgets.QDialog):
 
 def make_widget_and_getter(
     field_info: FieldInfo | None,
-    value: BaseModel | str | int | float | bool,
+    value: BaseModel | str | float | bool,
 ):
     if field_info is None or isinstance(value, BaseModel):
         w = QtWidgets.QWidget()
@@ -93,11 +136,13 @@ def make_widget_and_getter(
             w.setPlainText(value)
             g = w.toPlainText
         elif metadata == ["model"]:
-            models = []
-            for item in ollama.list().models:
-                models.append(item.model)
+            w = ModelComboBox(value)
+            g = w.currentText
+        elif metadata == ["codec"]:
+            from .codec import available_codecs
+
             w = QtWidgets.QComboBox()
-            w.addItems(sorted(models))
+            w.addItems(available_codecs())
             w.setCurrentText(value)
             g = w.currentText
         elif metadata == ["color"]:
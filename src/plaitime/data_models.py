@@ -1,13 +1,16 @@
-from pydantic import BaseModel
 from typing import Annotated
+
 from annotated_types import Interval
-from PySide6 import QtGui
+from pydantic import BaseModel, Field
+
+from .message_store import MessageStore
 
 # Metadata tags
 LongString = Annotated[str, "long"]
 ModelString = Annotated[str, "model"]
 FontString = Annotated[str, "font"]
 ColorString = Annotated[str, "color"]
+CodecString = Annotated[str, "codec"]
 
 
 class Session(BaseModel):
@@ -27,6 +30,8 @@ class Message(BaseModel):
 
 class Character(BaseModel):
     name: str
+    # other names of the character, comma-separated
+    aliases: str = ""
     eyes: str = ""
     hair: str = ""
     age: str = ""
@@ -52,10 +57,27 @@ class LocationList(BaseModel):
     locations: list[Location] = []
 
 
+class Summary(BaseModel):
+    # summary of messages[start:end], level 0 summarizes messages and level n
+    # summarizes summaries of level n - 1
+    level: int = 0
+    start: int
+    end: int
+    text: LongString = ""
+    # detects changes of the summarized messages
+    digest: str = ""
+
+
 class Memory(CharacterList, LocationList):
-    messages: list[Message] = []
+    messages: MessageStore = Field(default_factory=MessageStore)
     story: LongString = ""
     world: LongString = ""
+    summaries: list[Summary] = []
+
+
+class PartialResponse(BaseModel):
+    index: int
+    message: Message
 
 
 class Colors(BaseModel):
@@ -69,13 +91,69 @@ class Font(BaseModel):
     size: Annotated[int, Interval(ge=1, le=100)] = 11
 
     def qfont(self):
+        # Qt is imported here, the models are also used without Qt
+        from PySide6 import QtGui
+
         return QtGui.QFont(self.family, self.size)
 
 
+class Budget(BaseModel):
+    # shares of the context window in percent, a section which needs less
+    # than its share leaves the rest to the others
+    prompt: Annotated[int, Interval(ge=0, le=100)] = 15
+    characters: Annotated[int, Interval(ge=0, le=100)] = 15
+    world: Annotated[int, Interval(ge=0, le=100)] = 10
+    story: Annotated[int, Interval(ge=0, le=100)] = 15
+    # automatic summaries of messages which fell out of the window
+    history: Annotated[int, Interval(ge=0, le=100)] = 10
+    chat: Annotated[int, Interval(ge=1, le=100)] = 45
+
+
 class Settings(BaseModel):
     session: Annotated[str, "noconfig"] = ""
     geometry: Annotated[tuple[int, int, int, int], "noconfig"] = (100, 100, 600, 600)
     font: Font = Font()
     colors: Colors = Colors()
     llm_timeout: str = "1h"
+    # comma-separated ollama hosts, for example "gpu1:11434, gpu2:11434";
+    # if empty, OLLAMA_HOST or the local host is used
+    hosts: str = ""
     context_margin_fraction: Annotated[int, Interval(ge=0, le=100)] = 15
+    budget: Budget = Budget()
+    # long-term memory is disabled if no embedding model is set
+    embedding_model: str = ""
+    recall_token_budget: Annotated[int, Interval(ge=0, le=100000)] = 1000
+    # only characters mentioned in this many recent messages are added to the
+    # prompt, 0 adds all characters
+    character_scene: Annotated[int, Interval(ge=0, le=1000)] = 20
+    # messages are summarized in chunks of this many tokens before they fall
+    # out of the context window, 0 disables automatic summaries
+    summary_chunk_size: Annotated[int, Interval(ge=0, le=100000)] = 1000
+    # replies to extraction prompts are cached up to this size in MB, 0 disables
+    reply_cache_size: Annotated[int, Interval(ge=0, le=1000)] = 20
+    # alternative responses generated in parallel, ollama needs as many
+    # parallel slots (OLLAMA_NUM_PARALLEL) to run them concurrently
+    num_candidates: Annotated[int, Interval(ge=1, le=8)] = 1
+    # file format of sessions and memories, detected automatically on load
+    codec: CodecString = "json"
+
+
+class Script(BaseModel):
+    # saved session which is continued, a new session if empty
+    session: str = ""
+    # replace model and system prompt of the session, if not empty
+    model: str = ""
+    prompt: LongString = ""
+    # user messages, which are sent one after another
+    messages: list[str] = []
+
+
+class SessionInfo(BaseModel):
+    model: str = ""
+    last_used: float = 0
+    num_messages: int = 0
+    memory_size: int = 0
+
+
+class Catalog(BaseModel):
+    sessions: dict[str, SessionInfo] = {}
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from .locking import file_lock
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[list[str]], np.ndarray]
+
+
+class OllamaEmbedder:
+    def __init__(self, model: str, keep_alive: str):
+        self.model = model
+        self.keep_alive = keep_alive
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        import ollama
+
+        from .backends import pool
+
+        client = ollama.Client(pool.primary)
+        response = client.embed(self.model, texts, keep_alive=self.keep_alive)
+        return np.array(response.embeddings, dtype=np.float32)
+
+
+class HashEmbedder:
+    """
+    Local stand-in for an embedding model.
+
+    Words are hashed into a fixed number of buckets, so texts that share many
+    words have a large cosine similarity. Used in tests and without a server.
+    """
+
+    model = "hash"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        result = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                h = hashlib.blake2b(word.encode(), digest_size=4).digest()
+                result[i, int.from_bytes(h, "little") % self.dim] += 1
+        return result
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norm > 0, norm, 1)
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of normalized embedding vectors of one embedding model.
+
+    Vectors are appended to a raw float32 file which is accessed as a
+    memory-mapped array, the content hashes of the embedded texts are appended
+    to an id file with one hash per line. A text is only embedded once, no
+    matter in which session or at which position it occurs.
+    """
+
+    def __init__(self, directory: Path, embed: Embedder, batch_size: int = 64):
+        stem = re.sub(r"[^\w.-]", "_", embed.model)
+        self.vector_file = directory / f"{stem}.f32"
+        self.id_file = directory / f"{stem}.ids"
+        self.meta_file = directory / f"{stem}.json"
+        # the files are shared by all instances of the program
+        self.lock_file = directory / f"{stem}.lock"
+        self.embed = embed
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.dim = 0
+        self.rows: dict[str, int] = {}
+        self._matrix = None
+        with file_lock(self.lock_file):
+            self._load()
+
+    def _load(self):
+        # must be called with the file lock held
+        if not (self.meta_file.exists() and self.id_file.exists()):
+            return
+        with self.meta_file.open(encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        with self.id_file.open(encoding="utf-8") as f:
+            hashes = f.read().split()
+        # vectors are written before ids, drop incomplete entries of a crash
+        size = self.vector_file.stat().st_size if self.vector_file.exists() else 0
+        n = min(len(hashes), size // (4 * self.dim))
+        if n != len(hashes) or size != n * 4 * self.dim:
+            logger.warning(f"repairing embedding cache {self.vector_file}")
+            with self.vector_file.open("ab") as f:
+                f.truncate(n * 4 * self.dim)
+            with self.id_file.open("w", encoding="utf-8") as f:
+                f.write("".join(f"{h}\n" for h in hashes[:n]))
+        self.rows = {h: i for i, h in enumerate(hashes[:n])}
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None or len(self._matrix) != len(self):
+            if len(self) == 0:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._matrix = np.memmap(
+                self.vector_file,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self), self.dim),
+            )
+        return self._matrix
+
+    def lookup(self, texts: list[str]) -> np.ndarray:
+        """Return rows of the texts in the cache, embed texts not yet cached."""
+        hashes = [content_hash(t) for t in texts]
+        with self._lock:
+            new = {}
+            for h, t in zip(hashes, texts):
+                if h not in self.rows and h not in new:
+                    new[h] = t
+            if new:
+                self._add(list(new), list(new.values()))
+            return np.array([self.rows[h] for h in hashes], dtype=np.intp)
+
+    def _add(self, hashes: list[str], texts: list[str]):
+        logger.info(f"embedding {len(texts)} texts with {self.embed.model}")
+        for i in range(0, len(texts), self.batch_size):
+            vectors = normalize(self.embed(texts[i : i + self.batch_size]))
+            batch = hashes[i : i + self.batch_size]
+            with file_lock(self.lock_file):
+                # another instance may have appended in the meantime
+                self._load()
+                keep = [k for k, h in enumerate(batch) if h not in self.rows]
+                if not keep:
+                    continue
+                if self.dim == 0:
+                    self.dim = vectors.shape[1]
+                    self.vector_file.unlink(missing_ok=True)
+                    self.id_file.unlink(missing_ok=True)
+                    with self.meta_file.open("w", encoding="utf-8") as f:
+                        json.dump({"model": self.embed.model, "dim": self.dim}, f)
+                with self.vector_file.open("ab") as f:
+                    f.write(vectors[keep].astype(np.float32).tobytes())
+                with self.id_file.open("a", encoding="utf-8") as f:
+                    f.write("".join(f"{batch[k]}\n" for k in keep))
+                for k in keep:
+                    self.rows[batch[k]] = len(self.rows)
+
+    def top_k(
+        self, query: np.ndarray, k: int, rows: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Return indices of the k vectors most similar to the query, best first.
+
+        If rows are given, only these are searched and the returned indices
+        refer to rows, otherwise all vectors are searched.
+        """
+        matrix = self.matrix
+        if rows is not None:
+            matrix = matrix[rows]
+        if len(matrix) == 0 or k <= 0:
+            return np.zeros(0, dtype=np.intp)
+        scores = matrix @ normalize(query)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        return best[np.argsort(-scores[best])]
@@ -0,0 +1,174 @@
+"""
+Export sessions to Markdown, HTML, or JSONL.
+
+Sessions are read from disk and written message by message, the whole
+session is never converted into one string. Without Qt widgets, so that
+sessions can be exported from the command line.
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import logging
+from importlib.resources import files
+from pathlib import Path
+from typing import Callable, TextIO
+
+from PySide6 import QtCore
+
+from . import MEMORY_DIRECTORY, SESSION_DIRECTORY, SETTINGS_FILE_NAME
+from .data_models import Memory, Session, Settings
+from .io import load
+from .parser import parse
+from .util import format_character
+
+logger = logging.getLogger(__name__)
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+<style>
+:root {{ {theme} }}
+{css}
+</style>
+</head>
+<body>
+"""
+
+
+def write_markdown(session: Session, memory: Memory, f: TextIO, settings: Settings):
+    f.write(f"# {session.name}\n\n")
+    characters = "\n\n".join(
+        # one level lower, below the section title
+        f"#{format_character(c, format='md')}"
+        for c in memory.characters
+    )
+    for title, text in (
+        ("World", memory.world),
+        ("Characters", characters),
+        ("Story", memory.story),
+    ):
+        if text:
+            f.write(f"## {title}\n\n{text.strip()}\n\n")
+    f.write("## Chat\n\n")
+    for role, content in memory.messages.items():
+        if content:
+            f.write(f"**{role.capitalize()}:**\n\n{content.strip()}\n\n")
+
+
+def write_html(session: Session, memory: Memory, f: TextIO, settings: Settings):
+    # same look as the chat in the application
+    css = files("plaitime").joinpath("assets").joinpath("chat.css").read_text()
+    theme = {
+        "--font-family": json.dumps(settings.font.family),
+        "--font-size": f"{settings.font.size}pt",
+        "--user-color": settings.colors.user,
+        "--assistant-color": settings.colors.assistant,
+        "--em-color": settings.colors.em,
+    }
+    f.write(
+        HTML_HEAD.format(
+            title=html.escape(session.name),
+            theme=" ".join(f"{k}: {v};" for (k, v) in theme.items()),
+            css=css,
+        )
+    )
+    for role, content in memory.messages.items():
+        if content:
+            f.write(f'<p class="{role}">{parse(content)}</p>\n')
+    f.write("</body>\n</html>\n")
+
+
+def write_jsonl(session: Session, memory: Memory, f: TextIO, settings: Settings):
+    # one line per session, in the chat format used for fine-tuning
+    f.write('{"messages": [')
+    sep = ""
+    if session.prompt:
+        f.write(json.dumps({"role": "system", "content": session.prompt}))
+        sep = ", "
+    for role, content in memory.messages.items():
+        f.write(sep + json.dumps({"role": role, "content": content}))
+        sep = ", "
+    f.write("]}\n")
+
+
+FORMATS = {"md": write_markdown, "html": write_html, "jsonl": write_jsonl}
+
+
+def session_names(directory: Path) -> list[str]:
+    return sorted(p.stem for p in directory.glob("*.json"))
+
+
+def export_session(name: str, filename: Path, format: str, settings: Settings):
+    """Write session name from disk to filename."""
+    write = FORMATS[format]
+    session = load(SESSION_DIRECTORY / f"{name}.json", Session)
+    memory = load(MEMORY_DIRECTORY / f"{name}.json", Memory)
+    logger.info(f"exporting {name!r} to {filename}")
+    tmp = filename.with_name(f"{filename.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        write(session, memory, f, settings)
+    tmp.replace(filename)
+
+
+class ExportThread(QtCore.QThread):
+    """Export sessions in the background, after pending saves are written."""
+
+    error = QtCore.Signal(str)
+
+    def __init__(
+        self,
+        jobs: list[tuple[str, Path]],
+        format: str,
+        settings: Settings,
+        flush: Callable[[], None] | None = None,
+    ):
+        super().__init__()
+        self.jobs = jobs
+        self.format = format
+        self.settings = settings
+        self.flush = flush
+
+    def run(self):
+        if self.flush is not None:
+            self.flush()
+        for name, filename in self.jobs:
+            try:
+                export_session(name, filename, self.format, self.settings)
+            except (OSError, UnicodeError) as e:
+                self.error.emit(f"Exporting {name!r} failed: {e}")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="plaitime export", description="Export sessions to files."
+    )
+    parser.add_argument("sessions", nargs="*", help="sessions to export, default all")
+    parser.add_argument("-f", "--format", choices=list(FORMATS), default="md")
+    parser.add_argument(
+        "-o", "--output", type=Path, default=Path("."), help="output directory"
+    )
+    args = parser.parse_args(argv)
+
+    settings = load(SETTINGS_FILE_NAME, Settings)
+    names = args.sessions or session_names(SESSION_DIRECTORY)
+    args.output.mkdir(parents=True, exist_ok=True)
+    status = 0
+    for name in names:
+        if not (SESSION_DIRECTORY / f"{name}.json").exists():
+            logger.error(f"session {name!r} does not exist")
+            status = 1
+            continue
+        filename = args.output / f"{name}.{args.format}"
+        try:
+            export_session(name, filename, args.format, settings)
+        except (OSError, UnicodeError) as e:
+            logger.error(f"exporting {name!r} failed: {e}")
+            status = 1
+            continue
+        print(filename)
+    return status
@@ -1,17 +1,31 @@
-import ollama
-from PySide6 import QtCore
+from __future__ import annotations
+
+import functools
 import logging
-from typing import Generator
-from .data_models import Message
+import random
+import threading
+from collections.abc import Generator
+from typing import Callable
+
+from PySide6 import QtCore
+
 from pydantic import BaseModel
 
+from .data_models import Message
+from .reply_cache import ReplyCache
+
 logger = logging.getLogger(__name__)
 
 
 class GeneratorThread(QtCore.QThread):
+    # chat jobs are interactive, others run on another host if possible
+    kind: str = "chat"
     interrupt: bool = False
+    failed: bool = False
     nextChunk = QtCore.Signal(str)
     error = QtCore.Signal(str)
+    # emitted last with the final state, "finished", "cancelled" or "failed"
+    ended = QtCore.Signal(str)
 
     def __init__(
         self,
@@ -25,10 +39,68 @@ class GeneratorThread(QtCore.QThread):
         self.keep_alive = keep_alive
         self.options = options
         self.payload = payload
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.interrupt:
+            return "cancelled"
+        if self.failed:
+            return "failed"
+        return "finished"
+
+    def cancel(self):
+        """
+        Stop generating without waiting for the thread.
+
+        The request is aborted, also while the server processes the prompt.
+        """
+        with self._lock:
+            self.interrupt = True
+            client = self._client
+        if client is not None:
+            client.abort()
+
+    def _connect(self, host: str | None):
+        # each request has its own client, so that it can be aborted
+        from .client import Client
+
+        client = Client(host)
+        with self._lock:
+            self._client = client
+            if self.interrupt:
+                client.abort()
+        return client
+
+    def _responses(self):
+        import httpx
+        from ollama import ResponseError
+
+        from .backends import pool
+
+        hosts = pool.select(self.model, self.kind)
+        for i, host in enumerate(hosts):
+            started = False
+            try:
+                with pool.job(host, self.model, self.kind):
+                    for response in self._generator(self._connect(host)):
+                        started = True
+                        yield response
+                return
+            except (httpx.ConnectError, httpx.ConnectTimeout, ResponseError) as e:
+                # fail over, unless the host has sent a response already;
+                # ResponseError is only retried if the model is missing
+                if isinstance(e, ResponseError) and e.status_code != 404:
+                    raise
+                if started or self.interrupt or i == len(hosts) - 1:
+                    raise
+                pool.mark_failed(host)
+                logger.warning(f"request to {host} failed, trying next host: {e}")
 
     def chunks(self):
         try:
-            for response in self._generator():
+            for response in self._responses():
                 if self.interrupt:
                     return
                 if "message" in response:
@@ -37,6 +109,9 @@ class GeneratorThread(QtCore.QThread):
                     chunk = response["response"]
                 yield chunk
         except Exception:
+            if self.interrupt:
+                # aborting the request raises an error
+                return
             import traceback
 
             error = traceback.format_exc(chain=False)
@@ -44,9 +119,17 @@ class GeneratorThread(QtCore.QThread):
             error_message = f"""Error generating response{error}\n
 Please make sure that the model '{self.model}' is available.
 You can run 'ollama run {self.model}' in terminal to check."""
-            self.error.emit(error_message)
+            self._fail(error_message)
+
+    def _fail(self, message: str):
+        self.failed = True
+        self.error.emit(message)
 
     def run(self):
+        self._run()
+        self.ended.emit(self.state)
+
+    def _run(self):
         for chunk in self.chunks():
             self.nextChunk.emit(chunk)
 
@@ -58,7 +141,7 @@ You can run 'ollama run {self.model}' in terminal to check."""
             "options": self.options,
         }
 
-    def _generator(self) -> Generator:
+    def _generator(self, client) -> Generator:
         NotImplemented
 
 
@@ -68,6 +151,8 @@ class Chat(GeneratorThread):
         model: str,
         messages: list[Message],
         keep_alive: str,
+        recall: Callable[[], str] | None = None,
+        characters: Callable[[], str] | None = None,
         **options: dict[str, str | int | float],
     ):
         super().__init__(
@@ -76,23 +161,200 @@ class Chat(GeneratorThread):
             options,
             [{"role": m.role, "content": m.content} for m in messages],
         )
+        self.recall = recall
+        self.characters = characters
+
+    def _generator(self, client):
+        yield from client.chat(**self._kwargs(), messages=self._messages())
+
+    def _messages(self):
+        import httpx
+        from ollama import ResponseError
+
+        # recall runs here, because embedding may take a while
+        parts = []
+        for title, fn, what in (
+            ("Recollections", self.recall, "recalling older messages"),
+            ("More characters", self.characters, "finding similar characters"),
+        ):
+            if fn is None:
+                continue
+            try:
+                text = fn()
+            except (
+                ResponseError,
+                ConnectionError,
+                httpx.HTTPError,
+                OSError,
+                ValueError,
+            ) as e:
+                # the embedding model or its cache is not available
+                logger.warning(f"{what} failed: {e}")
+                continue
+            if text:
+                parts.append(f"# {title}\n\n{text}")
+        if not parts:
+            return self.payload
+        messages = list(self.payload)
+        if not messages or messages[0]["role"] != "system":
+            messages.insert(0, {"role": "system", "content": ""})
+        system = messages[0]["content"]
+        messages[0] = {
+            "role": "system",
+            "content": "\n\n".join([system, *parts]).strip(),
+        }
+        return messages
+
+
+class Candidates(QtCore.QObject):
+    """
+    Generate alternative responses in parallel.
 
-    def _generator(self):
-        yield from ollama.chat(**self._kwargs(), messages=self.payload)
+    The chats use different seeds. ollama runs them concurrently if it has
+    enough parallel slots (OLLAMA_NUM_PARALLEL), otherwise one after another.
+    """
+
+    nextChunk = QtCore.Signal(int, str)
+    error = QtCore.Signal(str)
+    finished = QtCore.Signal()
+    ended = QtCore.Signal(str)
+
+    def __init__(
+        self,
+        num: int,
+        model: str,
+        messages: list[Message],
+        keep_alive: str,
+        recall: Callable[[], str] | None = None,
+        characters: Callable[[], str] | None = None,
+        seed: int | None = None,
+        **options: dict[str, str | int | float],
+    ):
+        super().__init__()
+        if seed is None:
+            seed = random.randrange(2**31)
+        if recall is not None:
+            recall = _once(recall)
+        if characters is not None:
+            characters = _once(characters)
+        self.threads = [
+            Chat(
+                model,
+                messages,
+                keep_alive,
+                recall,
+                characters,
+                seed=seed + k,
+                **options,
+            )
+            for k in range(num)
+        ]
+        self._running = 0
+        self._error = False
+        for k, thread in enumerate(self.threads):
+            # the threads live until all of them have finished
+            thread.setParent(self)
+            thread.nextChunk.connect(functools.partial(self.nextChunk.emit, k))
+            thread.error.connect(self._thread_error)
+            thread.finished.connect(self._thread_finished)
+
+    @property
+    def interrupt(self) -> bool:
+        return all(t.interrupt for t in self.threads)
+
+    @property
+    def state(self) -> str:
+        if self.interrupt:
+            return "cancelled"
+        if self._error:
+            return "failed"
+        return "finished"
+
+    def cancel(self):
+        for thread in self.threads:
+            thread.cancel()
+
+    def start(self):
+        self._running = len(self.threads)
+        for thread in self.threads:
+            thread.start()
+
+    def isRunning(self) -> bool:
+        return any(t.isRunning() for t in self.threads)
+
+    def wait(self):
+        for thread in self.threads:
+            thread.wait()
+
+    @QtCore.Slot(str)
+    def _thread_error(self, message: str):
+        # all chats fail for the same reason, report it once
+        if not self._error:
+            self._error = True
+            self.error.emit(message)
+
+    @QtCore.Slot()
+    def _thread_finished(self):
+        self._running -= 1
+        if self._running == 0:
+            self.ended.emit(self.state)
+            self.finished.emit()
+
+
+def _once(fn: Callable[[], str]) -> Callable[[], str]:
+    # recall is shared by the candidates and should run only once
+    lock = threading.Lock()
+    result = []
+
+    def wrapped():
+        with lock:
+            if not result:
+                result.append(fn())
+        return result[0]
+
+    return wrapped
 
 
 class Generate(GeneratorThread):
+    kind = "extraction"
+
     def __init__(
         self,
         model: str,
         prompt: str,
         keep_alive: str,
+        cache: ReplyCache | None = None,
+        refresh: bool = False,
         **options: dict[str, str | int | float],
     ):
         super().__init__(model, keep_alive, options, prompt)
+        self.cache = cache
+        # ignore a cached reply, a new one replaces it
+        self.refresh = refresh
 
-    def _generator(self):
-        yield from ollama.generate(**self._kwargs(), prompt=self.payload)
+    def cache_key(self) -> str:
+        return ReplyCache.key(self.model, self.payload, self.options)
+
+    def chunks(self):
+        if self.cache is None:
+            yield from super().chunks()
+            return
+        key = self.cache_key()
+        if not self.refresh:
+            reply = self.cache.get(key)
+            if reply is not None:
+                logger.info("using cached reply")
+                yield reply
+                return
+        reply = ""
+        for chunk in super().chunks():
+            reply += chunk
+            yield chunk
+        if not (self.interrupt or self.failed):
+            self.cache.put(key, self.model, reply)
+
+    def _generator(self, client):
+        yield from client.generate(**self._kwargs(), prompt=self.payload)
 
 
 class GenerateData(Generate):
@@ -105,13 +367,15 @@ class GenerateData(Generate):
         prompt: str,
         keep_alive: str,
         retries: int = 3,
+        cache: ReplyCache | None = None,
+        refresh: bool = False,
         **options: dict[str, str | int | float],
     ):
-        super().__init__(model, prompt, keep_alive, **options)
+        super().__init__(model, prompt, keep_alive, cache, refresh, **options)
         self.data_model = data_model
         self.retries = retries
 
-    def run(self):
+    def _run(self):
         last_exc = None
         for trial in range(self.retries):
             response = ""
@@ -125,9 +389,12 @@ class GenerateData(Generate):
             try:
                 clipped = response[response.index("{") : response.rindex("}") + 1]
                 self.result = self.data_model.model_validate_json(clipped)
-                return None
-            except Exception as e:
+                return
+            except ValueError as e:
+                # no braces or invalid data, ValidationError is a ValueError
                 last_exc = e
                 logger.warning(f"JSON parsing failed (trial={trial}): {e}")
-        if self.result is None:
-            self.error.emit(f"Parsing JSON failed, last error: {last_exc}")
+                # the next trial should not get the same reply from the cache
+                self.refresh = True
+        if self.result is None and not self.interrupt:
+            self._fail(f"Parsing JSON failed, last error: {last_exc}")
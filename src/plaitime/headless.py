@@ -0,0 +1,292 @@
+"""
+Run sessions without the GUI.
+
+Scripted conversations are replayed and information is extracted from saved
+sessions, several sessions at once. The generators and the context window are
+the same as in the GUI, but no widgets are used, so that this runs on servers
+without a display.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TextIO
+
+from . import (
+    CHARACTERS_PROMPT,
+    MEMORY_DIRECTORY,
+    REPLY_CACHE_FILE_NAME,
+    SESSION_DIRECTORY,
+    SETTINGS_FILE_NAME,
+    STORY_PROMPT,
+    WORLD_PROMPT,
+)
+from .backends import get_context_size, parse_hosts, pool
+from .budget import build_context
+from .data_models import CharacterList, Memory, Message, Script, Session, Settings
+from .export import session_names
+from .generator import Chat, Generate, GenerateData, GeneratorThread
+from .io import load, save
+from .relevance import scene_characters
+from .reply_cache import ReplyCache
+from .util import dialog_text, format_character, integrate_characters
+
+logger = logging.getLogger(__name__)
+
+EXTRACTIONS = ("characters", "world", "story")
+
+
+class Output:
+    """
+    Write results of several threads to a stream.
+
+    With stream=True, chunks are written as they arrive, which is only
+    readable for a single job. Otherwise, each result is written as a line of
+    JSON when it is complete.
+    """
+
+    def __init__(self, file: TextIO, stream: bool):
+        self.file = file
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def chunk(self, text: str):
+        if self.stream:
+            with self._lock:
+                self.file.write(text)
+                self.file.flush()
+
+    def record(self, **fields):
+        if not self.stream:
+            with self._lock:
+                self.file.write(json.dumps(fields) + "\n")
+                self.file.flush()
+
+
+class Runner:
+    """Replay scripts and extract information, the methods run in parallel."""
+
+    def __init__(self, settings: Settings, output: Output, model: str = ""):
+        self.settings = settings
+        self.output = output
+        # replaces the model of the sessions, if not empty
+        self.model = model
+        size = settings.reply_cache_size * 1_000_000
+        self.cache = ReplyCache(REPLY_CACHE_FILE_NAME, size) if size else None
+        self._context_sizes = {}
+
+    def context_size(self, model: str) -> int:
+        if model not in self._context_sizes:
+            self._context_sizes[model] = get_context_size(model)
+        size = self._context_sizes[model]
+        return int(size * (1 - self.settings.context_margin_fraction / 100))
+
+    def context_window(
+        self, session: Session, memory: Memory, prompt: bool = True
+    ) -> list[Message]:
+        """Return the messages for the model, like MainWindow.context_window."""
+        size = self.context_size(session.model)
+        if not prompt:
+            window, _ = build_context(
+                "", [], "", "", memory.messages, size, self.settings.budget
+            )
+            return window
+        characters, _ = scene_characters(
+            memory.characters, memory.messages, self.settings.character_scene
+        )
+        window, _ = build_context(
+            session.prompt,
+            characters,
+            memory.world,
+            memory.story,
+            memory.messages,
+            size,
+            self.settings.budget,
+            memory.summaries,
+        )
+        return window
+
+    def dialog_text(
+        self, session: Session, memory: Memory, include_story: bool = True
+    ) -> str:
+        items = (
+            (m.role, m.content)
+            for m in self.context_window(session, memory, prompt=False)
+        )
+        characters = "\n\n".join(
+            format_character(c, format="md") for c in memory.characters
+        )
+        story = memory.story if include_story else ""
+        return dialog_text(items, memory.world, characters, story)
+
+    def generate(self, name: str, generator: GeneratorThread) -> str | None:
+        """Run generator in this thread, return the reply or None on errors."""
+        chunks = []
+        errors = []
+        generator.nextChunk.connect(chunks.append)
+        generator.nextChunk.connect(self.output.chunk)
+        generator.error.connect(errors.append)
+        generator.run()
+        if errors:
+            logger.error(f"{name}: {errors[-1]}")
+            return None
+        return "".join(chunks)
+
+    def replay(self, path: Path) -> tuple[Session, Memory] | None:
+        """Send the messages of a script and generate the responses."""
+        name = path.stem
+        if not path.exists():
+            logger.error(f"script {path} does not exist")
+            return None
+        script = load(path, Script)
+        if script.session:
+            filename = SESSION_DIRECTORY / f"{script.session}.json"
+            if not filename.exists():
+                logger.error(f"{name}: session {script.session!r} does not exist")
+                return None
+            session = load(filename, Session)
+            memory = load(MEMORY_DIRECTORY / f"{script.session}.json", Memory)
+            session.name = name
+        else:
+            session = Session(name=name)
+            memory = Memory()
+        session.model = self.model or script.model or session.model
+        session.prompt = script.prompt or session.prompt
+
+        for text in script.messages:
+            memory.messages.append("user", text)
+            self.output.chunk(f"User:\n{text}\n\nAssistant:\n")
+            chat = Chat(
+                session.model,
+                self.context_window(session, memory),
+                self.settings.llm_timeout,
+                temperature=session.temperature,
+            )
+            reply = self.generate(name, chat)
+            if reply is None:
+                return None
+            reply = reply.strip()
+            memory.messages.append("assistant", reply)
+            self.output.chunk("\n\n")
+            self.output.record(
+                session=name,
+                index=len(memory.messages) - 1,
+                role="assistant",
+                content=reply,
+            )
+        return session, memory
+
+    def extract(self, name: str, kind: str) -> tuple[Session, Memory] | None:
+        """Extract characters, world, or story from a saved session."""
+        filename = SESSION_DIRECTORY / f"{name}.json"
+        if not filename.exists():
+            logger.error(f"session {name!r} does not exist")
+            return None
+        session = load(filename, Session)
+        memory = load(MEMORY_DIRECTORY / f"{name}.json", Memory)
+        if kind == "story":
+            prompt = STORY_PROMPT.format(
+                dialog=self.dialog_text(session, memory, include_story=False),
+                summary=memory.story,
+            )
+        else:
+            template = CHARACTERS_PROMPT if kind == "characters" else WORLD_PROMPT
+            prompt = template.format(dialog=self.dialog_text(session, memory))
+        args = (
+            self.model or session.extraction_model,
+            prompt,
+            self.settings.llm_timeout,
+        )
+        options = {"temperature": session.extraction_temperature}
+        if kind == "characters":
+            generator = GenerateData(CharacterList, *args, cache=self.cache, **options)
+        else:
+            generator = Generate(*args, cache=self.cache, **options)
+        reply = self.generate(name, generator)
+        self.output.chunk("\n")
+        if reply is None:
+            return None
+        if kind == "characters":
+            integrate_characters(memory.characters, generator.result.characters)
+            result = generator.result.model_dump()
+        else:
+            result = reply.strip()
+            old = getattr(memory, kind).rstrip()
+            setattr(memory, kind, "\n\n".join(x for x in (old, result) if x))
+        self.output.record(session=name, kind=kind, result=result)
+        return session, memory
+
+
+def save_results(
+    results: list[tuple[Session, Memory] | None], output: Path, codec: str
+):
+    # same layout as the base directory, so that the results can be opened
+    for directory in ("sessions", "memories"):
+        (output / directory).mkdir(parents=True, exist_ok=True)
+    for result in results:
+        if result is None:
+            continue
+        session, memory = result
+        save(session, output / "sessions" / f"{session.name}.json", codec)
+        save(memory, output / "memories" / f"{session.name}.json", codec)
+
+
+def _parser(command: str, description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog=f"plaitime {command}", description=description
+    )
+    parser.add_argument(
+        "-m", "--model", default="", help="model to use instead of the session's"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=4, help="sessions processed in parallel"
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, help="save sessions and memories here"
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="write a line of JSON per result, also for a single session",
+    )
+    return parser
+
+
+def _execute(args, jobs: list, function) -> int:
+    settings = load(SETTINGS_FILE_NAME, Settings)
+    pool.configure(parse_hosts(settings.hosts))
+    output = Output(sys.stdout, stream=len(jobs) == 1 and not args.jsonl)
+    runner = Runner(settings, output, args.model)
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+        results = list(executor.map(lambda job: function(runner, *job), jobs))
+    if args.output is not None:
+        save_results(results, args.output, settings.codec)
+    return 0 if all(r is not None for r in results) else 1
+
+
+def run(argv: list[str]) -> int:
+    parser = _parser("run", "Replay scripted conversations.")
+    parser.add_argument(
+        "scripts",
+        nargs="+",
+        type=Path,
+        help="JSON files with the optional fields session, model, prompt, "
+        "and messages, a list of user messages",
+    )
+    args = parser.parse_args(argv)
+    return _execute(args, [(p,) for p in args.scripts], Runner.replay)
+
+
+def extract(argv: list[str]) -> int:
+    parser = _parser("extract", "Extract information from saved sessions.")
+    parser.add_argument("kind", choices=EXTRACTIONS)
+    parser.add_argument("sessions", nargs="*", help="sessions, default all")
+    args = parser.parse_args(argv)
+    names = args.sessions or session_names(SESSION_DIRECTORY)
+    return _execute(args, [(n, args.kind) for n in names], Runner.extract)
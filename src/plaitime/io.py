@@ -1,39 +1,80 @@
-from pydantic import BaseModel
-from pathlib import Path
-from logging.handlers import RotatingFileHandler
 import logging
-from typing import TypeVar
-from contextlib import closing
 import os
-import psutil
+import shutil
+from pathlib import Path
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+from .codec import decode, encode
+from .locking import acquire
 
 T = TypeVar("T", bound=BaseModel)
 
 logger = logging.getLogger(__name__)
 
 
-def save(obj: BaseModel, filename: Path):
-    data = obj.model_dump_json(indent=4)
+BACKUP_COUNT = 9
+
+
+def save(obj: BaseModel, filename: Path, codec: str = "json", backup: bool = False):
+    """
+    Write obj to filename atomically.
+
+    With backup, the previous versions are kept as filename.1 to filename.9.
+    """
+    try:
+        data = encode(obj, codec)
+    except ImportError as e:
+        logger.warning(f"codec {codec!r} not available ({e}), using json")
+        data = encode(obj, "json")
     if filename.exists():
-        with open(filename, encoding="utf-8") as f:
-            if data == f.read().rstrip():
+        with open(filename, "rb") as f:
+            if data == f.read():
                 logger.info(f"no change with respect to {filename}")
                 return
     logger.info(f"saving to {filename}")
-    with closing(
-        RotatingFileHandler(
-            filename, mode="w", encoding="utf-8", maxBytes=1, backupCount=9
-        )
-    ) as handler:
-        record = logging.makeLogRecord({"msg": data})
-        handler.emit(record)
+    # write to a temporary file first, so that a crash cannot leave a
+    # partially written file behind
+    tmp = filename.with_name(f"{filename.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if backup:
+        rotate(filename)
+    os.replace(tmp, filename)
+
+
+def backups(filename: Path) -> list[Path]:
+    """Return the existing backups of a file, newest first."""
+    candidates = (
+        filename.with_name(f"{filename.name}.{i}") for i in range(1, BACKUP_COUNT + 1)
+    )
+    return [p for p in candidates if p.exists()]
+
+
+def rotate(filename: Path):
+    """Keep the previous versions of a file as filename.1 to filename.9."""
+    if not filename.exists():
+        return
+    for i in reversed(range(1, BACKUP_COUNT)):
+        backup = filename.with_name(f"{filename.name}.{i}")
+        if backup.exists():
+            os.replace(backup, filename.with_name(f"{filename.name}.{i + 1}"))
+    # the file itself stays in place until it is replaced
+    backup = filename.with_name(f"{filename.name}.1")
+    try:
+        os.link(filename, backup)
+    except OSError:
+        shutil.copyfile(filename, backup)
 
 
 def load(filename: Path, cls: T) -> T:
     if filename.exists():
         try:
-            with open(filename, encoding="utf-8") as f:
-                return cls.model_validate_json(f.read())
+            with open(filename, "rb") as f:
+                return decode(f.read(), cls)
         except Exception as e:
             logger.error(e)
     else:
@@ -43,29 +84,21 @@ def load(filename: Path, cls: T) -> T:
 
 def lock_and_load(filename: Path, cls: T) -> T:
     if filename.exists():
-        lock_file = filename.with_suffix(".lock")
-        if lock_file.exists():
-            with lock_file.open() as f:
-                pid = int(f.read())
-            active_pids = [proc.pid for proc in psutil.process_iter(attrs=["pid"])]
-            if pid in active_pids:
-                raise IOError("file is locked")
-        with lock_file.open("w") as f:
-            f.write(str(os.getpid()))
+        acquire(filename.with_suffix(".lock"))
     return load(filename, cls)
 
 
-def save_and_release(obj: BaseModel, filename: Path):
-    pid = os.getpid()
-    lock_file = filename.with_suffix(".lock")
-    if lock_file.exists():
-        with lock_file.open() as f:
-            if f.read() != str(pid):
-                raise IOError("cannot save to locked file of another process")
-        lock_file.unlink()
-    save(obj, filename)
-
-
 def rename(filename: Path, stem: str):
+    """Rename a file and its backups to a new stem, if they exist."""
     new_name = filename.parent / f"{stem}{filename.suffix}"
-    filename.rename(new_name)
+    for backup in backups(filename):
+        backup.rename(new_name.with_name(f"{new_name.name}{backup.suffix}"))
+    if filename.exists():
+        filename.rename(new_name)
+
+
+def remove(filename: Path):
+    """Remove a file and its backups."""
+    for backup in backups(filename):
+        backup.unlink(missing_ok=True)
+    filename.unlink(missing_ok=True)
@@ -0,0 +1,43 @@
+import logging
+from pathlib import Path
+
+from PySide6 import QtCore
+
+from . import MEMORY_DIRECTORY
+from .data_models import Memory, PartialResponse
+from .io import load
+
+logger = logging.getLogger(__name__)
+
+
+def partial_response_file(name: str) -> Path:
+    return MEMORY_DIRECTORY / f"{name}.partial"
+
+
+def load_memory(name: str) -> Memory:
+    memory = load(MEMORY_DIRECTORY / f"{name}.json", Memory)
+    path = partial_response_file(name)
+    if path.exists():
+        try:
+            with open(path, encoding="utf-8") as f:
+                partial = PartialResponse.model_validate_json(f.read())
+            if partial.index == len(memory.messages):
+                logger.warning(f"recovering unsaved response from {path}")
+                memory.messages.append(partial.message.role, partial.message.content)
+        except (OSError, ValueError) as e:
+            # unreadable or invalid, ValidationError is a ValueError
+            logger.error(e)
+    return memory
+
+
+class MemoryLoader(QtCore.QThread):
+    """Reads and validates the memory of a session in the background."""
+
+    loaded = QtCore.Signal(object)
+
+    def __init__(self, name: str, parent=None):
+        super().__init__(parent)
+        self.name = name
+
+    def run(self):
+        self.loaded.emit(load_memory(self.name))
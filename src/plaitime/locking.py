@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import contextlib
+import logging
+import math
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class LockedError(IOError):
+    pass
+
+
+def process_start_time(pid: int) -> float | None:
+    """Return the start time of a running process or None if there is none."""
+    import psutil
+
+    try:
+        return psutil.Process(pid).create_time()
+    except psutil.NoSuchProcess:
+        return None
+    except psutil.AccessDenied:
+        # process exists, but belongs to someone else
+        return float("nan")
+
+
+def owner(lock_file: Path) -> tuple[int, float | None] | None:
+    """
+    Return PID and start time of the process that holds the lock.
+
+    Lock files written by older versions only contain the PID, the start time
+    is None in that case. Returns None if there is no lock file.
+    """
+    try:
+        with lock_file.open() as f:
+            fields = f.read().split()
+    except FileNotFoundError:
+        return None
+    try:
+        pid = int(fields[0])
+        start_time = float(fields[1]) if len(fields) > 1 else None
+    except (IndexError, ValueError):
+        logger.warning(f"{lock_file} is corrupted")
+        return 0, None
+    return pid, start_time
+
+
+def is_alive(pid: int, start_time: float | None) -> bool:
+    """
+    Check whether the process that created a lock is still running.
+
+    Comparing the start time detects locks of crashed processes whose PID has been
+    reused by an unrelated process.
+    """
+    if pid <= 0:
+        return False
+    t = process_start_time(pid)
+    if t is None:
+        return False
+    if start_time is None or math.isnan(t):  # unknown start time or no access
+        return True
+    return abs(t - start_time) < 0.01
+
+
+def is_stale(lock_file: Path) -> bool:
+    o = owner(lock_file)
+    return o is not None and not is_alive(*o)
+
+
+@contextlib.contextmanager
+def file_lock(path: Path, timeout: float = 60.0):
+    """
+    Hold an exclusive advisory lock on path, wait until it is available.
+
+    The operating system releases the lock when the process dies, so unlike
+    lock files it cannot become stale. On Windows, LockedError is raised if
+    the lock is not available within timeout seconds.
+    """
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise LockedError(f"timed out waiting for {path}") from None
+                    time.sleep(0.1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _guard(directory: Path):
+    # serializes changes of the lock files in a directory, so that two
+    # processes cannot both replace the same stale lock
+    return file_lock(directory / ".guard")
+
+
+def acquire(lock_file: Path):
+    """
+    Atomically acquire the lock for this process.
+
+    Stale locks are replaced. Acquiring a lock held by this process succeeds.
+    Raises LockedError if the lock is held by another running process.
+    """
+    pid = os.getpid()
+    with _guard(lock_file.parent):
+        o = owner(lock_file)
+        if o is not None:
+            if o[0] == pid:
+                return
+            if is_alive(*o):
+                raise LockedError(f"{lock_file} is locked by process {o[0]}")
+            logger.info(f"replacing stale lock {lock_file}")
+        # the lock file appears with its content, other processes never see
+        # an empty lock file, which would look stale
+        tmp = lock_file.with_name(f"{lock_file.name}.{pid}")
+        tmp.write_text(f"{pid} {process_start_time(pid)!r}")
+        os.replace(tmp, lock_file)
+    # processes of older versions do not use the guard
+    o = owner(lock_file)
+    if o is None or o[0] != pid:
+        raise LockedError(f"failed to acquire {lock_file}")
+
+
+def check(lock_file: Path):
+    """Raise LockedError if the lock is held by another running process."""
+    o = owner(lock_file)
+    if o is not None and o[0] != os.getpid() and is_alive(*o):
+        raise LockedError(f"{lock_file} is locked by process {o[0]}")
+
+
+def release(lock_file: Path):
+    """
+    Remove the lock of this process.
+
+    Raises LockedError if the lock is held by another running process.
+    """
+    with _guard(lock_file.parent):
+        check(lock_file)
+        lock_file.unlink(missing_ok=True)
+
+
+def remove_stale_locks(directory: Path) -> int:
+    n = 0
+    with _guard(directory):
+        for lock_file in directory.glob("*.lock"):
+            if is_stale(lock_file):
+                lock_file.unlink(missing_ok=True)
+                n += 1
+    if n:
+        logger.info(f"removed {n} stale lock(s) in {directory}")
+    return n
@@ -1,25 +1,73 @@
+import argparse
+import importlib
 import logging
 import sys
 from importlib.resources import files
 
-from PySide6 import QtGui, QtWidgets
+from . import make_directories
+from .profiling import profile
 
-from .main_window import MainWindow
+COMMANDS = {
+    "export": (".export", "main"),
+    "run": (".headless", "run"),
+    "extract": (".headless", "extract"),
+}
 
 
 def main():
+    if sys.argv[1:2] and sys.argv[1] in COMMANDS:
+        # command line tools, which do not need the GUI
+        module, name = COMMANDS[sys.argv[1]]
+        logging.basicConfig(level=logging.WARNING)
+        make_directories()
+        command = getattr(importlib.import_module(module, __package__), name)
+        sys.exit(command(sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(prog="plaitime")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print the duration of the startup phases and exit",
+    )
+    args, qt_args = parser.parse_known_args()
+
     logging.basicConfig(level=logging.INFO)
     logging.getLogger("httpx").setLevel(logging.WARNING)
 
-    app = QtWidgets.QApplication(sys.argv)
+    make_directories()
+
+    with profile.phase("import PySide6"):
+        from PySide6 import QtCore, QtGui, QtWidgets
+
+    # required by QtWebEngine, which is only imported after the window is shown
+    QtCore.QCoreApplication.setAttribute(
+        QtCore.Qt.ApplicationAttribute.AA_ShareOpenGLContexts
+    )
+    with profile.phase("create QApplication"):
+        app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
 
-    window = MainWindow()
+    with profile.phase("import main_window"):
+        from .main_window import MainWindow
+
+    with profile.phase("create MainWindow"):
+        window = MainWindow()
 
     icon_path = files("plaitime").joinpath("assets").joinpath("plaitime.png")
     icon = QtGui.QIcon(str(icon_path))
     window.setWindowIcon(icon)
 
-    window.show()
+    with profile.phase("show MainWindow"):
+        window.show()
+
+    if args.profile_startup:
+
+        @QtCore.Slot()
+        def report():
+            print(profile.report(), file=sys.stderr)
+            window.save_all()
+            app.quit()
+
+        window.ready.connect(report)
 
     app.lastWindowClosed.connect(window.save_all)
     sys.exit(app.exec())
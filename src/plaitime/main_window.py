@@ -1,42 +1,108 @@
+from __future__ import annotations
+
+import functools
 import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-import ollama
-from ollama import ResponseError
 from PySide6 import QtCore, QtGui, QtWidgets
 
 from . import (
-    SETTINGS_FILE_NAME,
-    SESSION_DIRECTORY,
+    CATALOG_FILE_NAME,
+    CHARACTERS_PROMPT,
+    EMBEDDING_DIRECTORY,
     MEMORY_DIRECTORY,
-    CHARACTERS_PER_TOKEN,
+    REPLY_CACHE_FILE_NAME,
+    SEARCH_INDEX_FILE_NAME,
+    SESSION_DIRECTORY,
+    SETTINGS_FILE_NAME,
     STORY_PROMPT,
-    CHARACTERS_PROMPT,
     WORLD_PROMPT,
 )
-from .session_bar import SessionBar
-from .config_dialog import ConfigDialog
-from .data_models import Settings, Session, Memory, Message, CharacterList
-from .generator import Chat, Generate, GenerateData
+from .backends import get_context_size, parse_hosts, pool
+from .budget import build_context, num_chat_messages, num_tokens
+from .catalog import SessionCatalog, file_size
+from .character_widget import CharacterWidget
 from .chat_widget import ChatWidget
-from .util import estimate_num_tokens, get_session_names
-from .io import load, save, lock_and_load, save_and_release, rename
+from .config_dialog import ConfigDialog
+from .data_models import (
+    Character,
+    CharacterList,
+    Memory,
+    Message,
+    PartialResponse,
+    Session,
+    Settings,
+)
+from .export import FORMATS, ExportThread
+from .generator import Candidates, Chat, Generate, GenerateData, GeneratorThread
+from .io import load, lock_and_load, remove, rename, save
+from .loader import MemoryLoader, partial_response_file
+from .locking import check, remove_stale_locks
+from .locking import release as release_lock
+from .message_store import MessageStore
+from .profiling import profile
+from .reply_cache import ReplyCache
+from .search import MESSAGE_KINDS, SearchIndex
+from .search_dialog import SearchDialog
+from .session_bar import SessionBar
+from .summarizer import Summarizer
 from .text_edit import TextEditor
-from .character_widget import CharacterWidget
+from .util import dialog_text
+from .warmup import Warmup
+from .writer import Writer
+
+if TYPE_CHECKING:
+    from .embedding import EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
 
+class ContextSizeQuery(QtCore.QThread):
+    """Asks the hosts for the context size of a model in the background."""
+
+    result = QtCore.Signal(str, int)
+
+    def __init__(self, model: str, parent=None):
+        super().__init__(parent)
+        self.model = model
+
+    def run(self):
+        self.result.emit(self.model, get_context_size(self.model))
+
+
 class MainWindow(QtWidgets.QMainWindow):
+    # emitted when a session is loaded and can be used
+    ready = QtCore.Signal()
+    # emitted by the writer thread with session name and memory size
+    memorySaved = QtCore.Signal(str, int)
     settings: Settings
     session: Session
-    generator: Chat | Generate | GenerateData | None
+    generator: Chat | Candidates | Generate | GenerateData | None
+    loader: MemoryLoader | None
     cancel_mode: str
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.settings = load(SETTINGS_FILE_NAME, Settings)
+        pool.configure(parse_hosts(self.settings.hosts))
+        self.catalog = SessionCatalog(CATALOG_FILE_NAME)
+        self.search_index = SearchIndex(SEARCH_INDEX_FILE_NAME)
+        self.writer = Writer()
+        self.warmup = Warmup(parent=self)
+        self.summarizer = Summarizer(self)
+        self.summarizer.summaryAdded.connect(self.summary_added)
+        self.search_dialog = None
+        self._embedding_cache = None
+        self._reply_cache = None
+        self._turn_context = None
+        # model -> context size, asking the hosts is slow
+        self.context_sizes = {}
         self.session = Session()
         self.generator = None
+        self.loader = None
+        self.pending_scroll = -1
+        self.response_index = -1
         self.cancel_mode = "rewind"
 
         self.setWindowTitle("Plaitime")
@@ -47,17 +113,33 @@ class MainWindow(QtWidgets.QMainWindow):
         settings_action = QtGui.QAction("Settings", self)
         settings_action.triggered.connect(self.configure_settings)
         menu_bar.addAction(settings_action)
+        search_action = QtGui.QAction("Search", self)
+        search_action.setShortcut(QtGui.QKeySequence.StandardKey.Find)
+        search_action.triggered.connect(self.show_search)
+        menu_bar.addAction(search_action)
         session_menu = menu_bar.addMenu("Session")
         char_conf_action = session_menu.addAction("Configure")
         char_new_action = session_menu.addAction("New")
         char_del_action = session_menu.addAction("Delete")
+        export_action = session_menu.addAction("Export")
         char_conf_action.triggered.connect(self.configure_session)
         char_new_action.triggered.connect(self.new_session)
         char_del_action.triggered.connect(self.delete_session)
+        export_action.triggered.connect(self.export_session)
 
-        self.session_bar = SessionBar(self)
+        self.session_bar = SessionBar(self.catalog, self)
         menu_bar.setCornerWidget(self.session_bar)
         self.session_bar.sessionChanged.connect(self.switch_session)
+        # the catalog is saved whenever it changes
+        model = self.session_bar.model
+        for signal in (
+            model.dataChanged,
+            model.rowsInserted,
+            model.rowsRemoved,
+            model.modelReset,
+        ):
+            signal.connect(self.save_catalog)
+        self.memorySaved.connect(self.update_memory_size)
         self.session_bar.clipboard_button.clicked.connect(self.copy_to_clipboard)
 
         font = self.settings.font.qfont()
@@ -67,25 +149,39 @@ class MainWindow(QtWidgets.QMainWindow):
         )
         self.chat_widget.setFont(font)
         self.chat_widget.sendMessage.connect(self.generate_response)
+        self.chat_widget.inputChanged.connect(self.warmup_model)
         self.story_widget = TextEditor(self)
         self.story_widget.setFont(font)
         self.story_widget.generateClicked.connect(self.generate_story)
-        self.character_widget = CharacterWidget(self)
+        self.character_widget = CharacterWidget([], self)
         self.character_widget.setFont(font)
         self.character_widget.generateClicked.connect(self.generate_characters)
         self.world_widget = TextEditor(self)
         self.world_widget.setFont(font)
         self.world_widget.generateClicked.connect(self.generate_world)
 
-        tab_widget = QtWidgets.QTabWidget(self)
-        tab_widget.addTab(self.chat_widget, "Main")
-        tab_widget.addTab(self.story_widget, "Story")
-        tab_widget.addTab(self.character_widget, "Characters")
-        tab_widget.addTab(self.world_widget, "World")
-        self.setCentralWidget(tab_widget)
+        self.tab_widget = QtWidgets.QTabWidget(self)
+        self.tab_widget.addTab(self.chat_widget, "Main")
+        self.tab_widget.addTab(self.story_widget, "Story")
+        self.tab_widget.addTab(self.character_widget, "Characters")
+        self.tab_widget.addTab(self.world_widget, "World")
+        self.setCentralWidget(self.tab_widget)
+
+        # the expensive parts of the initialization run after the window
+        # is shown for the first time
+        self.chat_widget.disable()
+        QtCore.QTimer.singleShot(0, self.finish_startup)
 
-        # Must be at the end
-        self.load_session(self.settings.session)
+    @QtCore.Slot()
+    def finish_startup(self):
+        profile.mark("event loop started")
+        remove_stale_locks(SESSION_DIRECTORY)
+        with profile.phase("sync session catalog"):
+            self.catalog.sync(SESSION_DIRECTORY, MEMORY_DIRECTORY)
+            self.session_bar.model.reset()
+        self.chat_widget.init_chat_area()
+        with profile.phase("load session"):
+            self.load_session(self.settings.session)
 
     def save_settings(self):
         self.settings.session = self.session.name
@@ -95,74 +191,180 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def load_session(self, name: str):
         logger.info(f"loading session {name!r}")
-        names = get_session_names()
+        self.writer.flush()
+        names = self.catalog.names()
         if not name and names:
             name = names[0]
         try:
             self.session = lock_and_load(SESSION_DIRECTORY / f"{name}.json", Session)
-        except IOError:
+        except OSError as e:
+            logger.warning(e)
             self.session = Session()
         self.update_context_size()
         self.session_bar.set_session_manually(self.session.name)
+        # large memories are read in the background, the window stays responsive
+        self.chat_widget.disable()
+        self.loader = None
         if self.session.save_conversation:
-            memory = load(MEMORY_DIRECTORY / f"{self.session.name}.json", Memory)
+            self.loader = MemoryLoader(self.session.name, self)
+            self.loader.loaded.connect(self.memory_loaded)
+            self.loader.finished.connect(self.loader.deleteLater)
+            self.loader.start()
         else:
-            memory = Memory()
+            self.memory_loaded(Memory())
+
+    @QtCore.Slot(object)
+    def memory_loaded(self, memory: Memory):
+        if self.sender() is not self.loader:
+            # session was switched in the meantime
+            return
+        self.loader = None
+        # counted like in save_session, before a trailing user message is
+        # moved to the input box
+        num_messages = len(memory.messages)
+        # only the last messages are rendered, older ones on demand
         self.chat_widget.load_messages(memory.messages)
         self.story_widget.set_text(memory.story)
         self.character_widget.characters = memory.characters
         self.world_widget.set_text(memory.world)
+        self.summarizer.reset(memory.summaries)
+        self.session_bar.model.update(
+            self.session.name,
+            touch=True,
+            model=self.session.model,
+            num_messages=num_messages,
+        )
         self.session_bar.set_num_token(self.estimate_num_tokens())
-        # self.warmup_model()
-
-    def save_session(self):
+        self.chat_widget.enable()
+        if self.pending_scroll >= 0:
+            self.chat_widget.scroll_to(self.pending_scroll)
+            self.pending_scroll = -1
+        self.warmup_model(delay=0)
+        self.summarize()
+        self.ready.emit()
+
+    def save_session(self, release: bool = True):
+        """
+        Save session and memory in the background.
+
+        Snapshots are handed to the writer thread, which writes them after a
+        delay, so that this is cheap enough to be called before each response.
+        """
         c = self.session
         logger.info(f"saving session {c.name!r}")
+        path = SESSION_DIRECTORY / f"{c.name}.json"
+        lock_file = path.with_suffix(".lock")
         try:
-            save_and_release(c, SESSION_DIRECTORY / f"{c.name}.json")
-        except ValueError:
+            check(lock_file)
+        except OSError:
             logger.warning("cannot save session, locked by another instance")
             return
+        self.writer.submit(
+            c.model_copy(),
+            path,
+            # removed under the guard, like all changes of lock files
+            then=functools.partial(release_lock, lock_file) if release else None,
+            codec=self.settings.codec,
+            backup=True,
+        )
+        if self.loader is not None:
+            # memory is not loaded yet, saving it would overwrite it
+            return
 
         memory = Memory()
         memory.story = self.story_widget.text()
         memory.world = self.world_widget.text()
-        memory.characters = self.character_widget.characters
+        # integrating extracted characters modifies them in place
+        memory.characters = [x.model_copy() for x in self.character_widget.characters]
 
         if c.save_conversation:
-            widgets = self.chat_widget.messages
-            memory.messages = [Message(role=w.role, content=w.content) for w in widgets]
+            memory.messages = self.chat_widget.messages.copy()
+            memory.summaries = list(self.summarizer.summaries)
             user_text = self.chat_widget.get_user_text()
             if user_text:
-                memory.messages.append(Message(role="user", content=user_text))
+                memory.messages.append("user", user_text)
 
+        name = c.name
+        path = MEMORY_DIRECTORY / f"{name}.json"
         if memory == Memory():
             # remove file, if there is nothing to save
-            path = MEMORY_DIRECTORY / f"{c.name}.json"
-            path.unlink(missing_ok=True)
+            memory = None
+        self.writer.submit(
+            memory,
+            path,
+            then=functools.partial(self.memory_written, name, memory, path),
+            codec=self.settings.codec,
+            backup=True,
+        )
+        # the memory contains the response now, the writer removes the partial
+        # response only after the memory was written
+        self.writer.submit(None, partial_response_file(name))
+        self.session_bar.model.update(
+            c.name,
+            touch=True,
+            model=c.model,
+            num_messages=len(memory.messages) if memory else 0,
+        )
+
+    def memory_written(self, name: str, memory: Memory | None, path: Path):
+        # called on the writer thread
+        if memory is None:
+            self.search_index.remove(name)
         else:
-            save(memory, MEMORY_DIRECTORY / f"{c.name}.json")
+            self.search_index.update(name, memory, path.stat().st_mtime)
+        self.memorySaved.emit(name, file_size(path))
+
+    @QtCore.Slot(str, int)
+    def update_memory_size(self, name: str, size: int):
+        if name in self.catalog.sessions:
+            self.session_bar.model.update(name, memory_size=size)
+
+    @QtCore.Slot()
+    def save_catalog(self):
+        self.writer.submit(self.catalog.snapshot(), CATALOG_FILE_NAME)
 
     def rename_session(self, old_name: str, new_name: str):
         logger.info(f"renaming session from {old_name!r} to {new_name!r}")
+        self.writer.flush()
         files = [
             SESSION_DIRECTORY / f"{old_name}.json",
             SESSION_DIRECTORY / f"{old_name}.lock",
             MEMORY_DIRECTORY / f"{old_name}.json",
+            partial_response_file(old_name),
         ]
         for f in files:
-            if f.exists():
-                rename(f, new_name)
+            rename(f, new_name)
+        self.session_bar.model.rename(old_name, new_name)
+        self.search_index.rename(old_name, new_name)
 
     def save_all(self):
+        if self.loader is not None:
+            self.loader.wait()
+        self.warmup.close()
+        self.summarizer.close()
+        for thread in self.findChildren(ExportThread):
+            thread.wait()
+        for thread in self.findChildren(ContextSizeQuery):
+            thread.wait()
+        if self.search_dialog is not None:
+            self.search_dialog.sync_thread.wait()
+        for thread in self.findChildren(GeneratorThread):
+            thread.cancel()
+            thread.wait()
         self.save_settings()
         self.save_session()
+        # write everything before the application quits
+        self.writer.close()
+        # memory sizes reported by the writer update the catalog, which is
+        # written at once now
+        QtCore.QCoreApplication.sendPostedEvents(self)
 
     @QtCore.Slot()
     def configure_settings(self):
         dialog = ConfigDialog(self.settings, parent=self)
         if dialog.exec() == QtWidgets.QDialog.DialogCode.Accepted:
             self.settings = dialog.result()
+            pool.configure(parse_hosts(self.settings.hosts))
             # colors or font changed, we need to reload the web view
             font = self.settings.font.qfont()
             self.chat_widget.reload_style(font, self.settings.colors)
@@ -173,8 +375,9 @@ class MainWindow(QtWidgets.QMainWindow):
     @QtCore.Slot()
     def configure_session(self, new_session: bool = False):
         if new_session:
+            self.loader = None
             self.session = Session()
-            self.chat_widget.load_messages([])
+            self.chat_widget.load_messages(MessageStore())
             self.story_widget.set_text("")
             self.character_widget.characters = []
             self.world_widget.set_text("")
@@ -187,7 +390,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self.session_bar.set_session_manually(self.session.name)
             self.update_context_size()
             self.session_bar.set_num_token(self.estimate_num_tokens())
-            # self.warmup_model()
+            self.warmup_model(delay=0)
 
     @QtCore.Slot()
     def new_session(self):
@@ -198,17 +401,88 @@ class MainWindow(QtWidgets.QMainWindow):
     def delete_session(self):
         name = self.session.name
         logger.info(f"deleting session {name}")
+        self.writer.flush()
         for path in (
             SESSION_DIRECTORY / f"{name}.json",
             SESSION_DIRECTORY / f"{name}.lock",
             MEMORY_DIRECTORY / f"{name}.json",
+            partial_response_file(name),
         ):
-            path.unlink(missing_ok=True)
+            # backups would keep the content of the session on disk
+            remove(path)
+        self.session_bar.model.remove(name)
+        self.search_index.remove(name)
         self.load_session("")
 
+    @QtCore.Slot()
+    def export_session(self):
+        name = self.session.name
+        filename, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            "Export session",
+            f"{name}.md",
+            "Markdown (*.md);;HTML (*.html);;JSONL (*.jsonl)",
+        )
+        if not filename:
+            return
+        path = Path(filename)
+        format = path.suffix[1:]
+        if format not in FORMATS:
+            self.show_error_message(f"Unknown format {path.suffix!r}")
+            return
+        # the session is exported from disk, after it was saved
+        self.save_session(release=False)
+        thread = ExportThread(
+            [(name, path)], format, self.settings.model_copy(), self.writer.flush
+        )
+        thread.setParent(self)
+        thread.error.connect(self.show_error_message)
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+
     def update_context_size(self):
-        size = get_context_size(self.session.model)
-        self.session_bar.set_context_size(size)
+        # an unreachable host would block the window until it times out
+        model = self.session.model
+        if model in self.context_sizes:
+            self.session_bar.set_context_size(self.context_sizes[model])
+            return
+        query = ContextSizeQuery(model, self)
+        query.result.connect(self.context_size_received)
+        query.finished.connect(query.deleteLater)
+        query.start()
+
+    @QtCore.Slot(str, int)
+    def context_size_received(self, model: str, size: int):
+        if size:
+            self.context_sizes[model] = size
+        if model == self.session.model:
+            self.session_bar.set_context_size(size)
+            self.session_bar.set_num_token(self.estimate_num_tokens())
+
+    @QtCore.Slot()
+    def show_search(self):
+        if self.search_dialog is None:
+            self.search_dialog = SearchDialog(self.search_index, self)
+            self.search_dialog.jumpTo.connect(self.jump_to)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+
+    @QtCore.Slot(str, str, int)
+    def jump_to(self, session: str, kind: str, index: int):
+        if session != self.session.name:
+            self.switch_session(session)
+        if kind in MESSAGE_KINDS:
+            self.tab_widget.setCurrentWidget(self.chat_widget)
+            if self.loader is None:
+                self.chat_widget.scroll_to(index)
+            else:
+                self.pending_scroll = index
+        elif kind == "story":
+            self.tab_widget.setCurrentWidget(self.story_widget)
+        elif kind == "world":
+            self.tab_widget.setCurrentWidget(self.world_widget)
+        elif kind == "character":
+            self.tab_widget.setCurrentWidget(self.character_widget)
 
     @QtCore.Slot(str)
     def switch_session(self, name):
@@ -225,66 +499,253 @@ class MainWindow(QtWidgets.QMainWindow):
             self.chat_widget.rewind(partial)
 
     def generate_response(self):
+        self.warmup.cancel()
+        # the response should not wait for a summary, it is restarted later
+        self.summarizer.cancel()
         self.chat_widget.disable()
-        self.save_session()
+        self.save_session(release=False)
 
-        prompt = self.enhanced_prompt()
         # enable endless chatting by clipping the part of the conversation
-        # that the LLM can see, but keep the system prompt at all times
-        window = self.context_window(prompt)
+        # that the LLM can see, the system prompt is trimmed to its budget
+        recall_budget = self.recall_budget()
+        window = self.context_window(recall_budget)
         assert len(window) > 0
-        self.chat_widget.messages[-(len(window) - 1)].mark()
+        self.chat_widget.mark(-num_chat_messages(window))
 
-        self.cancel_generator(wait=True)
-        self.generator = Chat(
-            self.session.model,
-            window,
-            self.settings.llm_timeout,
-            temperature=self.session.temperature,
-        )
-        mw = self.chat_widget.add("assistant", "")
-        self.generator.nextChunk.connect(mw.add_chunk)
-        self.generator.error.connect(self.show_error_message)
-        self.generator.finished.connect(self.response_finished)
+        self.cancel_generator()
+        recall, characters = self.prompt_recall(window, recall_budget)
+        num = self.settings.num_candidates
+        self.response_index = self.chat_widget.add("assistant", "")
+        if num > 1:
+            self.generator = Candidates(
+                num,
+                self.session.model,
+                window,
+                self.settings.llm_timeout,
+                recall=recall,
+                characters=characters,
+                temperature=self.session.temperature,
+            )
+            self.chat_widget.start_candidates(self.response_index, num)
+            self.generator.nextChunk.connect(self.add_candidate_chunk)
+        else:
+            self.generator = Chat(
+                self.session.model,
+                window,
+                self.settings.llm_timeout,
+                recall=recall,
+                characters=characters,
+                temperature=self.session.temperature,
+            )
+            self.generator.nextChunk.connect(self.add_chunk)
+        self.generator.ended.connect(self.response_finished)
         self.cancel_mode = "rewind"
-        self.generator.start()
+        self.start_generator()
 
-    @QtCore.Slot()
-    def response_finished(self):
+    @QtCore.Slot(str)
+    def add_chunk(self, chunk: str):
+        # ignore late chunks of a generator that was replaced
+        if self.sender() is self.generator:
+            self.chat_widget.add_chunk(self.response_index, chunk)
+            self.save_partial_response()
+
+    @QtCore.Slot(int, str)
+    def add_candidate_chunk(self, candidate: int, chunk: str):
+        if self.sender() is self.generator:
+            self.chat_widget.add_candidate_chunk(candidate, chunk)
+            self.save_partial_response()
+
+    def save_partial_response(self):
+        # keep the response while it is generated to recover it after a crash
+        messages = self.chat_widget.messages
+        i = self.response_index
+        if self.session.save_conversation and i < len(messages):
+            partial = PartialResponse(index=i, message=messages[i])
+            self.writer.submit(partial, partial_response_file(self.session.name))
+
+    @QtCore.Slot(str)
+    def response_finished(self, state: str):
+        logger.info(f"response {state}")
+        if self.sender() is not self.generator and isinstance(
+            self.generator, (Chat, Candidates)
+        ):
+            # generator was cancelled and replaced, a newer response
+            # finishes the turn
+            return
         # trim excess whitespace
         messages = self.chat_widget.messages
-        messages[-1].set_content(messages[-1].content.strip())
+        if len(messages):
+            self.chat_widget.strip(-1)
 
         self.chat_widget.enable()
-        self.generator = None
         self.session_bar.set_num_token(self.estimate_num_tokens())
-
-    def context_window(self, prompt: str = ""):
-        window = []
-        num_token = len(prompt) / CHARACTERS_PER_TOKEN
-        for m in reversed(self.chat_widget.messages):
-            window.append(m)
-            num_token += len(m.content) / CHARACTERS_PER_TOKEN
-            if num_token > self.session_bar.context_size * (
-                1 - self.settings.context_margin_fraction / 100
-            ):
-                break
-        if prompt:
-            window.append(Message(role="system", content=prompt))
-        window.reverse()
+        self.save_session(release=False)
+
+    def context_window(self, reserve: int = 0, prompt: bool = True) -> list[Message]:
+        """
+        Return system prompt and the most recent messages that fit the context.
+
+        The context is split between the sections of the system prompt and the
+        chat according to Settings.budget. Without prompt, the chat may use
+        the whole context.
+        """
+        size = int(
+            self.session_bar.context_size
+            * (1 - self.settings.context_margin_fraction / 100)
+        )
+        messages = self.chat_widget.messages
+        if not prompt:
+            window, _ = build_context(
+                "", [], "", "", messages, size, self.settings.budget
+            )
+            return window
+        if size > 0:
+            size = max(size - reserve, 1)
+        characters, _ = self.scene_characters()
+        window, allocation = build_context(
+            self.session.prompt,
+            characters,
+            self.world_widget.text(),
+            self.story_widget.text(),
+            messages,
+            size,
+            self.settings.budget,
+            self.summarizer.summaries,
+        )
+        self.session_bar.set_allocation(allocation)
         return window
 
-    def enhanced_prompt(self):
-        prompt = self.session.prompt
-        parts = (
-            ("Characters", self.character_widget.text()),
-            ("World", self.world_widget.text()),
-            ("Story", self.story_widget.text()),
+    def scene_characters(self) -> tuple[list[Character], list[Character]]:
+        """
+        Return characters mentioned in the recent messages and the others.
+
+        Only the first are added to the prompt, the full list stays in memory.
+        """
+        from .relevance import scene_characters
+
+        return scene_characters(
+            self.character_widget.characters,
+            self.chat_widget.messages,
+            self.settings.character_scene,
         )
-        enhancement = "\n\n".join(
-            f"# {title}\n\n{text}" for (title, text) in parts if text
+
+    def summarize(self):
+        """
+        Summarize messages which are about to fall out of the window.
+
+        These are the messages before the window and the oldest quarter of
+        the window. Summaries are generated one after another in the
+        background, while no response is generated.
+        """
+        if self.loader is not None or self.generator:
+            return
+        messages = self.chat_widget.messages
+        window = self.context_window(self.recall_budget())
+        n = num_chat_messages(window)
+        self.summarizer.update(
+            messages,
+            len(messages) - n + n // 4,
+            self.settings.summary_chunk_size,
+            self.session.extraction_model,
+            self.settings.llm_timeout,
+            cache=self.reply_cache(),
+            temperature=self.session.extraction_temperature,
         )
-        return "\n\n".join((prompt, enhancement))
+
+    @QtCore.Slot()
+    def summary_added(self):
+        self.save_session(release=False)
+        self.summarize()
+
+    def recall_budget(self) -> int:
+        if not self.settings.embedding_model:
+            return 0
+        return self.settings.recall_token_budget
+
+    def prompt_recall(
+        self,
+        window: list[Message],
+        recall_budget: int,
+        text: str = "",
+        others: list[Character] | None = None,
+    ):
+        """
+        Return functions which recall older messages and similar characters.
+
+        The results are added to the system prompt by the generator. The
+        optional text is a user message which is not part of the window yet,
+        others are the characters outside the scene, if they are known.
+        """
+        if others is None:
+            _, others = self.scene_characters()
+        # characters which are not mentioned may still be similar to the scene
+        character_budget = recall_budget // 2 if others else 0
+        end = len(self.chat_widget.messages) - num_chat_messages(window)
+        recent = [m.content for m in window if m.role != "system"]
+        if text:
+            recent.append(text)
+        query = "\n\n".join(recent[-2:])
+        recall = self.long_term_memory(end, query, recall_budget - character_budget)
+        characters = self.character_recall(others, query, character_budget)
+        return recall, characters
+
+    def long_term_memory(self, end: int, query: str, num_token: int):
+        """
+        Return function which recalls messages that fell out of the window.
+
+        The function is called by the generator thread.
+        """
+        if num_token <= 0 or end <= 0:
+            return None
+        from .retrieval import recall_messages
+
+        # the passages are built by the generator thread from a copy
+        messages = self.chat_widget.messages.copy()
+        messages.truncate(end)
+        return functools.partial(
+            recall_messages, self.embedding_cache(), messages, query, num_token
+        )
+
+    def character_recall(self, characters: list[Character], query: str, num_token: int):
+        """
+        Return function which finds characters similar to the recent messages.
+
+        The function is called by the generator thread.
+        """
+        if num_token <= 0 or not characters:
+            return None
+        from .relevance import similar_characters
+
+        return functools.partial(
+            similar_characters,
+            self.embedding_cache(),
+            # copies, because the originals may be edited in the meantime
+            [c.model_copy() for c in characters],
+            query,
+            num_token,
+        )
+
+    def embedding_cache(self) -> EmbeddingCache | None:
+        model = self.settings.embedding_model
+        if not model:
+            return None
+        cache = self._embedding_cache
+        if cache is None or cache.embed.model != model:
+            from .embedding import EmbeddingCache, OllamaEmbedder
+
+            embed = OllamaEmbedder(model, self.settings.llm_timeout)
+            cache = EmbeddingCache(EMBEDDING_DIRECTORY, embed)
+            self._embedding_cache = cache
+        return cache
+
+    def reply_cache(self) -> ReplyCache | None:
+        size = self.settings.reply_cache_size * 1_000_000
+        if not size:
+            return None
+        if self._reply_cache is None:
+            self._reply_cache = ReplyCache(REPLY_CACHE_FILE_NAME, size)
+        self._reply_cache.max_size = size
+        return self._reply_cache
 
     def dialog_text(
         self,
@@ -296,12 +757,11 @@ class MainWindow(QtWidgets.QMainWindow):
         world = self.world_widget.text() if include_world else ""
         story = self.story_widget.text() if include_story else ""
         characters = self.character_widget.text() if include_characters else ""
-        dialog = "\n\n".join(
-            f"{m.role.capitalize()}:\n{m.content}"
-            for m in (self.context_window() if window else self.chat_widget.messages)
-            if m.content
-        )
-        return "\n\n".join(x for x in (world, characters, story, dialog) if x)
+        if window:
+            items = ((m.role, m.content) for m in self.context_window(prompt=False))
+        else:
+            items = self.chat_widget.messages.items()
+        return dialog_text(items, world, characters, story)
 
     @QtCore.Slot()
     def copy_to_clipboard(self):
@@ -316,69 +776,71 @@ class MainWindow(QtWidgets.QMainWindow):
         )
         logger.debug(f"generate_story\n{prompt}")
 
-        self.cancel_generator(wait=True)
+        self.cancel_generator()
         self.cancel_mode = "cancel"
         self.generator = Generate(
             self.session.extraction_model,
             prompt=prompt,
             keep_alive=self.settings.llm_timeout,
+            cache=self.reply_cache(),
+            refresh=refresh_requested(),
             temperature=self.session.extraction_temperature,
         )
         self.story_widget.move_cursor_to_end()
         self.story_widget.setEnabled(False)
         self.generator.nextChunk.connect(self.story_widget.add_chunk)
-        self.generator.error.connect(self.show_error_message)
-        self.generator.finished.connect(self.generate_finished)
-        self.generator.start()
+        self.generator.ended.connect(self.generate_finished)
+        self.start_generator()
 
     @QtCore.Slot()
     def generate_world(self):
         prompt = WORLD_PROMPT.format(dialog=self.dialog_text(window=True))
 
-        self.cancel_generator(wait=True)
+        self.cancel_generator()
         self.cancel_mode = "cancel"
         self.generator = Generate(
             self.session.extraction_model,
             prompt=prompt,
             keep_alive=self.settings.llm_timeout,
+            cache=self.reply_cache(),
+            refresh=refresh_requested(),
             temperature=self.session.extraction_temperature,
         )
         self.world_widget.move_cursor_to_end()
         self.world_widget.setEnabled(False)
         self.generator.nextChunk.connect(self.world_widget.add_chunk)
-        self.generator.error.connect(self.show_error_message)
-        self.generator.finished.connect(self.generate_finished)
-        self.generator.start()
+        self.generator.ended.connect(self.generate_finished)
+        self.start_generator()
 
     @QtCore.Slot()
     def generate_characters(self):
         prompt = CHARACTERS_PROMPT.format(dialog=self.dialog_text(window=True))
 
-        self.cancel_generator(wait=True)
+        self.cancel_generator()
         self.cancel_mode = "cancel"
         self.generator = GenerateData(
             CharacterList,
             model=self.session.extraction_model,
             prompt=prompt,
             keep_alive=self.settings.llm_timeout,
+            cache=self.reply_cache(),
+            refresh=refresh_requested(),
             temperature=self.session.extraction_temperature,
         )
         self.character_widget.setEnabled(False)
         self.generator.nextChunk.connect(self.character_widget.add_chunk)
-        self.generator.error.connect(self.show_error_message)
-        self.generator.finished.connect(self.generate_characters_finished)
-        self.generator.start()
+        self.generator.ended.connect(self.generate_characters_finished)
+        self.start_generator()
 
-    @QtCore.Slot()
-    def generate_characters_finished(self):
-        if self.generator.result:
-            self.character_widget.integrate(self.generator.result.characters)
-        self.generator = None
+    @QtCore.Slot(str)
+    def generate_characters_finished(self, state: str):
+        generator = self.sender()
+        if generator.result:
+            self.character_widget.integrate(generator.result.characters)
         self.character_widget.setEnabled(True)
 
-    @QtCore.Slot()
-    def generate_finished(self):
-        self.generator = None
+    @QtCore.Slot(str)
+    def generate_finished(self, state: str):
         self.story_widget.setEnabled(True)
         self.world_widget.setEnabled(True)
 
@@ -389,15 +851,28 @@ class MainWindow(QtWidgets.QMainWindow):
         msg.setText(message)
         msg.exec()
 
-    def cancel_generator(self, *, wait=False):
+    def start_generator(self):
+        # a cancelled generator keeps running until its request is aborted,
+        # so the window owns the thread until it has finished
+        generator = self.generator
+        generator.setParent(self)
+        generator.error.connect(self.show_error_message)
+        generator.finished.connect(self.generator_finished)
+        generator.finished.connect(generator.deleteLater)
+        generator.start()
+
+    @QtCore.Slot()
+    def generator_finished(self):
+        if self.sender() is self.generator:
+            self.generator = None
+            self.summarize()
+
+    def cancel_generator(self):
+        # does not wait, the generator reports the end with the ended signal
         self.cancel_mode = "rewind"
         if self.generator and self.generator.isRunning():
-            logger.info("Generator is running, interrupting...")
-            self.generator.interrupt = True
-            if wait:
-                logger.info("Waiting for generator to finish...")
-                self.generator.wait()
-                self.generator = None
+            logger.info("Generator is running, cancelling...")
+            self.generator.cancel()
 
     def keyPressEvent(self, event):
         key = event.key()
@@ -409,31 +884,60 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             super().keyPressEvent(event)
 
-    def warmup_model(self):
-        if self.generator and self.generator.isRunning():
-            return
-
-        self.generator = Generate(self.session.model, "", self.settings.llm_timeout)
+    @QtCore.Slot()
+    def warmup_model(self, delay: float | None = None):
+        if self.loader is None and not self.generator:
+            self.warmup.schedule(self.warmup_request, delay)
+
+    def warmup_request(self):
+        # called when the warmup starts, the input may have changed
+        if self.loader is not None or self.generator:
+            return None
+        recall_budget = self.recall_budget()
+        window, others = self.turn_context(recall_budget)
+        text = self.chat_widget.get_user_text()
+        # the prompt must be the same as in generate_response, otherwise the
+        # server cannot reuse the prefilled prompt
+        recall, characters = self.prompt_recall(window, recall_budget, text, others)
+        window = list(window)
+        if text:
+            window.append(Message(role="user", content=text))
+        options = {"recall": recall, "characters": characters}
+        return self.session.model, window, self.settings.llm_timeout, options
+
+    def turn_context(self, recall_budget: int):
+        """
+        Return the context window and the characters outside the scene.
+
+        The warmup asks for them while the user types, they only change with
+        the chat, the memory or the settings and are cached until then.
+        """
+        key = (
+            self.chat_widget.messages.revision,
+            recall_budget,
+            self.session_bar.context_size,
+            self.session.prompt,
+            self.settings,
+            self.character_widget.text(),
+            self.world_widget.text(),
+            self.story_widget.text(),
+            tuple(self.summarizer.summaries),
+        )
+        if self._turn_context is None or self._turn_context[0] != key:
+            window = self.context_window(recall_budget)
+            _, others = self.scene_characters()
+            self._turn_context = (key, window, others)
+        _, window, others = self._turn_context
+        return window, others
 
-        @QtCore.Slot()
-        def finished():
-            self.generator = None
+    def estimate_num_tokens(self):
+        # the prompt which is sent, with the characters of the scene and the
+        # sections clipped to their budget
+        window, _ = self.turn_context(self.recall_budget())
+        return sum(num_tokens(m.content) for m in window)
 
-        self.generator.finished.connect(finished)
-        self.generator.start()
 
-    def estimate_num_tokens(self):
-        return estimate_num_tokens(self.chat_widget.messages, self.enhanced_prompt())
-
-
-def get_context_size(model):
-    try:
-        response = ollama.show(model)
-        info = response.modelinfo
-        for key in info:
-            if "context_length" in key:
-                return info[key]
-        raise RuntimeError("context_length not found")
-        # model was removed
-    except ResponseError:
-        return 0
+def refresh_requested() -> bool:
+    # Shift+click on a generate button bypasses the reply cache
+    modifiers = QtWidgets.QApplication.keyboardModifiers()
+    return bool(modifiers & QtCore.Qt.KeyboardModifier.ShiftModifier)
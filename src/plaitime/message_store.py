@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Any
+
+from pydantic_core import core_schema
+
+if TYPE_CHECKING:
+    from .data_models import Message
+
+ROLES = ("system", "user", "assistant")
+ROLE_CODES = {role: i for i, role in enumerate(ROLES)}
+
+
+class MessageStore:
+    """
+    Compact list of chat messages.
+
+    Roles are stored as small integers in an array and contents in a list of
+    strings, no object is created per message. Can be used as a field type in
+    pydantic models, it is (de)serialized as a list of role/content dicts.
+    The revision is incremented by every change, so that results derived from
+    the messages can be cached.
+    """
+
+    __slots__ = ("contents", "revision", "roles")
+
+    def __init__(self, messages: Iterable[Message | dict[str, str]] = ()):
+        self.roles = array("b")
+        self.contents: list[str] = []
+        self.revision = 0
+        self.extend(messages)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def __getitem__(self, i: int) -> Message:
+        # imported here, data_models depends on this module
+        from .data_models import Message
+
+        return Message(role=ROLES[self.roles[i]], content=self.contents[i])
+
+    def __iter__(self) -> Iterator[Message]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MessageStore):
+            return self.roles == other.roles and self.contents == other.contents
+        if isinstance(other, list):
+            return self == MessageStore(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"MessageStore({self.to_list()!r})"
+
+    def role(self, i: int) -> str:
+        return ROLES[self.roles[i]]
+
+    def content(self, i: int) -> str:
+        return self.contents[i]
+
+    def items(self) -> Iterator[tuple[str, str]]:
+        for r, c in zip(self.roles, self.contents):
+            yield ROLES[r], c
+
+    def append(self, role: str, content: str):
+        self.roles.append(ROLE_CODES[role])
+        self.contents.append(content)
+        self.revision += 1
+
+    def extend(self, messages: Iterable[Message | dict[str, str]]):
+        for m in messages:
+            if isinstance(m, dict):
+                role, content = m.get("role"), m.get("content")
+            else:
+                role, content = getattr(m, "role", None), getattr(m, "content", None)
+            if role not in ROLE_CODES or not isinstance(content, str):
+                raise ValueError(f"invalid message {m!r}")
+            self.append(role, content)
+
+    def set_content(self, i: int, content: str):
+        self.contents[i] = content
+        self.revision += 1
+
+    def add_chunk(self, i: int, chunk: str):
+        self.contents[i] += chunk
+        self.revision += 1
+
+    def replace(self, start: int, stop: int, other: MessageStore):
+        self.roles[start:stop] = other.roles
+        self.contents[start:stop] = other.contents
+        self.revision += 1
+
+    def truncate(self, n: int):
+        del self.roles[n:]
+        del self.contents[n:]
+        self.revision += 1
+
+    def copy(self) -> MessageStore:
+        other = MessageStore()
+        other.roles = self.roles[:]
+        other.contents = self.contents[:]
+        return other
+
+    def to_list(self) -> list[dict[str, str]]:
+        return [{"role": r, "content": c} for (r, c) in self.items()]
+
+    @classmethod
+    def validate(cls, value: Any) -> MessageStore:
+        if isinstance(value, MessageStore):
+            return value
+        if not isinstance(value, (list, tuple)):
+            raise TypeError(f"expected list of messages, got {type(value)}")
+        return cls(value)
+
+    @classmethod
+    def _validate_field(cls, value: Any) -> MessageStore:
+        # pydantic only turns ValueError into a ValidationError
+        try:
+            return cls.validate(value)
+        except TypeError as e:
+            raise ValueError(str(e)) from e
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls._validate_field,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.to_list, when_used="always"
+            ),
+        )
@@ -1,6 +1,92 @@
+import html
+import re
+
+MARKER = re.compile(r"\*\*?|_")
+TAGS = {"*": "em", "_": "em", "**": "strong"}
+
+
+class Parser:
+    """
+    Incremental converter of text with markdown-style emphasis to HTML.
+
+    Supports *italic*, _italic_ and **bold**, newlines are converted to line
+    breaks and everything else is HTML-escaped. Text can be fed in chunks, the
+    parser keeps the open emphasis between calls. The HTML returned by each
+    call is self-contained, open tags are closed at the end and reopened by
+    the next call, so it can be appended to a streamed message.
+    """
+
+    def __init__(self):
+        self._open: list[str] = []  # markers of open emphasis, innermost last
+        self._emitted = 0  # number of open tags written in the current output
+        self._pending = ""  # markers held back until the next chunk
+        self._prev = ""  # last character that was processed
+
+    def feed(self, text: str, final: bool = False) -> str:
+        text = self._pending + text
+        self._pending = ""
+        if not final:
+            # trailing markers depend on the next character: "*" may become
+            # "**" and "_" closes emphasis only before a non-word character
+            n = len(text) - len(text.rstrip("*_"))
+            if n:
+                text, self._pending = text[:-n], text[-n:]
+
+        out: list[str] = []
+        self._emitted = 0
+        pos = 0
+        for match in MARKER.finditer(text):
+            start, end = match.span()
+            if start > pos:
+                self._text(out, escape(text[pos:start]))
+            prev = text[start - 1] if start else self._prev
+            next = text[end] if end < len(text) else ""
+            self._marker(out, match.group(), prev, next)
+            pos = end
+        if pos < len(text):
+            self._text(out, escape(text[pos:]))
+        if text:
+            self._prev = text[-1]
+        out.extend(f"</{TAGS[m]}>" for m in reversed(self._open[: self._emitted]))
+        return "".join(out)
+
+    def _text(self, out: list[str], code: str):
+        # opening tags are written lazily to drop empty emphasis
+        while self._emitted < len(self._open):
+            out.append(f"<{TAGS[self._open[self._emitted]]}>")
+            self._emitted += 1
+        out.append(code)
+
+    def _marker(self, out: list[str], marker: str, prev: str, next: str):
+        if marker == "_":
+            # underscores inside of words, like in snake_case, are literal
+            if "_" in self._open and prev and not prev.isspace() and not next.isalnum():
+                self._close(out, marker)
+            elif not prev.isalnum() and next and not next.isspace():
+                self._open.append(marker)
+            else:
+                self._text(out, marker)
+        elif marker in self._open:
+            self._close(out, marker)
+        else:
+            self._open.append(marker)
+
+    def _close(self, out: list[str], marker: str):
+        # emphasis opened after the marker is closed as well
+        i = len(self._open) - 1 - self._open[::-1].index(marker)
+        for j in reversed(range(i, self._emitted)):
+            out.append(f"</{TAGS[self._open[j]]}>")
+        del self._open[i:]
+        self._emitted = min(self._emitted, i)
+
+
+def escape(text: str) -> str:
+    return html.escape(text).replace("\n", "<br/>")
+
+
 def parse(text: str) -> str:
     """
-    Convert text containing markdown-style italic markers (*) and newlines to HTML.
+    Convert text containing markdown-style emphasis and newlines to HTML.
 
     Args:
         text (str): Input text
@@ -8,17 +94,4 @@ def parse(text: str) -> str:
     Returns:
         str: HTML code
     """
-    parts = text.split("*")
-
-    result = []
-    for i, part in enumerate(parts):
-        if not part:
-            continue
-        if i % 2 == 0:
-            # Even indices are normal text
-            result.append(part)
-        else:
-            # Odd indices are emphasized text
-            result.append(f"<em>{part}</em>")
-
-    return "".join(result).replace("\n", "<br/>").replace(r"'", r"\'")
+    return Parser().feed(text, final=True)
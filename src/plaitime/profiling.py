@@ -0,0 +1,42 @@
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """
+    Record wall-clock durations of named startup phases.
+
+    Phases are cheap to record, so they are always collected; the report is only
+    printed when the program is started with ``--profile-startup``.
+    """
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.phases: list[tuple[str, float, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            t1 = perf_counter()
+            self.phases.append((name, t0 - self.start, t1 - t0))
+            logger.debug(f"{name}: {(t1 - t0) * 1e3:.1f} ms")
+
+    def mark(self, name: str):
+        self.phases.append((name, perf_counter() - self.start, 0.0))
+
+    def report(self) -> str:
+        width = max((len(name) for name, _, _ in self.phases), default=0)
+        lines = [f"{'phase':{width}}  {'start':>9}  {'duration':>9}"]
+        for name, start, duration in self.phases:
+            d = f"{duration * 1e3:7.1f} ms" if duration else ""
+            lines.append(f"{name:{width}}  {start * 1e3:6.1f} ms  {d:>9}")
+        return "\n".join(lines)
+
+
+profile = StartupProfile()
@@ -0,0 +1,137 @@
+"""
+Find the characters which are relevant for the current scene.
+
+Characters are found by their names and aliases in the recent messages.
+Optionally, characters whose descriptions are similar to the recent messages
+are found with embeddings, which needs an embedding model.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING
+
+from . import CHARACTERS_PER_TOKEN
+from .data_models import Character
+from .message_store import MessageStore
+from .util import format_character
+
+if TYPE_CHECKING:
+    from .embedding import EmbeddingCache
+
+# cosine similarity above which a character is considered relevant
+SIMILARITY_THRESHOLD = 0.5
+
+# words which are not a name on their own, "King Arthur" is not "King"
+TITLES = {
+    "the", "lord", "lady", "king", "queen", "prince", "princess", "sir",
+    "dame", "mr", "mrs", "ms", "miss", "dr", "captain", "master", "mistress",
+}  # fmt: skip
+
+
+def aliases(character: Character) -> list[str]:
+    """Return name, aliases and the first name of a character."""
+    names = [character.name]
+    names += re.split(r"[,;]", character.aliases)
+    words = character.name.split()
+    if len(words) > 1 and words[0].lower() not in TITLES and len(words[0]) > 2:
+        names.append(words[0])
+    return [n.strip() for n in names if n.strip()]
+
+
+class CharacterIndex:
+    """Index of names and aliases, which finds characters mentioned in texts."""
+
+    def __init__(self, characters: list[Character]):
+        self.characters = characters
+        self.keys: dict[str, set[int]] = {}
+        for i, c in enumerate(characters):
+            for name in aliases(c):
+                self.keys.setdefault(name.lower(), set()).add(i)
+        names = sorted(self.keys, key=len, reverse=True)
+        self.pattern = (
+            re.compile(
+                r"\b(" + "|".join(re.escape(n) for n in names) + r")\b",
+                re.IGNORECASE,
+            )
+            if names
+            else None
+        )
+
+    def find(self, text: str) -> set[int]:
+        """Return indices of the characters mentioned in text."""
+        found = set()
+        if self.pattern is not None:
+            for match in self.pattern.finditer(text):
+                found |= self.keys[match.group(1).lower()]
+        return found
+
+    def last_mentions(self, messages: MessageStore) -> dict[int, int]:
+        """Return index of the last message which mentions each character."""
+        last = {}
+        if self.pattern is None:
+            return last
+        for i in reversed(range(len(messages))):
+            for k in self.find(messages.content(i)):
+                last.setdefault(k, i)
+            if len(last) == len(self.characters):
+                break
+        return last
+
+    def active(self, messages: MessageStore, scene: int) -> list[int]:
+        """Return indices of characters mentioned in the last scene messages."""
+        found = set()
+        for i in range(max(len(messages) - scene, 0), len(messages)):
+            found |= self.find(messages.content(i))
+        return sorted(found)
+
+
+def scene_characters(
+    characters: list[Character], messages: MessageStore, scene: int
+) -> tuple[list[Character], list[Character]]:
+    """
+    Return characters mentioned in the last scene messages and the others.
+
+    All characters are in the scene, if scene is 0.
+    """
+    if scene == 0:
+        return list(characters), []
+    active = set(CharacterIndex(characters).active(messages, scene))
+    return (
+        [c for i, c in enumerate(characters) if i in active],
+        [c for i, c in enumerate(characters) if i not in active],
+    )
+
+
+def similar_characters(
+    cache: EmbeddingCache,
+    characters: list[Character],
+    query: str,
+    num_token: int,
+    threshold: float = SIMILARITY_THRESHOLD,
+) -> str:
+    """
+    Return descriptions of the characters most similar to the query.
+
+    Only characters above the similarity threshold are returned, the most
+    similar first, within a token budget.
+    """
+    if not characters or not query or num_token <= 0:
+        return ""
+    # numpy is only needed with an embedding model
+    import numpy as np
+
+    sheets = [format_character(c, format="md") for c in characters]
+    rows = cache.lookup(sheets + [query])
+    matrix = cache.matrix
+    scores = matrix[rows[:-1]] @ matrix[rows[-1]]
+    selected = []
+    for i in np.argsort(-scores):
+        if scores[i] < threshold:
+            break
+        n = len(sheets[i]) / CHARACTERS_PER_TOKEN
+        if n > num_token:
+            continue
+        num_token -= n
+        selected.append(sheets[i])
+    return "\n\n".join(selected)
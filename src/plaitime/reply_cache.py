@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    key TEXT PRIMARY KEY, model TEXT, reply TEXT, size INTEGER, used REAL
+);
+CREATE INDEX IF NOT EXISTS replies_used ON replies (used);
+"""
+
+
+class ReplyCache:
+    """
+    Persistent cache of replies to extraction prompts.
+
+    Replies are keyed by model, prompt, and options. When the replies exceed
+    max_size bytes, the least recently used ones are removed.
+    """
+
+    def __init__(self, filename: Path, max_size: int):
+        self.filename = filename
+        self.max_size = max_size
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.filename, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    @staticmethod
+    def key(model: str, prompt: str, options: dict) -> str:
+        data = json.dumps([model, prompt, options], sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock, self._connect() as con:
+            row = con.execute(
+                "SELECT reply FROM replies WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            con.execute("UPDATE replies SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, model: str, reply: str):
+        size = len(reply.encode())
+        if size > self.max_size:
+            return
+        with self._lock, self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?, ?)",
+                (key, model, reply, size, time.time()),
+            )
+            total = con.execute("SELECT SUM(size) FROM replies").fetchone()[0]
+            evicted = 0
+            for old_key, old_size in con.execute(
+                "SELECT key, size FROM replies ORDER BY used"
+            ).fetchall():
+                if total <= self.max_size:
+                    break
+                con.execute("DELETE FROM replies WHERE key = ?", (old_key,))
+                total -= old_size
+                evicted += 1
+        if evicted:
+            logger.info(f"reply cache: {evicted} replies evicted")
+
+    def remove(self, key: str):
+        with self._lock, self._connect() as con:
+            con.execute("DELETE FROM replies WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock, self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM replies").fetchone()[0]
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from . import CHARACTERS_PER_TOKEN
+from .message_store import MessageStore
+
+if TYPE_CHECKING:
+    from .embedding import EmbeddingCache
+
+
+def recall(
+    cache: EmbeddingCache,
+    passages: list[str],
+    query: str,
+    num_token: int,
+    k: int = 20,
+) -> str:
+    """
+    Return the passages most relevant to the query within a token budget.
+
+    The selected passages are returned in their original order.
+    """
+    if not passages or not query or num_token <= 0:
+        return ""
+    rows = cache.lookup(passages + [query])
+    selected = []
+    for i in cache.top_k(cache.matrix[rows[-1]], k, rows[:-1]):
+        n = len(passages[i]) / CHARACTERS_PER_TOKEN
+        if n > num_token:
+            continue
+        num_token -= n
+        selected.append(i)
+    return "\n\n".join(passages[i] for i in sorted(selected))
+
+
+def recall_messages(
+    cache: EmbeddingCache, messages: MessageStore, query: str, num_token: int
+) -> str:
+    """Return the messages most relevant to the query, like recall."""
+    passages = [
+        f"{role.capitalize()}: {content}"
+        for (role, content) in messages.items()
+        if content
+    ]
+    return recall(cache, passages, query, num_token)
@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from .data_models import Memory
+from .io import load
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    session UNINDEXED, kind UNINDEXED, idx UNINDEXED, content
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    session TEXT, kind TEXT, idx INTEGER, hash TEXT, docid INTEGER,
+    PRIMARY KEY (session, kind, idx)
+);
+CREATE TABLE IF NOT EXISTS files (session TEXT PRIMARY KEY, mtime REAL);
+"""
+
+MESSAGE_KINDS = ("system", "user", "assistant")
+
+
+class Hit(BaseModel):
+    session: str
+    kind: str
+    index: int
+    snippet: str
+
+
+class SearchIndex:
+    """
+    Full-text index over the memories of all sessions.
+
+    The index is stored in a SQLite database with a FTS5 table. Each message is
+    a document with the role as kind, story, world, and characters are separate
+    documents. Updates are incremental, only documents whose content hash
+    changed are replaced.
+    """
+
+    def __init__(self, filename: Path):
+        self.filename = filename
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.filename, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def update(self, session: str, memory: Memory, mtime: float = 0):
+        docs = {(r, i): c for i, (r, c) in enumerate(memory.messages.items())}
+        docs["story", 0] = memory.story
+        docs["world", 0] = memory.world
+        for i, c in enumerate(memory.characters):
+            docs["character", i] = "\n".join(
+                f"{k}: {v}" for (k, v) in c.model_dump().items() if v
+            )
+
+        with self._lock, self._connect() as con:
+            existing = {
+                (kind, idx): (h, docid)
+                for (kind, idx, h, docid) in con.execute(
+                    "SELECT kind, idx, hash, docid FROM hashes WHERE session = ?",
+                    (session,),
+                )
+            }
+            removed = [
+                (key, docid) for key, (_, docid) in existing.items() if key not in docs
+            ]
+            inserted = []
+            for key, content in docs.items():
+                h = hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+                old = existing.get(key)
+                if old is not None:
+                    if old[0] == h:
+                        continue
+                    removed.append((key, old[1]))
+                if content:
+                    inserted.append((*key, content, h))
+            con.executemany(
+                "DELETE FROM documents WHERE rowid = ?", ((d,) for _, d in removed)
+            )
+            con.executemany(
+                "DELETE FROM hashes WHERE session = ? AND kind = ? AND idx = ?",
+                ((session, *key) for key, _ in removed),
+            )
+            for kind, idx, content, h in inserted:
+                docid = con.execute(
+                    "INSERT INTO documents (session, kind, idx, content) "
+                    "VALUES (?, ?, ?, ?)",
+                    (session, kind, idx, content),
+                ).lastrowid
+                con.execute(
+                    "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                    (session, kind, idx, h, docid),
+                )
+            con.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (session, mtime))
+        if removed or inserted:
+            logger.info(
+                f"search index {session!r}: "
+                f"{len(removed)} removed, {len(inserted)} inserted"
+            )
+
+    # the session column of the FTS table is not indexed, documents of a
+    # session are looked up via the hashes table
+
+    def remove(self, session: str):
+        with self._lock, self._connect() as con:
+            con.execute(
+                "DELETE FROM documents WHERE rowid IN "
+                "(SELECT docid FROM hashes WHERE session = ?)",
+                (session,),
+            )
+            con.execute("DELETE FROM hashes WHERE session = ?", (session,))
+            con.execute("DELETE FROM files WHERE session = ?", (session,))
+
+    def rename(self, old_name: str, new_name: str):
+        with self._lock, self._connect() as con:
+            con.execute(
+                "UPDATE documents SET session = ? WHERE rowid IN "
+                "(SELECT docid FROM hashes WHERE session = ?)",
+                (new_name, old_name),
+            )
+            for table in ("hashes", "files"):
+                con.execute(
+                    f"UPDATE {table} SET session = ? WHERE session = ?",
+                    (new_name, old_name),
+                )
+
+    def sync(self, memory_directory: Path):
+        """Index memory files which were modified since they were last indexed."""
+        with self._lock, self._connect() as con:
+            indexed = dict(con.execute("SELECT session, mtime FROM files"))
+        files = {p.stem: p for p in memory_directory.glob("*.json")}
+        for name in set(indexed) - set(files):
+            self.remove(name)
+        for name, path in files.items():
+            mtime = path.stat().st_mtime
+            if indexed.get(name) != mtime:
+                self.update(name, load(path, Memory), mtime)
+
+    def search(self, query: str, limit: int = 100) -> list[Hit]:
+        sql = (
+            "SELECT session, kind, idx, "
+            "snippet(documents, 3, '«', '»', '...', 16) "
+            "FROM documents WHERE documents MATCH ? ORDER BY rank LIMIT ?"
+        )
+        with self._lock:
+            con = self._connect()
+            try:
+                rows = con.execute(sql, (query, limit)).fetchall()
+            except sqlite3.OperationalError:
+                # not a valid FTS5 query, search for the plain words instead
+                quoted = " ".join(
+                    '"{}"'.format(w.replace('"', '""')) for w in query.split()
+                )
+                if not quoted:
+                    return []
+                rows = con.execute(sql, (quoted, limit)).fetchall()
+        return [
+            Hit(session=s, kind=k, index=i, snippet=snippet)
+            for (s, k, i, snippet) in rows
+        ]
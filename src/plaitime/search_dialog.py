@@ -0,0 +1,73 @@
+from PySide6 import QtCore, QtWidgets
+
+from . import MEMORY_DIRECTORY
+from .search import Hit, SearchIndex
+
+
+class IndexSyncThread(QtCore.QThread):
+    """Indexes memory files which changed while the program was not running."""
+
+    def __init__(self, index: SearchIndex, parent=None):
+        super().__init__(parent)
+        self.index = index
+
+    def run(self):
+        self.index.sync(MEMORY_DIRECTORY)
+
+
+class SearchDialog(QtWidgets.QDialog):
+    jumpTo = QtCore.Signal(str, str, int)
+
+    def __init__(self, index: SearchIndex, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search")
+        self.setMinimumSize(500, 400)
+        self.index = index
+        self.hits: list[Hit] = []
+
+        self.query = QtWidgets.QLineEdit(self)
+        self.query.setPlaceholderText("Indexing...")
+        self.query.setEnabled(False)
+        self.results = QtWidgets.QListWidget(self)
+        self.results.setWordWrap(True)
+        self.results.setAlternatingRowColors(True)
+        self.results.itemActivated.connect(self.activate)
+
+        # search only when the user stops typing
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(200)
+        self.timer.timeout.connect(self.search)
+        self.query.textChanged.connect(self.timer.start)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.query)
+        layout.addWidget(self.results)
+
+        # the dialog is created once, later changes are indexed when they
+        # are saved, so the directory is only scanned here
+        self.sync_thread = IndexSyncThread(index, self)
+        self.sync_thread.finished.connect(self.sync_finished)
+        self.sync_thread.start()
+
+    @QtCore.Slot()
+    def sync_finished(self):
+        self.query.setPlaceholderText("Search all sessions")
+        self.query.setEnabled(True)
+        self.query.setFocus()
+
+    @QtCore.Slot()
+    def search(self):
+        query = self.query.text().strip()
+        self.hits = self.index.search(query) if query else []
+        self.results.clear()
+        for hit in self.hits:
+            where = hit.kind.capitalize()
+            if hit.kind != "story" and hit.kind != "world":
+                where += f" {hit.index}"
+            self.results.addItem(f"{hit.session} | {where}\n{hit.snippet}")
+
+    @QtCore.Slot(QtWidgets.QListWidgetItem)
+    def activate(self, item: QtWidgets.QListWidgetItem):
+        hit = self.hits[self.results.row(item)]
+        self.jumpTo.emit(hit.session, hit.kind, hit.index)
@@ -1,12 +1,96 @@
-from PySide6 import QtWidgets, QtCore
-from .util import get_session_names
+from datetime import datetime
+
+from PySide6 import QtCore, QtWidgets
+
+from .catalog import SessionCatalog
+
+LAST_USED_ROLE = QtCore.Qt.ItemDataRole.UserRole
+
+
+class SessionModel(QtCore.QAbstractListModel):
+    def __init__(self, catalog: SessionCatalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.names = list(catalog.sessions)
+
+    def rowCount(self, parent=None):
+        return len(self.names)
+
+    def data(
+        self,
+        index: QtCore.QModelIndex,
+        role: QtCore.QModelRoleData = QtCore.Qt.ItemDataRole.DisplayRole,
+    ):
+        if not index.isValid() or (index.row() >= self.rowCount()):
+            return None
+
+        name = self.names[index.row()]
+        info = self.catalog.sessions[name]
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return name
+        if role == LAST_USED_ROLE:
+            return info.last_used
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            last_used = datetime.fromtimestamp(info.last_used).strftime("%c")
+            return (
+                f"model: {info.model}\n"
+                f"last used: {last_used}\n"
+                f"messages: {info.num_messages}\n"
+                f"memory: {info.memory_size / 1024:.0f} kB"
+            )
+        return None
+
+    def reset(self):
+        self.beginResetModel()
+        self.names = list(self.catalog.sessions)
+        self.endResetModel()
+
+    def update(self, name: str, touch: bool = False, **fields):
+        self.catalog.update(name, touch, **fields)
+        if name in self.names:
+            index = self.index(self.names.index(name))
+            self.dataChanged.emit(index, index)
+        else:
+            n = len(self.names)
+            self.beginInsertRows(QtCore.QModelIndex(), n, n)
+            self.names.append(name)
+            self.endInsertRows()
+
+    def rename(self, old_name: str, new_name: str):
+        self.catalog.rename(old_name, new_name)
+        if old_name in self.names:
+            i = self.names.index(old_name)
+            self.names[i] = new_name
+            index = self.index(i)
+            self.dataChanged.emit(index, index)
+        else:
+            self.update(new_name)
+
+    def remove(self, name: str):
+        self.catalog.remove(name)
+        if name in self.names:
+            i = self.names.index(name)
+            self.beginRemoveRows(QtCore.QModelIndex(), i, i)
+            del self.names[i]
+            self.endRemoveRows()
+
+
+class FilterProxyModel(QtCore.QSortFilterProxyModel):
+    current: str = ""
+
+    def filterAcceptsRow(self, row: int, parent: QtCore.QModelIndex):
+        # the current session is always shown
+        index = self.sourceModel().index(row, 0, parent)
+        if index.data() == self.current:
+            return True
+        return super().filterAcceptsRow(row, parent)
 
 
 class SessionBar(QtWidgets.QWidget):
     sessionChanged = QtCore.Signal(str)
     context_size: int = 0
 
-    def __init__(self, parent=None):
+    def __init__(self, catalog: SessionCatalog, parent=None):
         super().__init__(parent)
 
         size_policy = QtWidgets.QSizePolicy(
@@ -15,38 +99,61 @@ class SessionBar(QtWidgets.QWidget):
         )
         self.setSizePolicy(size_policy)
 
+        self.model = SessionModel(catalog, self)
+        self.proxy = FilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(LAST_USED_ROLE)
+        self.proxy.setFilterCaseSensitivity(QtCore.Qt.CaseSensitivity.CaseInsensitive)
+        self.proxy.sort(0, QtCore.Qt.SortOrder.DescendingOrder)
+
+        self.filter = QtWidgets.QLineEdit(self)
+        self.filter.setPlaceholderText("Filter")
+        self.filter.setClearButtonEnabled(True)
+        self.filter.setMaximumWidth(100)
+        self.filter.textChanged.connect(self.proxy.setFilterFixedString)
+
         self.session = QtWidgets.QComboBox(self)
         self.session.setSizePolicy(size_policy)
         self.session.setMinimumWidth(200)
-        self.session.currentTextChanged.connect(self.sessionChanged)
+        self.session.setModel(self.proxy)
+        self.session.textActivated.connect(self.sessionChanged)
 
         self.clipboard_button = QtWidgets.QPushButton("Clipboard")
         self.num_token = QtWidgets.QLabel(self)
+        self.allocation = QtWidgets.QLabel(self)
 
         layout = QtWidgets.QHBoxLayout(self)
+        layout.addWidget(self.filter)
         layout.addWidget(self.session)
         layout.addWidget(self.clipboard_button)
         layout.addWidget(self.num_token)
+        layout.addWidget(self.allocation)
         layout.setContentsMargins(0, 3, 5, 0)
 
     def set_session_manually(self, name: str):
-        names = get_session_names()
-        if name not in names:
-            names.append(name)
-        names.sort()
-        self.session.blockSignals(True)
-        self.session.clear()
-        self.session.addItems(names)
-        self.session.setCurrentText(name)
-        self.session.blockSignals(False)
+        if name not in self.model.names:
+            self.model.update(name)
+        self.proxy.current = name
+        self.proxy.invalidate()
+        self.session.setCurrentIndex(self.session.findText(name))
 
     def set_context_size(self, n: int):
         self.context_size = n
 
+    def set_allocation(self, allocation: dict[str, tuple[int, int]]):
+        """Show how the context is split, as used and needed tokens per section."""
+        lines = []
+        for name, (used, needed) in allocation.items():
+            trimmed = " (trimmed)" if used < needed else ""
+            lines.append(f"{name}: {used} of {needed} token{trimmed}")
+        self.num_token.setToolTip("\n".join(lines))
+        trimmed = [k for (k, (used, needed)) in allocation.items() if used < needed]
+        self.allocation.setText(f"trimmed: {', '.join(trimmed)}" if trimmed else "")
+
     def set_num_token(self, num: int):
         if num < 0:
             text = ""
         else:
             k = 1024
-            text = f"{num/k:.1f} (est) | {self.context_size/k:.0f} k token"
+            text = f"{num / k:.1f} (est) | {self.context_size / k:.0f} k token"
         self.num_token.setText(text)
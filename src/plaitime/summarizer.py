@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections.abc import Iterable
+
+from PySide6 import QtCore
+
+from . import ROLLUP_PROMPT, SUMMARY_PROMPT
+from .budget import num_tokens
+from .data_models import Summary
+from .generator import Generate
+from .message_store import MessageStore
+from .reply_cache import ReplyCache
+
+logger = logging.getLogger(__name__)
+
+# number of consecutive summaries which are rolled up into one of the next level
+FANOUT = 4
+
+
+def digest(parts: Iterable[str]) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def message_digest(messages: MessageStore, start: int, end: int) -> str:
+    return digest(
+        f"{messages.role(i)}: {messages.content(i)}" for i in range(start, end)
+    )
+
+
+def children(summaries: list[Summary], parent: Summary) -> list[Summary]:
+    """Return the summaries of the level below, which parent summarizes."""
+    return sorted(
+        (
+            s
+            for s in summaries
+            if s.level == parent.level - 1
+            and parent.start <= s.start
+            and s.end <= parent.end
+        ),
+        key=lambda s: s.start,
+    )
+
+
+def valid_summaries(summaries: list[Summary], messages: MessageStore) -> list[Summary]:
+    """Return the summaries which still match the messages."""
+    valid = [
+        s
+        for s in summaries
+        if s.level == 0
+        and s.end <= len(messages)
+        and s.digest == message_digest(messages, s.start, s.end)
+    ]
+    level = 1
+    while higher := [s for s in summaries if s.level == level]:
+        for s in higher:
+            if s.digest == digest(c.digest for c in children(valid, s)):
+                valid.append(s)
+        level += 1
+    return sorted(valid, key=lambda s: (s.level, s.start))
+
+
+def next_job(
+    messages: MessageStore, summaries: list[Summary], end: int, chunk_size: int
+) -> tuple[int, int, int] | None:
+    """
+    Return level, start, and end of the next summary, or None.
+
+    Messages before end are summarized in chunks of about chunk_size tokens,
+    FANOUT consecutive summaries of one level are rolled up into one summary
+    of the next level.
+    """
+    # the first gap in the summaries of messages
+    start = 0
+    limit = end
+    for s in sorted((s for s in summaries if s.level == 0), key=lambda s: s.start):
+        if s.start > start:
+            limit = min(end, s.start)
+            break
+        start = max(start, s.end)
+    n = 0
+    for i in range(start, limit):
+        n += num_tokens(messages.content(i))
+        if n >= chunk_size:
+            return 0, start, i + 1
+    if limit < end and start < limit:
+        # a gap between summaries is summarized, even if it is small
+        return 0, start, limit
+
+    level = 0
+    while current := sorted(
+        (s for s in summaries if s.level == level), key=lambda s: s.start
+    ):
+        higher = [s for s in summaries if s.level == level + 1]
+        run = []
+        for s in current:
+            if any(t.start <= s.start and s.end <= t.end for t in higher):
+                continue
+            if run and run[-1].end != s.start:
+                run = []
+            run.append(s)
+            if len(run) == FANOUT:
+                return level + 1, run[0].start, run[-1].end
+        level += 1
+    return None
+
+
+class Summarizer(QtCore.QObject):
+    """
+    Summarize messages in the background before they fall out of the window.
+
+    Summaries of messages are rolled up into summaries of summaries, so that
+    the summaries of a long chat stay short. One summary is generated at a
+    time, summaryAdded is emitted when it is done. After a summary has failed,
+    summarizing pauses until the model or the settings change.
+    """
+
+    summaryAdded = QtCore.Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.summaries: list[Summary] = []
+        self._thread = None
+        self._job = None
+        self._reply = ""
+        # model and settings of the current and of the last failed summary
+        self._config = None
+        self._failed_config = None
+
+    def reset(self, summaries: list[Summary]):
+        self.cancel()
+        self._thread = None
+        self._failed_config = None
+        self.summaries = list(summaries)
+
+    def update(
+        self,
+        messages: MessageStore,
+        end: int,
+        chunk_size: int,
+        model: str,
+        keep_alive: str,
+        cache: ReplyCache | None = None,
+        **options: dict[str, str | int | float],
+    ):
+        """Drop outdated summaries and start the next summary, if one is due."""
+        if self._thread is not None:
+            return
+        self.summaries = valid_summaries(self.summaries, messages)
+        if chunk_size <= 0 or not model:
+            return
+        config = (chunk_size, model, keep_alive, options)
+        if config == self._failed_config:
+            # the same request would fail again
+            return
+        job = next_job(messages, self.summaries, end, chunk_size)
+        if job is None:
+            return
+        level, start, stop = job
+        summary = Summary(level=level, start=start, end=stop)
+        if level == 0:
+            dialog = "\n\n".join(
+                f"{messages.role(i).capitalize()}:\n{messages.content(i)}"
+                for i in range(start, stop)
+                if messages.content(i)
+            )
+            prompt = SUMMARY_PROMPT.format(dialog=dialog)
+            summary.digest = message_digest(messages, start, stop)
+        else:
+            parts = children(self.summaries, summary)
+            prompt = ROLLUP_PROMPT.format(summaries="\n\n".join(c.text for c in parts))
+            summary.digest = digest(c.digest for c in parts)
+        logger.info(f"summarizing messages {start} to {stop} at level {level}")
+        self._job = summary
+        self._reply = ""
+        self._config = config
+        self._thread = Generate(model, prompt, keep_alive, cache=cache, **options)
+        # owned by the summarizer, so that a thread which was reset may finish
+        self._thread.setParent(self)
+        self._thread.finished.connect(self._thread.deleteLater)
+        self._thread.nextChunk.connect(self._add_chunk)
+        self._thread.error.connect(self._error)
+        self._thread.ended.connect(self._finished)
+        self._thread.start()
+
+    def cancel(self):
+        if self._thread is not None and self._thread.isRunning():
+            self._thread.cancel()
+
+    def close(self, timeout: float = 5.0):
+        self.cancel()
+        if self._thread is not None:
+            self._thread.wait(int(timeout * 1000))
+
+    @QtCore.Slot(str)
+    def _add_chunk(self, chunk: str):
+        if self.sender() is self._thread:
+            self._reply += chunk
+
+    @QtCore.Slot(str)
+    def _error(self, message: str):
+        logger.warning(f"summary failed: {message}")
+
+    @QtCore.Slot(str)
+    def _finished(self, state: str):
+        if self.sender() is not self._thread:
+            # summarizer was reset in the meantime
+            return
+        summary = self._job
+        self._thread = None
+        self._job = None
+        text = self._reply.strip()
+        if state == "cancelled":
+            return
+        if state == "failed" or not text:
+            logger.warning("summarizing is paused until the model or settings change")
+            self._failed_config = self._config
+            return
+        summary.text = text
+        self.summaries.append(summary)
+        self.summaryAdded.emit()
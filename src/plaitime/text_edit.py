@@ -1,4 +1,4 @@
-from PySide6 import QtWidgets, QtCore, QtGui
+from PySide6 import QtCore, QtGui, QtWidgets
 
 
 class TextEditor(QtWidgets.QWidget):
@@ -8,6 +8,9 @@ class TextEditor(QtWidgets.QWidget):
         super().__init__(parent)
         self.edit = BasicTextEdit(self)
         self.button = QtWidgets.QPushButton("Generate", self)
+        self.button.setToolTip(
+            "Shift+click to generate anew instead of using a cached result"
+        )
         self.button.clicked.connect(self.generateClicked)
         layout = QtWidgets.QVBoxLayout(self)
         layout.addWidget(self.edit)
@@ -1,30 +1,26 @@
-from . import CHARACTERS_PER_TOKEN, SESSION_DIRECTORY
-from .data_models import Message
-import ollama
-from pydantic import BaseModel
 import logging
-from typing import TypeVar
 import re
+from collections.abc import Iterable
+from typing import TypeVar
 
-T = TypeVar("T", bound=BaseModel)
+from pydantic import BaseModel
 
-logger = logging.getLogger(__name__)
+from . import CHARACTERS_PER_TOKEN
+from .data_models import Character
+from .message_store import MessageStore
 
+T = TypeVar("T", bound=BaseModel)
 
-def get_session_names():
-    names = []
-    for fname in SESSION_DIRECTORY.glob("*.json"):
-        names.append(fname.stem)
-    return names
+logger = logging.getLogger(__name__)
 
 
-def estimate_num_tokens(messages: list[Message], *args: str) -> int:
+def estimate_num_tokens(messages: MessageStore, *args: str) -> int:
     # estimate number of token
     num_char = 0
     for arg in args:
         num_char += len(arg)
-    for m in messages:
-        num_char += len(m.content)
+    for content in messages.contents:
+        num_char += len(content)
     return int(num_char / CHARACTERS_PER_TOKEN)
 
 
@@ -60,3 +56,65 @@ def shorten_string(s: str, maxlen: int = 1000):
     if len(s) > maxlen:
         return f"{s[:497]} [...] {s[504:]}"
     return s
+
+
+def format_character(character: Character, format="html") -> str:
+    if format == "html":
+        prefix = f"<h2>{character.name}</h2><table>"
+        suffix = "</table>"
+
+        def short(key, val):
+            return f"<tr><th>{key}</th> <td>{val}</td></tr>"
+
+        def long(key, val):
+            return short(key, val.replace("\n", "<br/>"))
+    elif format == "md":
+        prefix = f"## {character.name}\n\n"
+        suffix = ""
+
+        def short(key, val):
+            return f"- {key}: {val}\n"
+
+        def long(key, val):
+            val = val.replace("\n", "\n  ")
+            return f"- {key}: {val}\n"
+    else:
+        raise ValueError(f"unknown format={format}")
+    s = prefix
+    for key, info in character.model_fields.items():
+        if key == "name":
+            continue
+        value = getattr(character, key)
+        if not value:
+            continue
+        tr = long if info.metadata == ["long"] else short
+        s += tr(key, value)
+    s += suffix
+    return s.strip()
+
+
+def integrate_characters(characters: list[Character], new: list[Character]):
+    """Add new characters, fields of known characters are extended in place."""
+    name_map = {c.name: i for i, c in enumerate(characters)}
+    for character in new:
+        i = name_map.get(character.name)
+        if i is None:
+            characters.append(character)
+            continue
+        old = characters[i]
+        for key, new_val in character.model_dump().items():
+            if key == "name":
+                continue
+            old_val = getattr(old, key)
+            if old_val and new_val and new_val != old_val:
+                setattr(old, key, f"{old_val}; {new_val}")
+            elif new_val:
+                setattr(old, key, new_val)
+
+
+def dialog_text(items: Iterable[tuple[str, str]], *sections: str) -> str:
+    """Return sections followed by the messages as plain text."""
+    dialog = "\n\n".join(
+        f"{role.capitalize()}:\n{content}" for (role, content) in items if content
+    )
+    return "\n\n".join(x for x in (*sections, dialog) if x)
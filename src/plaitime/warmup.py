@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import logging
+import math
+import re
+import time
+from typing import Callable
+
+from PySide6 import QtCore
+
+from .data_models import Message
+from .generator import Chat
+
+logger = logging.getLogger(__name__)
+
+# ollama treats num_predict=0 as "no limit", a single token is the
+# cheapest request which still evaluates the whole prompt
+WARMUP_OPTIONS = {"num_predict": 1}
+
+DURATION_UNITS = {"ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> float:
+    """Return keep_alive duration in seconds, negative values mean forever."""
+    value = value.strip()
+    if value.startswith("-"):
+        return math.inf
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts or "".join(n + u for (n, u) in parts) != value:
+        raise ValueError(f"invalid duration {value!r}")
+    return sum(float(n) * DURATION_UNITS[u] for (n, u) in parts)
+
+
+class WarmupThread(Chat):
+    def __init__(
+        self,
+        model: str,
+        messages: list[Message],
+        keep_alive: str,
+        unload: tuple[str, ...] = (),
+        recall: Callable[[], str] | None = None,
+        characters: Callable[[], str] | None = None,
+    ):
+        super().__init__(
+            model, messages, keep_alive, recall, characters, **WARMUP_OPTIONS
+        )
+        self.unload = unload
+
+    def _responses(self):
+        # models which are not used anymore should not occupy memory
+        for model in self.unload:
+            self._unload(model)
+        yield from super()._responses()
+
+    def _unload(self, model: str):
+        import httpx
+        from ollama import ResponseError
+
+        from .backends import pool
+
+        # the host which has the model loaded comes first, it may not be
+        # the host of the new model
+        host = pool.select(model, self.kind)[0]
+        try:
+            self._connect(host).generate(model=model, keep_alive=0)
+        except (ResponseError, ConnectionError, httpx.HTTPError) as e:
+            if not self.interrupt:
+                logger.warning(f"unloading {model} from {host} failed: {e}")
+
+
+class Warmup(QtCore.QObject):
+    """
+    Load the model and prefill the prompt before the user sends a message.
+
+    Requests are debounced, so that typing does not start a request per
+    key stroke, and they are started at most once per interval.
+    """
+
+    def __init__(self, delay: float = 1.0, interval: float = 5.0, parent=None):
+        super().__init__(parent)
+        self.delay = delay
+        self.interval = interval
+        self._request = None
+        self._thread = None
+        self._last_start = -math.inf
+        self._last_key = None
+        self._model = ""
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._start)
+
+    def schedule(
+        self,
+        request: Callable[[], tuple[str, list[Message], str, dict] | None],
+        delay: float | None = None,
+    ):
+        """
+        Schedule a warmup, replacing a pending one.
+
+        The request is called when the warmup starts and returns model,
+        messages, keep_alive and the recall functions of Chat, or None to skip
+        the warmup.
+        """
+        self._request = request
+        if delay is None:
+            delay = self.delay
+        delay = max(delay, self._last_start + self.interval - time.monotonic())
+        self._timer.start(int(delay * 1000))
+
+    def cancel(self):
+        self._timer.stop()
+        self._request = None
+        if self._thread is not None and self._thread.isRunning():
+            self._thread.cancel()
+
+    def close(self, timeout: float = 5.0):
+        self.cancel()
+        if self._thread is not None:
+            self._thread.wait(int(timeout * 1000))
+
+    @QtCore.Slot()
+    def _start(self):
+        if self._request is None:
+            return
+        if self._thread is not None and self._thread.isRunning():
+            # try again when the previous warmup is done
+            self._timer.start(int(self.delay * 1000))
+            return
+        args = self._request()
+        self._request = None
+        if args is None:
+            return
+        model, messages, keep_alive, options = args
+        try:
+            duration = parse_duration(keep_alive)
+        except ValueError as e:
+            logger.warning(e)
+            return
+        if not model or duration == 0:
+            return
+        now = time.monotonic()
+        key = (model, tuple((m.role, m.content) for m in messages))
+        if key == self._last_key and now - self._last_start < duration:
+            # model is still loaded with this prompt
+            return
+        unload = (self._model,) if self._model and self._model != model else ()
+        logger.info(f"warming up {model} with {len(messages)} messages")
+        self._thread = WarmupThread(model, messages, keep_alive, unload, **options)
+        self._thread.error.connect(self._error)
+        self._thread.start()
+        self._last_start = now
+        self._last_key = key
+        self._model = model
+
+    @QtCore.Slot(str)
+    def _error(self, message: str):
+        # warmup is optional, a real request will report the error
+        logger.warning(f"warmup failed: {message}")
+        self._last_key = None
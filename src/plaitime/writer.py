@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from pydantic import BaseModel
+
+from .io import save
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[], None]
+
+
+class Writer:
+    """
+    Saves models on a background thread.
+
+    Submitted models are snapshots, which must not be modified afterwards.
+    Writing is delayed, a new snapshot for a file replaces the pending one, so
+    that rapid saves of the same file result in a single write. Files are
+    written in the order of their latest submission: when a write is due, the
+    writes submitted before it are done first, even if they are not due yet.
+    """
+
+    def __init__(self, delay: float = 2.0):
+        self.delay = delay
+        # pending writes in submission order:
+        # filename -> (due time, snapshot, save options, callbacks)
+        self._tasks: dict[
+            Path, tuple[float, BaseModel | None, dict, list[Callback]]
+        ] = {}
+        self._cond = threading.Condition()
+        self._writing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="writer", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        obj: BaseModel | None,
+        filename: Path,
+        then: Callback | None = None,
+        delay: float | None = None,
+        codec: str = "json",
+        backup: bool = False,
+    ):
+        """
+        Save obj to filename, or remove the file if obj is None.
+
+        The optional callback is called on the writer thread after writing.
+        Codec and backup are passed to io.save.
+        """
+        due = time.monotonic() + (self.delay if delay is None else delay)
+        callbacks = [then] if then else []
+        options = {"codec": codec, "backup": backup}
+        with self._cond:
+            if self._closed:
+                self._write(filename, obj, options, callbacks)
+                return
+            if filename in self._tasks:
+                # a continuous stream of saves must not postpone writing forever
+                old_due, _, _, old_callbacks = self._tasks.pop(filename)
+                due = min(due, old_due)
+                callbacks = old_callbacks + callbacks
+            self._tasks[filename] = (due, obj, options, callbacks)
+            self._cond.notify_all()
+
+    def flush(self):
+        """Write all pending snapshots now and wait until they are written."""
+        with self._cond:
+            for filename, (_, *rest) in self._tasks.items():
+                self._tasks[filename] = (0, *rest)
+            self._cond.notify_all()
+            while self._tasks or self._writing:
+                self._cond.wait()
+
+    def close(self):
+        """Flush and stop the writer thread, later saves are written at once."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    tasks = list(self._tasks.items())
+                    # a resubmitted file keeps its early due time, which must
+                    # not overtake files that were submitted before
+                    last = max(
+                        (i for i, (_, task) in enumerate(tasks) if task[0] <= now),
+                        default=-1,
+                    )
+                    if last >= 0:
+                        due = tasks[: last + 1]
+                        break
+                    if self._closed:
+                        return
+                    timeout = None
+                    if self._tasks:
+                        timeout = min(t[0] for t in self._tasks.values()) - now
+                    self._cond.wait(timeout)
+                for filename, _ in due:
+                    del self._tasks[filename]
+                self._writing = True
+            for filename, (_, *rest) in due:
+                self._write(filename, *rest)
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    @staticmethod
+    def _write(
+        filename: Path, obj: BaseModel | None, options: dict, callbacks: list[Callback]
+    ):
+        try:
+            if obj is None:
+                filename.unlink(missing_ok=True)
+            else:
+                save(obj, filename, **options)
+            for callback in callbacks:
+                callback()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # the callbacks update the search index
+            logger.error(f"saving {filename} failed: {e}")
@@ -0,0 +1,115 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from plaitime import DEFAULT_CONTEXT_SIZE, backends
+from plaitime.backends import BackendPool, parse_hosts
+from plaitime.generator import Generate
+
+
+def test_parse_hosts():
+    assert parse_hosts("") == []
+    assert parse_hosts("a:1, b:2,") == ["a:1", "b:2"]
+
+
+def test_select(monkeypatch):
+    status = {"a": {"other:latest"}, "b": {"model:latest"}, "c": set(), "d": None}
+    pool = BackendPool(["a", "b", "c", "d"])
+    monkeypatch.setattr(pool, "status", status.get)
+
+    # host with model loaded first, unreachable hosts last
+    assert pool.select("model") == ["b", "a", "c", "d"]
+    # least loaded host first
+    with pool.job("a", "x", "extraction"):
+        assert pool.select("x") == ["b", "c", "a", "d"]
+    # other jobs avoid the chat host
+    with pool.job("b", "model"):
+        assert pool.select("model", "extraction") == ["a", "c", "b", "d"]
+    assert pool.select("model", "extraction") == ["a", "c", "b", "d"]
+
+    assert BackendPool().select("model") == [None]
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for text, done in (("Hello", False), (" world", True)):
+            line = json.dumps({"model": "model", "response": text, "done": done})
+            self.wfile.write(line.encode() + b"\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_failover(server, monkeypatch):
+    # a port without server refuses connections
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    dead = f"127.0.0.1:{sock.getsockname()[1]}"
+    sock.close()
+
+    pool = BackendPool([dead, server])
+    # both hosts look healthy, so the dead one is tried first
+    monkeypatch.setattr(pool, "status", lambda host: set())
+    monkeypatch.setattr(backends, "pool", pool)
+    generate = Generate("model", "Hi", "1h")
+    errors = []
+    generate.error.connect(errors.append)
+    assert "".join(generate.chunks()) == "Hello world"
+    assert errors == []
+    assert generate.state == "finished"
+
+
+def test_list_models_and_context_size(monkeypatch):
+    import ollama
+
+    models = {
+        "a": {"x:latest": 100},
+        "b": {"x:latest": 100, "y:latest": 200, "w:latest": None},
+    }
+
+    class Client:
+        def __init__(self, host, timeout=None):
+            self.host = host
+
+        def list(self):
+            if self.host == "c":
+                raise ConnectionError
+            return SimpleNamespace(
+                models=[SimpleNamespace(model=m) for m in models[self.host]]
+            )
+
+        def show(self, model):
+            try:
+                size = models[self.host][model]
+            except KeyError:
+                raise ollama.ResponseError("not found", 404)
+            if size is None:
+                return SimpleNamespace(modelinfo={})
+            return SimpleNamespace(modelinfo={"llama.context_length": size})
+
+    pool = BackendPool(["a", "b", "c"])
+    monkeypatch.setattr(pool, "status", lambda host: set())
+    monkeypatch.setattr(backends, "pool", pool)
+    monkeypatch.setattr(ollama, "Client", Client)
+    assert backends.list_models() == ["w:latest", "x:latest", "y:latest"]
+    # y is only on the second host
+    assert backends.get_context_size("y:latest") == 200
+    assert backends.get_context_size("z:latest") == 0
+    # model does not declare its context size
+    assert backends.get_context_size("w:latest") == DEFAULT_CONTEXT_SIZE
@@ -0,0 +1,108 @@
+from plaitime.budget import (
+    allocate,
+    build_context,
+    clip,
+    num_chat_messages,
+    rank_characters,
+    select_summaries,
+)
+from plaitime.data_models import Budget, Character, Summary
+from plaitime.message_store import MessageStore
+
+
+def test_allocate():
+    shares = {"a": 1, "b": 1, "c": 2}
+    assert allocate(100, {"a": 10, "b": 100, "c": 100}, shares) == {
+        "a": 10,
+        "b": 30,
+        "c": 60,
+    }
+    # unused shares go to the others
+    assert allocate(100, {"a": 0, "b": 0, "c": 500}, shares) == {
+        "a": 0,
+        "b": 0,
+        "c": 100,
+    }
+    assert allocate(100, {"a": 1, "b": 2, "c": 3}, shares) == {"a": 1, "b": 2, "c": 3}
+
+
+def test_clip():
+    text = "First paragraph.\n\nSecond paragraph.\n\nThird paragraph."
+    assert clip(text, 100) == text
+    assert clip(text, 10) == "First paragraph.\n\n[...]"
+    assert clip(text, 10, keep_end=True) == "[...]\n\nThird paragraph."
+    assert clip(text, 1) == ""
+
+
+def test_rank_characters():
+    characters = [Character(name=n) for n in ("Anna", "Bob", "Carl")]
+    messages = MessageStore()
+    messages.append("user", "Bob and anna meet.")
+    messages.append("assistant", "Anna smiles.")
+    ranked = rank_characters(characters, messages)
+    assert [c.name for c in ranked] == ["Anna", "Bob", "Carl"]
+    messages.append("user", "Carl? Bobby? Bob!")
+    ranked = rank_characters(characters, messages)
+    assert [c.name for c in ranked] == ["Bob", "Carl", "Anna"]
+
+
+def test_build_context():
+    messages = MessageStore()
+    for i in range(100):
+        messages.append("user" if i % 2 == 0 else "assistant", f"message {i:04}")
+    story = "\n\n".join(f"Chapter {i}. " + "x" * 200 for i in range(20))
+    budget = Budget(prompt=10, characters=10, world=10, story=10, chat=60)
+    window, allocation = build_context(
+        "Be nice.", [Character(name="Anna")], "", story, messages, 500, budget
+    )
+    system = window[0].content
+    assert window[0].role == "system"
+    assert system.startswith("Be nice.\n\n# Characters\n\n## Anna")
+    # only the end of the story fits
+    assert "Chapter 19." in system and "Chapter 0." not in system
+    assert window[-1].content == "message 0099"
+    # the story does not squeeze out the chat
+    assert allocation["chat"][0] >= 300
+    assert allocation["story"][0] < allocation["story"][1]
+    assert allocation["prompt"] == (2, 2)
+
+    # unknown context size, only the last message is sent
+    window, _ = build_context("Be nice.", [], "", story, messages, 0, budget)
+    assert len(window) == 2
+    assert window[0].content.endswith(story)
+    assert num_chat_messages(window) == 1
+
+    # without a prompt, there is no system message
+    window, _ = build_context("", [], "", "", messages, 500, budget)
+    assert all(m.role != "system" for m in window)
+    assert num_chat_messages(window) == len(window)
+    assert window[-1].content == "message 0099"
+
+
+def test_select_summaries():
+    summaries = [
+        Summary(start=0, end=2, text="a"),
+        Summary(start=2, end=4, text="b"),
+        Summary(start=4, end=6, text="c"),
+        Summary(level=1, start=0, end=4, text="ab"),
+    ]
+    assert [s.text for s in select_summaries(summaries, 6)] == ["ab", "c"]
+    assert [s.text for s in select_summaries(summaries, 5)] == ["ab"]
+    assert [s.text for s in select_summaries(summaries, 3)] == ["a"]
+
+
+def test_build_context_history():
+    messages = MessageStore()
+    for i in range(10):
+        messages.append("user", "x" * 40)
+    summaries = [Summary(start=0, end=5, text="Anna met Bob")]
+    budget = Budget(prompt=10, characters=10, world=10, story=10, history=10, chat=50)
+    window, allocation = build_context("", [], "", "", messages, 50, budget, summaries)
+    # the summary covers messages before the window
+    assert len(window) == 5
+    assert window[0].content == "# History\n\nAnna met Bob"
+    assert allocation["history"] == (3, 3)
+
+    # summarized messages which are still in the window are not repeated
+    window, _ = build_context("", [], "", "", messages, 500, budget, summaries)
+    assert window[0].role == "user"
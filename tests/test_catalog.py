@@ -0,0 +1,46 @@
+import time
+
+from plaitime.catalog import SessionCatalog
+from plaitime.data_models import Memory, Message, Session
+from plaitime.io import save
+
+
+def test_catalog(tmp_path):
+    session_dir = tmp_path / "sessions"
+    memory_dir = tmp_path / "memories"
+    session_dir.mkdir()
+    memory_dir.mkdir()
+    for name in ("foo", "bar"):
+        save(Session(name=name, model=f"{name}:latest"), session_dir / f"{name}.json")
+    save(Memory(messages=[Message(role="user", content="hi")]), memory_dir / "foo.json")
+
+    catalog = SessionCatalog(tmp_path / "catalog.json")
+    catalog.sync(session_dir, memory_dir)
+    assert set(catalog.names()) == {"foo", "bar"}
+    assert catalog.sessions["foo"].model == "foo:latest"
+    assert catalog.sessions["foo"].memory_size > 0
+    assert catalog.sessions["bar"].memory_size == 0
+
+    catalog.update("bar", touch=True, num_messages=3)
+    assert catalog.names() == ["bar", "foo"]
+    assert catalog.sessions["bar"].num_messages == 3
+    assert catalog.sessions["bar"].last_used <= time.time()
+
+    catalog.rename("bar", "baz")
+    assert catalog.names() == ["baz", "foo"]
+    assert catalog.sessions["baz"].num_messages == 3
+    catalog.remove("foo")
+    assert catalog.names() == ["baz"]
+
+    # snapshots are saved on the writer thread and must not change
+    snapshot = catalog.snapshot()
+    catalog.update("baz", num_messages=4)
+    assert snapshot.sessions["baz"].num_messages == 3
+
+    catalog.save()
+    catalog2 = SessionCatalog(tmp_path / "catalog.json")
+    assert catalog2.sessions == catalog.sessions
+
+    # baz and foo have no session files, bar does
+    catalog2.sync(session_dir, memory_dir)
+    assert set(catalog2.names()) == {"foo", "bar"}
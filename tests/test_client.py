@@ -0,0 +1,68 @@
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+
+from plaitime.client import Client
+from plaitime.data_models import Message
+from plaitime.generator import Chat
+
+
+@pytest.fixture
+def server():
+    # accepts a request and never responds, like a server busy with the prompt
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen()
+    connections = []
+
+    def serve():
+        while True:
+            try:
+                connection, _ = sock.accept()
+            except OSError:
+                return
+            connections.append(connection)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"127.0.0.1:{sock.getsockname()[1]}"
+    sock.close()
+    for connection in connections:
+        connection.close()
+
+
+def test_client_abort(server):
+    client = Client(server)
+    errors = []
+
+    def run():
+        try:
+            for _ in client.chat(model="model", messages=[], stream=True):
+                pass
+        except httpx.HTTPError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(0.2)
+    t = time.monotonic()
+    client.abort()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert time.monotonic() - t < 1
+    assert len(errors) == 1
+
+
+def test_chat_cancel(server, monkeypatch):
+    monkeypatch.setenv("OLLAMA_HOST", server)
+    chat = Chat("model", [Message(role="user", content="Hi")], "1h")
+    errors = []
+    chat.error.connect(errors.append)
+    chat.start()
+    time.sleep(0.2)
+    chat.cancel()
+    assert chat.wait(5000)
+    assert chat.state == "cancelled"
+    assert errors == []
@@ -0,0 +1,34 @@
+import pytest
+
+from plaitime.codec import CODECS, MODULES, available_codecs, detect
+from plaitime.data_models import Memory, Message, Session
+from plaitime.io import load, save
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_codec(codec, tmp_path):
+    if codec in MODULES:
+        pytest.importorskip(MODULES[codec])
+    memory = Memory(
+        messages=[Message(role="user", content="Héllo *world*")], story="Story"
+    )
+    path = tmp_path / "memory.json"
+    save(memory, path, codec)
+    with open(path, "rb") as f:
+        assert detect(f.read()) == ("json" if codec == "compact" else codec)
+    assert load(path, Memory) == memory
+
+    # saving again with another codec creates a backup
+    save(memory, path, "json", backup=True)
+    assert load(path, Memory) == memory
+    assert (tmp_path / "memory.json.1").exists() == (codec != "json")
+
+
+def test_available_codecs():
+    codecs = available_codecs()
+    assert codecs[:3] == ["json", "compact", "gzip"]
+
+
+def test_codec_unknown(tmp_path):
+    with pytest.raises(ValueError):
+        save(Session(), tmp_path / "session.json", "xml")
@@ -1,8 +1,12 @@
-from plaitime.data_models import Session, Character, Settings
-from plaitime.config_dialog import ConfigDialog
-import pytest
+import time
+
 from PySide6 import QtWidgets
 
+import pytest
+
+from plaitime.config_dialog import ConfigDialog
+from plaitime.data_models import Character, Session, Settings
+
 app = QtWidgets.QApplication([])
 
 
@@ -12,3 +16,24 @@ app = QtWidgets.QApplication([])
 def test_config_dialog(model):
     c = ConfigDialog(model)
     assert c.result() == model
+
+
+def test_model_combo_box(monkeypatch):
+    from plaitime.config_dialog import ModelComboBox
+
+    monkeypatch.setattr("plaitime.backends.list_models", lambda: ["d:latest"])
+    w = ModelComboBox("a:latest")
+    # the models listed in the background arrive through the event loop
+    deadline = time.monotonic() + 5
+    while w.count() < 2 and time.monotonic() < deadline:
+        app.processEvents()
+    assert [w.itemText(i) for i in range(w.count())] == ["a:latest", "d:latest"]
+    assert w.currentText() == "a:latest"
+    # the host of the current model is down
+    w.set_models(["b:latest", "c:latest"])
+    assert [w.itemText(i) for i in range(w.count())] == [
+        "a:latest",
+        "b:latest",
+        "c:latest",
+    ]
+    assert w.currentText() == "a:latest"
@@ -0,0 +1,61 @@
+import numpy as np
+
+from plaitime.embedding import EmbeddingCache, HashEmbedder, normalize
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(len(texts))
+        return super().__call__(texts)
+
+
+def test_embedding_cache(tmp_path):
+    embed = CountingEmbedder()
+    cache = EmbeddingCache(tmp_path, embed, batch_size=2)
+    rows = cache.lookup(["a b c", "d e f", "a b c", "g h i"])
+    assert list(rows) == [0, 1, 0, 2]
+    assert embed.calls == [2, 1]
+    assert cache.matrix.shape == (3, embed.dim)
+    np.testing.assert_allclose(np.linalg.norm(cache.matrix, axis=1), 1, rtol=1e-6)
+
+    cache2 = EmbeddingCache(tmp_path, embed)
+    rows = cache2.lookup(["d e f", "j k l"])
+    assert list(rows) == [1, 3]
+    assert embed.calls == [2, 1, 1]
+    assert isinstance(cache2.matrix, np.memmap)
+
+    q = embed(["g h"])[0]
+    assert cache2.top_k(q, 2)[0] == 2
+    assert list(cache2.top_k(q, 1, np.array([0, 2]))) == [1]
+    assert len(cache2.top_k(q, 0)) == 0
+
+
+def test_embedding_cache_repair(tmp_path):
+    embed = HashEmbedder()
+    cache = EmbeddingCache(tmp_path, embed)
+    cache.lookup(["a", "b"])
+    # simulate crash after writing vectors but before writing ids
+    with cache.vector_file.open("ab") as f:
+        f.write(b"\0" * 10)
+    cache2 = EmbeddingCache(tmp_path, embed)
+    assert len(cache2) == 2
+    assert list(cache2.lookup(["c", "a"])) == [2, 0]
+    np.testing.assert_allclose(cache2.matrix[2], normalize(embed(["c"])[0]))
+
+
+def test_embedding_cache_shared(tmp_path):
+    embed = CountingEmbedder()
+    # two instances of the program use the same files
+    cache = EmbeddingCache(tmp_path, embed)
+    cache2 = EmbeddingCache(tmp_path, embed)
+    assert list(cache.lookup(["a", "b"])) == [0, 1]
+    assert list(cache2.lookup(["c", "b"])) == [2, 1]
+    # b was embedded again, but not appended twice
+    assert embed.calls == [2, 2]
+    assert list(cache.lookup(["c"])) == [2]
+    assert cache.matrix.shape == cache2.matrix.shape == (3, embed.dim)
+    np.testing.assert_allclose(cache.matrix[2], normalize(embed(["c"])[0]))
@@ -0,0 +1,68 @@
+import json
+from io import StringIO
+
+from plaitime import export
+from plaitime.data_models import Character, Memory, Session, Settings
+from plaitime.io import save
+from plaitime.message_store import MessageStore
+
+
+def make_memory():
+    messages = MessageStore()
+    messages.append("user", "Hello *there*")
+    messages.append("assistant", "Hi <you>")
+    return Memory(messages=messages, characters=[Character(name="Anna")])
+
+
+def test_write_markdown():
+    f = StringIO()
+    export.write_markdown(Session(name="Test"), make_memory(), f, Settings())
+    text = f.getvalue()
+    assert text.startswith("# Test\n\n## Characters\n\n### Anna")
+    assert text.endswith("**User:**\n\nHello *there*\n\n**Assistant:**\n\nHi <you>\n\n")
+
+
+def test_write_html():
+    f = StringIO()
+    export.write_html(Session(name="Test"), make_memory(), f, Settings())
+    text = f.getvalue()
+    assert "<title>Test</title>" in text
+    assert "--user-color: #f8f8f8;" in text
+    assert '<p class="user">Hello <em>there</em></p>' in text
+    assert '<p class="assistant">Hi &lt;you&gt;</p>' in text
+
+
+def test_write_jsonl():
+    f = StringIO()
+    export.write_jsonl(Session(prompt="Be nice."), make_memory(), f, Settings())
+    lines = f.getvalue().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["messages"] == [
+        {"role": "system", "content": "Be nice."},
+        {"role": "user", "content": "Hello *there*"},
+        {"role": "assistant", "content": "Hi <you>"},
+    ]
+
+
+def test_main(tmp_path, monkeypatch, capsys):
+    session_dir = tmp_path / "sessions"
+    memory_dir = tmp_path / "memories"
+    session_dir.mkdir()
+    memory_dir.mkdir()
+    monkeypatch.setattr(export, "SESSION_DIRECTORY", session_dir)
+    monkeypatch.setattr(export, "MEMORY_DIRECTORY", memory_dir)
+    monkeypatch.setattr(export, "SETTINGS_FILE_NAME", tmp_path / "settings.json")
+    for name in ("a", "b"):
+        save(Session(name=name), session_dir / f"{name}.json")
+        save(make_memory(), memory_dir / f"{name}.json", codec="gzip")
+
+    out = tmp_path / "out"
+    assert export.main(["-f", "jsonl", "-o", str(out)]) == 0
+    assert sorted(p.name for p in out.iterdir()) == ["a.jsonl", "b.jsonl"]
+    assert capsys.readouterr().out.splitlines() == [
+        str(out / "a.jsonl"),
+        str(out / "b.jsonl"),
+    ]
+
+    assert export.main(["a", "c", "-o", str(out)]) == 1
+    assert (out / "a.md").exists()
@@ -0,0 +1,75 @@
+from plaitime.data_models import Message
+from plaitime.generator import Candidates, Chat
+
+
+def test_chat_recall():
+    messages = [
+        Message(role="system", content="Be nice."),
+        Message(role="user", content="Hi"),
+    ]
+    chat = Chat("model", messages, "1h", recall=lambda: "User: Hello")
+    assert chat._messages() == [
+        {"role": "system", "content": "Be nice.\n\n# Recollections\n\nUser: Hello"},
+        {"role": "user", "content": "Hi"},
+    ]
+
+    chat = Chat("model", messages[1:], "1h", recall=lambda: "User: Hello")
+    assert chat._messages()[0] == {
+        "role": "system",
+        "content": "# Recollections\n\nUser: Hello",
+    }
+
+    def fail():
+        raise ConnectionError
+
+    chat = Chat("model", messages, "1h", recall=fail)
+    assert chat._messages() == chat.payload
+
+    chat = Chat("model", messages, "1h", recall=fail, characters=lambda: "## Bob")
+    assert chat._messages()[0] == {
+        "role": "system",
+        "content": "Be nice.\n\n# More characters\n\n## Bob",
+    }
+
+
+def test_candidates():
+    messages = [Message(role="user", content="Hi")]
+    calls = []
+
+    def recall():
+        calls.append(1)
+        return "User: Hello"
+
+    candidates = Candidates(3, "model", messages, "1h", recall=recall, seed=1)
+    assert [t.options["seed"] for t in candidates.threads] == [1, 2, 3]
+    # recall is shared and runs once
+    assert all(
+        t._messages() == candidates.threads[0]._messages() for t in candidates.threads
+    )
+    assert len(calls) == 1
+
+    candidates.cancel()
+    assert all(t.interrupt for t in candidates.threads)
+    assert not candidates.isRunning()
+
+
+def test_candidates_finished(monkeypatch):
+    from PySide6 import QtWidgets
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    class FakeChat(Chat):
+        def _responses(self):
+            yield {"message": {"content": "Hello"}}
+
+    monkeypatch.setattr("plaitime.generator.Chat", FakeChat)
+    candidates = Candidates(2, "model", [Message(role="user", content="Hi")], "1h")
+    assert all(t.parent() is candidates for t in candidates.threads)
+    events = []
+    candidates.ended.connect(lambda state: events.append(state))
+    candidates.finished.connect(lambda: events.append("done"))
+    candidates.start()
+    candidates.wait()
+    app.processEvents()
+    # ended and finished are emitted once, after all threads have finished
+    assert events == ["finished", "done"]
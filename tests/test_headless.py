@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from plaitime import headless
+from plaitime.data_models import Memory, Script, Session
+from plaitime.generator import Chat, Generate, GenerateData
+from plaitime.io import load, save
+from plaitime.message_store import MessageStore
+
+
+class EchoChat(Chat):
+    def _responses(self):
+        yield {"message": {"content": "Echo: "}}
+        yield {"message": {"content": self.payload[-1]["content"]}}
+
+
+class FakeGenerate(Generate):
+    def _responses(self):
+        yield {"response": "A castle."}
+
+
+class FakeGenerateData(GenerateData):
+    def _responses(self):
+        yield {"response": '{"characters": [{"name": "Anna", "hair": "red"}]}'}
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    for name in ("SESSION_DIRECTORY", "MEMORY_DIRECTORY"):
+        path = tmp_path / name.lower()
+        path.mkdir()
+        monkeypatch.setattr(headless, name, path)
+    monkeypatch.setattr(headless, "SETTINGS_FILE_NAME", tmp_path / "settings.json")
+    monkeypatch.setattr(headless, "REPLY_CACHE_FILE_NAME", tmp_path / "replies.db")
+    monkeypatch.setattr(headless, "get_context_size", lambda model: 1000)
+    monkeypatch.setattr(headless, "Chat", EchoChat)
+    monkeypatch.setattr(headless, "Generate", FakeGenerate)
+    monkeypatch.setattr(headless, "GenerateData", FakeGenerateData)
+    return tmp_path
+
+
+def test_run(base, capsys):
+    scripts = []
+    for name in ("a", "b"):
+        path = base / f"{name}.json"
+        save(Script(messages=[f"Hi {name}", "Bye"]), path)
+        scripts.append(str(path))
+
+    out = base / "out"
+    assert headless.run([*scripts, "-o", str(out)]) == 0
+    records = [json.loads(x) for x in capsys.readouterr().out.splitlines()]
+    assert sorted((r["session"], r["index"], r["content"]) for r in records) == [
+        ("a", 1, "Echo: Hi a"),
+        ("a", 3, "Echo: Bye"),
+        ("b", 1, "Echo: Hi b"),
+        ("b", 3, "Echo: Bye"),
+    ]
+    memory = load(out / "memories" / "a.json", Memory)
+    assert memory.messages.content(1) == "Echo: Hi a"
+    assert load(out / "sessions" / "b.json", Session).name == "b"
+
+    # a single script is streamed as text
+    assert headless.run([scripts[0]]) == 0
+    assert capsys.readouterr().out == (
+        "User:\nHi a\n\nAssistant:\nEcho: Hi a\n\nUser:\nBye\n\nAssistant:\nEcho: Bye\n\n"
+    )
+
+    assert headless.run([str(base / "missing.json")]) == 1
+
+
+def test_extract(base, capsys):
+    messages = MessageStore()
+    messages.append("user", "Anna enters the castle.")
+    save(Session(name="s"), headless.SESSION_DIRECTORY / "s.json")
+    save(Memory(messages=messages), headless.MEMORY_DIRECTORY / "s.json")
+
+    out = base / "out"
+    assert headless.extract(["characters", "--jsonl", "-o", str(out)]) == 0
+    (record,) = [json.loads(x) for x in capsys.readouterr().out.splitlines()]
+    assert record["result"]["characters"][0]["name"] == "Anna"
+    memory = load(out / "memories" / "s.json", Memory)
+    assert memory.characters[0].hair == "red"
+
+    assert headless.extract(["world", "s", "--jsonl"]) == 0
+    (record,) = [json.loads(x) for x in capsys.readouterr().out.splitlines()]
+    assert record == {"session": "s", "kind": "world", "result": "A castle."}
@@ -1,8 +1,10 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
 import pytest
-from plaitime.io import save, load
 from pydantic import BaseModel
-from tempfile import TemporaryDirectory
-from pathlib import Path
+
+from plaitime.io import backups, load, remove, save
 
 
 class Foo(BaseModel):
@@ -23,9 +25,25 @@ def test_save_load(test_dir):
 
 
 def test_save_multiple_calls(test_dir):
-    foo1 = Foo(value="baz1")
-    foo2 = Foo(value="baz2")
-    save(foo1, test_dir / "test.json")
-    save(foo2, test_dir / "test.json")
+    foo1 = Foo(key="baz1")
+    foo2 = Foo(key="baz2")
+    save(foo1, test_dir / "test.json", backup=True)
+    save(foo2, test_dir / "test.json", backup=True)
     assert load(test_dir / "test.json", Foo) == foo2
     assert load(test_dir / "test.json.1", Foo) == foo1
+    assert backups(test_dir / "test.json") == [test_dir / "test.json.1"]
+
+
+def test_save_without_backup(test_dir):
+    save(Foo(key="baz1"), test_dir / "test.json")
+    save(Foo(key="baz2"), test_dir / "test.json")
+    assert load(test_dir / "test.json", Foo) == Foo(key="baz2")
+    assert backups(test_dir / "test.json") == []
+
+
+def test_remove(test_dir):
+    for key in ("baz1", "baz2", "baz3"):
+        save(Foo(key=key), test_dir / "test.json", backup=True)
+    assert len(backups(test_dir / "test.json")) == 2
+    remove(test_dir / "test.json")
+    assert list(test_dir.iterdir()) == []
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+from plaitime.locking import (
+    LockedError,
+    acquire,
+    is_stale,
+    owner,
+    process_start_time,
+    release,
+    remove_stale_locks,
+)
+
+
+@pytest.fixture
+def dead_pid():
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    return p.pid
+
+
+def test_acquire_release(tmp_path):
+    lock_file = tmp_path / "foo.lock"
+    acquire(lock_file)
+    pid, start_time = owner(lock_file)
+    assert pid == os.getpid()
+    assert start_time == process_start_time(pid)
+    # acquiring twice is fine
+    acquire(lock_file)
+    release(lock_file)
+    assert not lock_file.exists()
+
+
+def test_locked_by_other_process(tmp_path):
+    lock_file = tmp_path / "foo.lock"
+    pid = os.getppid()
+    lock_file.write_text(f"{pid} {process_start_time(pid)!r}")
+    with pytest.raises(LockedError):
+        acquire(lock_file)
+    with pytest.raises(LockedError):
+        release(lock_file)
+    assert not is_stale(lock_file)
+
+
+def test_legacy_lock_file(tmp_path):
+    lock_file = tmp_path / "foo.lock"
+    lock_file.write_text(str(os.getppid()))
+    with pytest.raises(LockedError):
+        acquire(lock_file)
+
+
+def test_stale_lock(tmp_path, dead_pid):
+    lock_file = tmp_path / "foo.lock"
+    lock_file.write_text(f"{dead_pid} 123.0")
+    assert is_stale(lock_file)
+    acquire(lock_file)
+    assert owner(lock_file)[0] == os.getpid()
+
+
+def test_stale_lock_reused_pid(tmp_path):
+    lock_file = tmp_path / "foo.lock"
+    pid = os.getppid()
+    lock_file.write_text(f"{pid} {process_start_time(pid) - 100}")
+    assert is_stale(lock_file)
+
+
+def test_remove_stale_locks(tmp_path, dead_pid):
+    (tmp_path / "a.lock").write_text(str(dead_pid))
+    (tmp_path / "b.lock").write_text("")
+    acquire(tmp_path / "c.lock")
+    assert remove_stale_locks(tmp_path) == 2
+    assert [p.name for p in tmp_path.glob("*.lock")] == ["c.lock"]
+
+
+def _try_acquire(lock_file, results, done):
+    try:
+        acquire(lock_file)
+        results.put(os.getpid())
+    except OSError:
+        results.put(0)
+    # a process that exits leaves a stale lock, which may be taken over
+    done.wait()
+
+
+def test_stale_lock_concurrent(tmp_path, dead_pid):
+    lock_file = tmp_path / "foo.lock"
+    lock_file.write_text(f"{dead_pid} 123.0")
+    results = multiprocessing.Queue()
+    done = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=_try_acquire, args=(lock_file, results, done))
+        for _ in range(8)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        winners = [pid for pid in (results.get(timeout=30) for _ in processes) if pid]
+        assert winners == [owner(lock_file)[0]]
+    finally:
+        done.set()
+        for p in processes:
+            p.join()
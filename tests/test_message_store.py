@@ -0,0 +1,59 @@
+import pytest
+from pydantic import ValidationError
+
+from plaitime.data_models import Memory, Message
+from plaitime.message_store import MessageStore
+
+
+def test_message_store():
+    store = MessageStore([{"role": "system", "content": "Be nice."}])
+    store.append("user", "Hello")
+    store.append("assistant", "Hi")
+    store.add_chunk(2, " there!")
+    assert len(store) == 3
+    assert list(store.items()) == [
+        ("system", "Be nice."),
+        ("user", "Hello"),
+        ("assistant", "Hi there!"),
+    ]
+    assert store[-1] == Message(role="assistant", content="Hi there!")
+
+    other = MessageStore()
+    other.append("user", "Hey")
+    store.replace(1, 2, other)
+    assert [r for (r, c) in store.items()] == ["system", "user", "assistant"]
+    assert store.content(1) == "Hey"
+
+    copy = store.copy()
+    revision = store.revision
+    store.truncate(1)
+    # every change is counted, so that derived results can be cached
+    assert store.revision == revision + 1
+    assert len(store) == 1
+    assert len(copy) == 3
+    assert copy != store
+
+    with pytest.raises(KeyError):
+        store.append("narrator", "Once upon a time")
+    with pytest.raises(ValueError):
+        MessageStore([{"role": "narrator", "content": ""}])
+
+
+def test_memory_roundtrip():
+    memory = Memory(
+        messages=[
+            Message(role="user", content="Hello"),
+            Message(role="assistant", content="Hi"),
+        ]
+    )
+    assert isinstance(memory.messages, MessageStore)
+    data = memory.model_dump_json()
+    assert '"messages":[{"role":"user","content":"Hello"}' in data
+    assert Memory.model_validate_json(data) == memory
+    assert Memory() != memory
+    assert Memory().messages is not Memory().messages
+
+    with pytest.raises(TypeError):
+        MessageStore.validate("Hello")
+    with pytest.raises(ValidationError):
+        Memory(messages="Hello")
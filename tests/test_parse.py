@@ -1,6 +1,7 @@
-from plaitime.parser import parse
 import pytest
 
+from plaitime.parser import Parser, parse
+
 
 @pytest.mark.parametrize(
     "input, expected",
@@ -22,11 +23,31 @@ import pytest
         ("*foo bar baz", "<em>foo bar baz</em>"),
         ("*foo\nbar*", "<em>foo<br/>bar</em>"),
         (
-            "A line*foo*\n\n*bar* Another line." "",
+            "A line*foo*\n\n*bar* Another line.",
             "A line<em>foo</em><br/><br/><em>bar</em> Another line.",
         ),
+        ("She _smiles_ at you.", "She <em>smiles</em> at you."),
+        ("_Hello_", "<em>Hello</em>"),
+        ("call snake_case_name", "call snake_case_name"),
+        ("a _ b", "a _ b"),
+        ("**Bold** and *italic*", "<strong>Bold</strong> and <em>italic</em>"),
+        ("**bold *both***", "<strong>bold <em>both</em></strong>"),
+        ("*a _b* c", "<em>a <em>b</em></em> c"),
+        ("<b>x</b> & 'y'", "&lt;b&gt;x&lt;/b&gt; &amp; &#x27;y&#x27;"),
+        ("back\\slash", "back\\slash"),
     ],
 )
 def test_parse(input, expected):
     got = parse(input)
     assert got == expected
+
+
+def test_parser_streaming():
+    text = "She *smiles*, _waves_ and says **hi**.\nsnake_case *stays*"
+    for size in (1, 2, 3, 7):
+        parser = Parser()
+        chunks = [text[i : i + size] for i in range(0, len(text), size)]
+        got = "".join(parser.feed(c) for c in chunks) + parser.feed("", final=True)
+        for tag in ("em", "strong"):
+            got = got.replace(f"</{tag}><{tag}>", "")
+        assert got == parse(text)
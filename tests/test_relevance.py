@@ -0,0 +1,48 @@
+from plaitime.data_models import Character
+from plaitime.embedding import EmbeddingCache, HashEmbedder
+from plaitime.message_store import MessageStore
+from plaitime.relevance import CharacterIndex, aliases, similar_characters
+
+
+def test_aliases():
+    assert aliases(Character(name="Anna Smith", aliases="Annie; the Smith")) == [
+        "Anna Smith",
+        "Annie",
+        "the Smith",
+        "Anna",
+    ]
+    assert aliases(Character(name="King Arthur")) == ["King Arthur"]
+
+
+def test_character_index():
+    characters = [
+        Character(name="Anna Smith", aliases="Annie"),
+        Character(name="Bob"),
+        Character(name="King Arthur", aliases="the king"),
+    ]
+    index = CharacterIndex(characters)
+    assert index.find("annie and the King talk.") == {0, 2}
+    assert index.find("Bobby and Annabelle") == set()
+
+    messages = MessageStore()
+    messages.append("user", "Anna meets Bob.")
+    messages.append("assistant", "Bob leaves.")
+    messages.append("user", "Arthur? King Arthur!")
+    assert index.last_mentions(messages) == {0: 0, 1: 1, 2: 2}
+    assert index.active(messages, 2) == [1, 2]
+    assert index.active(messages, 100) == [0, 1, 2]
+    assert CharacterIndex([]).active(messages, 2) == []
+
+
+def test_similar_characters(tmp_path):
+    cache = EmbeddingCache(tmp_path, HashEmbedder())
+    characters = [
+        Character(name="Anna", occupation="blacksmith in the village"),
+        Character(name="Bob", occupation="sailor on a ship"),
+    ]
+    query = "The sailor sings on the ship."
+    text = similar_characters(cache, characters, query, 100, threshold=0.3)
+    assert text.startswith("## Bob")
+    assert "Anna" not in text
+    assert similar_characters(cache, characters, query, 1, threshold=0.3) == ""
+    assert similar_characters(cache, characters, query, 100, threshold=1) == ""
@@ -1,6 +1,7 @@
-from plaitime.io import rename
 from pathlib import Path
 
+from plaitime.io import rename
+
 
 def test_rename(tmp_path):
     path: Path = tmp_path / "foo.txt"
@@ -10,3 +11,20 @@ def test_rename(tmp_path):
 
     assert not path.exists()
     assert (tmp_path / "bar.txt").exists()
+
+
+def test_rename_backups(tmp_path):
+    path: Path = tmp_path / "foo.json"
+    path.write_text("{}")
+    (tmp_path / "foo.json.1").write_text("{}")
+    missing = tmp_path / "baz.json"
+    (tmp_path / "baz.json.1").write_text("{}")
+
+    rename(path, "bar")
+    rename(missing, "qux")
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "bar.json",
+        "bar.json.1",
+        "qux.json.1",
+    ]
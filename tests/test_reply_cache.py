@@ -0,0 +1,36 @@
+from plaitime.generator import Generate
+from plaitime.reply_cache import ReplyCache
+
+
+def test_reply_cache(tmp_path):
+    cache = ReplyCache(tmp_path / "replies.sqlite", max_size=10)
+    key = cache.key("model", "prompt", {"temperature": 0.1})
+    assert key != cache.key("model", "prompt", {"temperature": 0.2})
+    assert cache.get(key) is None
+
+    cache.put(key, "model", "abcd")
+    assert cache.get(key) == "abcd"
+    cache.put("b", "model", "efgh")
+    # key was used last, b is evicted first
+    cache.get(key)
+    cache.put("c", "model", "ijkl")
+    assert cache.get("b") is None
+    assert cache.get(key) == "abcd"
+    assert len(cache) == 2
+
+    # too large
+    cache.put("d", "model", "x" * 11)
+    assert cache.get("d") is None
+
+    cache = ReplyCache(tmp_path / "replies.sqlite", max_size=10)
+    assert cache.get("c") == "ijkl"
+    cache.remove("c")
+    assert cache.get("c") is None
+
+
+def test_generate_cached(tmp_path):
+    cache = ReplyCache(tmp_path / "replies.sqlite", max_size=1000)
+    generate = Generate("model", "prompt", "1h", cache=cache, temperature=0.1)
+    cache.put(generate.cache_key(), "model", "cached reply")
+    # no server needed
+    assert list(generate.chunks()) == ["cached reply"]
@@ -0,0 +1,30 @@
+from plaitime.embedding import EmbeddingCache, HashEmbedder
+from plaitime.message_store import MessageStore
+from plaitime.retrieval import recall, recall_messages
+
+
+def test_recall(tmp_path):
+    cache = EmbeddingCache(tmp_path, HashEmbedder())
+    passages = [
+        "User: Tell me about the dragon.",
+        "Assistant: The weather is nice today.",
+        "Assistant: The red dragon lives in the cave.",
+        "User: Let us buy bread.",
+    ]
+    text = recall(cache, passages, "Where is the dragon?", 100, k=2)
+    assert text == f"{passages[0]}\n\n{passages[2]}"
+
+    # budget only fits one passage
+    text = recall(cache, passages, "red dragon cave", 12, k=2)
+    assert text == passages[2]
+
+    assert recall(cache, passages, "dragon", 0) == ""
+
+    messages = MessageStore(
+        [
+            {"role": "user", "content": "Tell me about the dragon."},
+            {"role": "assistant", "content": ""},
+        ]
+    )
+    text = recall_messages(cache, messages, "Where is the dragon?", 100)
+    assert text == passages[0]
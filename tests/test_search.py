@@ -0,0 +1,61 @@
+from plaitime.data_models import Character, Memory, Message
+from plaitime.io import save
+from plaitime.search import SearchIndex
+
+
+def test_search_index(tmp_path):
+    index = SearchIndex(tmp_path / "search.sqlite")
+    memory = Memory(
+        messages=[
+            Message(role="user", content="We enter the tavern."),
+            Message(role="assistant", content="The innkeeper greets you warmly."),
+        ],
+        story="A dragon burned down the tavern.",
+        characters=[Character(name="Grom", occupation="innkeeper")],
+    )
+    index.update("foo", memory)
+
+    hits = index.search("tavern")
+    assert {(h.session, h.kind, h.index) for h in hits} == {
+        ("foo", "user", 0),
+        ("foo", "story", 0),
+    }
+    assert "«tavern»" in hits[0].snippet
+
+    hits = index.search("innkeeper")
+    assert {(h.kind, h.index) for h in hits} == {("assistant", 1), ("character", 0)}
+
+    # incremental update
+    memory.messages.set_content(1, "The barmaid greets you.")
+    memory.messages.append("user", "Hello innkeeper!")
+    memory.story = ""
+    index.update("foo", memory)
+    assert {(h.kind, h.index) for h in index.search("tavern")} == {("user", 0)}
+    assert {(h.kind, h.index) for h in index.search("innkeeper")} == {
+        ("user", 2),
+        ("character", 0),
+    }
+
+    index.rename("foo", "bar")
+    assert {h.session for h in index.search("innkeeper")} == {"bar"}
+    index.remove("bar")
+    assert index.search("innkeeper") == []
+
+
+def test_search_invalid_query(tmp_path):
+    index = SearchIndex(tmp_path / "search.sqlite")
+    index.update("foo", Memory(messages=[Message(role="user", content='say "hi')]))
+    assert len(index.search('"hi')) == 1
+    assert index.search("") == []
+
+
+def test_search_sync(tmp_path):
+    memory_dir = tmp_path / "memories"
+    memory_dir.mkdir()
+    save(Memory(world="A world of magic."), memory_dir / "foo.json")
+    index = SearchIndex(tmp_path / "search.sqlite")
+    index.sync(memory_dir)
+    assert [h.session for h in index.search("magic")] == ["foo"]
+    (memory_dir / "foo.json").unlink()
+    index.sync(memory_dir)
+    assert index.search("magic") == []
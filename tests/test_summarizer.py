@@ -0,0 +1,106 @@
+from PySide6 import QtCore
+
+from plaitime import summarizer
+from plaitime.data_models import Summary
+from plaitime.message_store import MessageStore
+from plaitime.summarizer import (
+    FANOUT,
+    Summarizer,
+    digest,
+    message_digest,
+    next_job,
+    valid_summaries,
+)
+
+
+def make_messages(n):
+    messages = MessageStore()
+    for i in range(n):
+        # 10 tokens each
+        messages.append("user" if i % 2 == 0 else "assistant", f"message {i:02} " * 4)
+    return messages
+
+
+def summarize(messages, start, end):
+    return Summary(
+        start=start,
+        end=end,
+        text=f"summary {start} {end}",
+        digest=message_digest(messages, start, end),
+    )
+
+
+def rollup(summaries):
+    return Summary(
+        level=summaries[0].level + 1,
+        start=summaries[0].start,
+        end=summaries[-1].end,
+        text="rollup",
+        digest=digest(s.digest for s in summaries),
+    )
+
+
+def test_next_job():
+    messages = make_messages(100)
+    # nothing is due before the first chunk is complete
+    assert next_job(messages, [], 2, 30) is None
+    assert next_job(messages, [], 50, 30) == (0, 0, 3)
+
+    summaries = [summarize(messages, 3 * i, 3 * i + 3) for i in range(FANOUT - 1)]
+    assert next_job(messages, summaries, 50, 30) == (0, 9, 12)
+    summaries.append(summarize(messages, 9, 12))
+    assert next_job(messages, summaries, 12, 30) == (1, 0, 12)
+    summaries.append(rollup(summaries[:FANOUT]))
+    assert next_job(messages, summaries, 12, 30) is None
+
+    # a gap is filled, even if it is smaller than a chunk
+    summaries = [summarize(messages, 0, 3), summarize(messages, 4, 7)]
+    assert next_job(messages, summaries, 50, 30) == (0, 3, 4)
+
+
+def test_valid_summaries():
+    messages = make_messages(20)
+    chunks = [summarize(messages, 3 * i, 3 * i + 3) for i in range(FANOUT)]
+    top = rollup(chunks)
+    summaries = chunks + [top]
+    assert valid_summaries(summaries, messages) == summaries
+
+    messages.set_content(4, "changed")
+    assert valid_summaries(summaries, messages) == [
+        chunks[0],
+        chunks[2],
+        chunks[3],
+    ]
+
+    messages.truncate(8)
+    assert valid_summaries(summaries, messages) == [chunks[0]]
+
+
+def test_summarizer_failure(monkeypatch):
+    started = []
+
+    class FakeGenerate(QtCore.QObject):
+        nextChunk = QtCore.Signal(str)
+        error = QtCore.Signal(str)
+        ended = QtCore.Signal(str)
+        finished = QtCore.Signal()
+
+        def __init__(self, model, prompt, keep_alive, cache=None, **options):
+            super().__init__()
+            self.model = model
+
+        def start(self):
+            started.append(self.model)
+            self.ended.emit("failed")
+
+    monkeypatch.setattr(summarizer, "Generate", FakeGenerate)
+    s = Summarizer()
+    messages = make_messages(10)
+    s.update(messages, 10, 20, "a", "1h")
+    # a failed request is not repeated with the same model and settings
+    s.update(messages, 10, 20, "a", "1h")
+    assert started == ["a"]
+    s.update(messages, 10, 20, "b", "1h")
+    assert started == ["a", "b"]
+    s.update(messages, 10, 20, "b", "1h", temperature=0.5)
+    assert started == ["a", "b", "b"]
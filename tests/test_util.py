@@ -1,6 +1,7 @@
-from plaitime.util import remove_last_sentence
 import pytest
 
+from plaitime.util import remove_last_sentence
+
 
 @pytest.mark.parametrize(
     "input,expected",
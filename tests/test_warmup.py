@@ -0,0 +1,94 @@
+import functools
+import math
+
+import pytest
+
+from plaitime import warmup
+from plaitime.data_models import Message
+from plaitime.warmup import Warmup, WarmupThread, parse_duration
+
+
+def test_parse_duration():
+    assert parse_duration("1h") == 3600
+    assert parse_duration("1h30m") == 5400
+    assert parse_duration("500ms") == 0.5
+    assert parse_duration("300") == 300
+    assert parse_duration("0") == 0
+    assert parse_duration("-1") == math.inf
+    with pytest.raises(ValueError):
+        parse_duration("1 day")
+
+
+class FakeThread:
+    def __init__(self, started, model, messages, keep_alive, unload, **options):
+        self.started = started
+        self.args = (model, len(messages), keep_alive, unload)
+        self.error = self
+        self.interrupt = False
+
+    def connect(self, slot):
+        pass
+
+    def start(self):
+        self.started.append(self.args)
+
+    def isRunning(self):
+        return False
+
+
+def test_warmup(monkeypatch):
+    started = []
+    monkeypatch.setattr(warmup, "WarmupThread", functools.partial(FakeThread, started))
+    messages = [Message(role="user", content="Hi")]
+    w = Warmup(interval=0)
+    for args in (
+        ("a", messages, "1h", {}),
+        # same prompt, cache is still hot
+        ("a", messages, "1h", {}),
+        # keep_alive 0 would unload the model at once
+        ("b", messages, "0", {}),
+        ("b", messages, "1h", {}),
+        None,
+    ):
+        w.schedule(functools.partial(lambda args: args, args))
+        w._start()
+    assert started == [("a", 1, "1h", ()), ("b", 1, "1h", ("a",))]
+
+    # cancel drops the pending request
+    w.schedule(lambda: ("c", messages, "1h", {}))
+    w.cancel()
+    w._start()
+    assert len(started) == 2
+
+
+def test_warmup_unload(monkeypatch):
+    # the old model is unloaded on its own host
+    monkeypatch.setattr(
+        "plaitime.backends.pool.select", lambda model, kind="chat": [f"{model}-host"]
+    )
+    requests = []
+
+    class FakeClient:
+        def __init__(self, host):
+            self.host = host
+
+        def generate(self, model, keep_alive):
+            requests.append((self.host, "generate", model))
+
+        def chat(self, model, **kwargs):
+            requests.append((self.host, "chat", model))
+            yield {"message": {"content": ""}}
+
+    monkeypatch.setattr(WarmupThread, "_connect", lambda self, host: FakeClient(host))
+    thread = WarmupThread("b", [], "1h", unload=("a",))
+    assert len(list(thread._responses())) == 1
+    assert requests == [("a-host", "generate", "a"), ("b-host", "chat", "b")]
+
+
+def test_warmup_thread():
+    # the warmup prompt includes the recollections, like the real request
+    messages = [Message(role="system", content="Be nice.")]
+    thread = WarmupThread("a", messages, "1h", recall=lambda: "User: Hello")
+    assert thread._messages() == [
+        {"role": "system", "content": "Be nice.\n\n# Recollections\n\nUser: Hello"}
+    ]
@@ -0,0 +1,60 @@
+from plaitime.data_models import Session
+from plaitime.io import load
+from plaitime.writer import Writer
+
+
+def test_writer(tmp_path):
+    path = tmp_path / "foo.json"
+    written = []
+    writer = Writer(delay=60)
+    writer.submit(Session(name="a"), path, then=lambda: written.append("a"))
+    writer.submit(Session(name="b"), path, then=lambda: written.append("b"))
+    assert not path.exists()
+
+    writer.flush()
+    assert load(path, Session).name == "b"
+    # only one write, but all callbacks are called
+    assert written == ["a", "b"]
+    assert not (tmp_path / "foo.json.1").exists()
+
+    writer.submit(None, path)
+    writer.close()
+    assert not path.exists()
+
+    # after closing, files are written at once
+    writer.submit(Session(name="c"), path)
+    assert load(path, Session).name == "c"
+    assert not (tmp_path / "foo.json.1").exists()
+    writer.submit(Session(name="d"), path, backup=True)
+    assert load(tmp_path / "foo.json.1", Session).name == "c"
+
+
+def test_writer_delay(tmp_path):
+    path = tmp_path / "foo.json"
+    writer = Writer(delay=0)
+    writer.submit(Session(name="a"), path)
+    for _ in range(100):
+        if path.exists():
+            break
+        writer._thread.join(0.01)
+    assert load(path, Session).name == "a"
+    writer.close()
+
+
+def test_writer_order(tmp_path):
+    a = tmp_path / "a.json"
+    b = tmp_path / "b.json"
+    written = []
+    writer = Writer(delay=0.2)
+    writer.submit(Session(name="b"), b, delay=60)
+    writer.submit(Session(name="a"), a, then=lambda: written.append("a"))
+    # b is resubmitted and keeps its due time, but is written after a
+    writer.submit(None, b, then=lambda: written.append("b"), delay=0)
+    for _ in range(100):
+        if written:
+            break
+        writer._thread.join(0.01)
+    writer.close()
+    assert written == ["a", "b"]
+    assert a.exists()
+    assert not b.exists()